@@ -8,14 +8,20 @@ from datetime import date
 from pathlib import Path
 from typing import Any
 
-import numpy as np
-from PIL import Image, ImageDraw, ImageFilter, ImageFont
+from unit_art_components import border_connected, dilate_square, label_components
+from unit_art_lazy import lazy_import
+from unit_art_preview import BLACK, REVIEW_CHECKER, WHITE, background_tile
+
+np = lazy_import("numpy")
+Image = lazy_import("PIL.Image")
+ImageDraw = lazy_import("PIL.ImageDraw")
+ImageFont = lazy_import("PIL.ImageFont")
 
 
 ROOT = Path(__file__).resolve().parents[2]
 PROOF_MATRIX_PATH = ROOT / "docs" / "art" / "unit_art_proof_matrix.json"
 DEFAULT_OUT = ROOT / "outputs" / "art_pipeline" / "style_validation" / f"cutout_orange_fringe_audit_{date.today().strftime('%Y_%m_%d')}"
-SAFETY_ORANGE_KEY = np.array([248, 68, 1], dtype=np.int16)
+SAFETY_ORANGE_KEY = (248, 68, 1)
 DEFAULT_RAW_KEY_TOLERANCE = 64
 
 
@@ -72,14 +78,7 @@ def load_font(size: int) -> ImageFont.ImageFont:
 
 
 def checker(size: tuple[int, int], tile: int = 24) -> Image.Image:
-    width, height = size
-    image = Image.new("RGBA", size, (46, 50, 60, 255))
-    draw = ImageDraw.Draw(image)
-    for y in range(0, height, tile):
-        for x in range(0, width, tile):
-            if (x // tile + y // tile) % 2 == 0:
-                draw.rectangle((x, y, x + tile - 1, y + tile - 1), fill=(25, 28, 36, 255))
-    return image
+    return background_tile(size, REVIEW_CHECKER, tile)
 
 
 def safety_orange_residue(rgb: np.ndarray) -> np.ndarray:
@@ -125,46 +124,14 @@ def cool_blue_fringe_residue(rgb: np.ndarray) -> np.ndarray:
 
 def background_key_residue(rgb: np.ndarray, tolerance: int = DEFAULT_RAW_KEY_TOLERANCE) -> np.ndarray:
     values = rgb.astype(np.float32)
-    key = SAFETY_ORANGE_KEY.astype(np.float32)
+    key = np.array(SAFETY_ORANGE_KEY, dtype=np.float32)
     distance = np.sqrt(np.sum((values - key) ** 2, axis=2))
     return distance <= tolerance
 
 
 def border_connected_mask(mask: np.ndarray) -> np.ndarray:
-    """Return only mask pixels connected to an image border."""
-    try:
-        from scipy import ndimage
-
-        seed = np.zeros(mask.shape, dtype=bool)
-        seed[0, :] = mask[0, :]
-        seed[-1, :] = mask[-1, :]
-        seed[:, 0] = mask[:, 0]
-        seed[:, -1] = mask[:, -1]
-        return ndimage.binary_propagation(seed, mask=mask)
-    except Exception:
-        from collections import deque
-
-        height, width = mask.shape
-        connected = np.zeros(mask.shape, dtype=bool)
-        queue: deque[tuple[int, int]] = deque()
-        for x in range(width):
-            for y in (0, height - 1):
-                if mask[y, x] and not connected[y, x]:
-                    connected[y, x] = True
-                    queue.append((y, x))
-        for y in range(height):
-            for x in (0, width - 1):
-                if mask[y, x] and not connected[y, x]:
-                    connected[y, x] = True
-                    queue.append((y, x))
-        while queue:
-            y, x = queue.popleft()
-            for ny in range(max(0, y - 1), min(height, y + 2)):
-                for nx in range(max(0, x - 1), min(width, x + 2)):
-                    if mask[ny, nx] and not connected[ny, nx]:
-                        connected[ny, nx] = True
-                        queue.append((ny, nx))
-        return connected
+    """Return only mask pixels 4-connected to an image border."""
+    return border_connected(mask)
 
 
 def raw_background_field_residue(rgb: np.ndarray) -> np.ndarray:
@@ -191,47 +158,35 @@ def raw_background_residue(rgb: np.ndarray, tolerance: int = DEFAULT_RAW_KEY_TOL
     return background_key_residue(rgb, tolerance) | raw_background_field_residue(rgb)
 
 
-def alpha_edge_band(alpha: np.ndarray, radius: int) -> np.ndarray:
-    foreground = Image.fromarray(np.where(alpha > 8, 255, 0).astype(np.uint8), "L")
+def edge_band_reach(radius: int) -> int:
+    """Half-width of the square window alpha_edge_band grows and shrinks the visible matte by."""
     filter_size = max(3, radius * 2 + 1)
     if filter_size % 2 == 0:
         filter_size += 1
-    dilated = np.asarray(foreground.filter(ImageFilter.MaxFilter(filter_size))) > 0
-    eroded = np.asarray(foreground.filter(ImageFilter.MinFilter(filter_size))) > 0
-    return dilated & ~eroded
+    return filter_size // 2
+
+
+def alpha_edge_band(alpha: np.ndarray, radius: int) -> np.ndarray:
+    # Max/min filters of the visible mask, as running-sum box dilations so the
+    # cost does not grow with the radius; erosion is the dilation of the
+    # complement. Matches ImageFilter.MaxFilter/MinFilter on the 0/255 mask.
+    foreground = alpha > 8
+    reach = edge_band_reach(radius)
+    return dilate_square(foreground, reach) & dilate_square(~foreground, reach)
 
 
 def component_boxes(mask: np.ndarray, min_pixels: int = 18, max_boxes: int = 80) -> list[tuple[int, int, int, int, int]]:
-    height, width = mask.shape
-    visited = np.zeros(mask.shape, dtype=bool)
-    boxes: list[tuple[int, int, int, int, int]] = []
-    points = np.argwhere(mask)
-    for y0, x0 in points:
-        if visited[y0, x0] or not mask[y0, x0]:
-            continue
-        stack: list[tuple[int, int]] = [(int(y0), int(x0))]
-        visited[y0, x0] = True
-        min_x = int(x0)
-        max_x = int(x0)
-        min_y = int(y0)
-        max_y = int(y0)
-        count = 0
-        while stack:
-            y, x = stack.pop()
-            count += 1
-            min_x = min(min_x, x)
-            max_x = max(max_x, x)
-            min_y = min(min_y, y)
-            max_y = max(max_y, y)
-            for ny in range(max(0, y - 1), min(height, y + 2)):
-                for nx in range(max(0, x - 1), min(width, x + 2)):
-                    if not visited[ny, nx] and mask[ny, nx]:
-                        visited[ny, nx] = True
-                        stack.append((ny, nx))
-        if count >= min_pixels:
-            boxes.append((min_x, min_y, max_x, max_y, count))
-    boxes.sort(key=lambda item: item[4], reverse=True)
-    return boxes[:max_boxes]
+    """Inclusive ``(min_x, min_y, max_x, max_y, count)`` of 8-connected components with at least ``min_pixels`` pixels.
+
+    Largest first, ties in raster order of each component's first pixel,
+    cut to ``max_boxes``. One labelling pass gives every component's count
+    and box; without scipy, unit_art_components falls back to NumPy.
+    """
+    components = label_components(mask, connectivity=8)
+    labels = np.flatnonzero(components.areas >= min_pixels)
+    labels = labels[labels > 0]
+    order = labels[np.argsort(-components.areas[labels], kind="stable")][:max_boxes]
+    return [(*(int(value) for value in components.boxes[label]), int(components.areas[label])) for label in order]
 
 
 def background_residue_masks(
@@ -296,6 +251,35 @@ def background_residue_masks(
     }
 
 
+# Audit counts that grow when a matte lets background orange or fringe through.
+GATED_METRICS = (
+    "edge_orange_pixels",
+    "soft_orange_pixels",
+    "raw_key_visible_pixels",
+    "raw_key_edge_pixels",
+    "visual_fringe_pixels",
+)
+
+
+def edge_metrics(
+    rgba: np.ndarray,
+    edge_radius: int,
+    raw_rgb: np.ndarray | None = None,
+    raw_key_tolerance: int = DEFAULT_RAW_KEY_TOLERANCE,
+) -> dict[str, int]:
+    """Pixel counts of the edge and fringe masks, for comparing two mattes of one source."""
+    masks = background_residue_masks(rgba, edge_radius, raw_rgb, raw_key_tolerance)
+    return {
+        "alpha_edge_pixels": int(np.count_nonzero(masks["edge"])),
+        "soft_alpha_pixels": int(np.count_nonzero(masks["soft_alpha"])),
+        "edge_orange_pixels": int(np.count_nonzero(masks["edge_orange"])),
+        "soft_orange_pixels": int(np.count_nonzero(masks["soft_orange"])),
+        "raw_key_visible_pixels": int(np.count_nonzero(masks["raw_key_visible"])),
+        "raw_key_edge_pixels": int(np.count_nonzero(masks["raw_key_edge"])),
+        "visual_fringe_pixels": int(np.count_nonzero(masks["visual_fringe"])),
+    }
+
+
 def issue_for_metrics(
     edge_orange_pixels: int,
     soft_orange_pixels: int,
@@ -643,8 +627,8 @@ def write_review_sheet(path: Path, rows: list[CutoutAuditRow], edge_radius: int,
 
     backgrounds = [
         checker(tile),
-        Image.new("RGBA", tile, (0, 0, 0, 255)),
-        Image.new("RGBA", tile, (255, 255, 255, 255)),
+        background_tile(tile, BLACK),
+        background_tile(tile, WHITE),
     ]
     for index, row in enumerate(selected):
         y = 52 + index * row_h
@@ -0,0 +1,100 @@
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from run_unit_art_workflow_validation import ART_TOOLS, rel
+from unit_art_lazy import EAGER_IMPORTS_ENV
+from unit_art_metrics import percentile_summary
+
+
+HEAVY_MODULES = ("numpy", "PIL.Image", "scipy", "torch", "onnxruntime", "pymatting")
+# Runs a tool as __main__ with --help from its own directory, then reports
+# which heavy modules really executed rather than staying lazy.
+PROBE = """
+import runpy, sys
+from importlib.util import _LazyModule
+path, heavy = sys.argv[1], sys.argv[2].split(",")
+sys.argv = [path, "--help"]
+try:
+    runpy.run_path(path, run_name="__main__")
+except SystemExit:
+    pass
+loaded = [name for name in heavy if name in sys.modules and not isinstance(sys.modules[name], _LazyModule)]
+print("LOADED=" + ",".join(loaded), file=sys.stderr)
+"""
+
+
+def time_help(tool: Path, eager: bool, repeats: int) -> dict[str, object]:
+    env = dict(os.environ)
+    env.pop(EAGER_IMPORTS_ENV, None)
+    if eager:
+        env[EAGER_IMPORTS_ENV] = "1"
+    command = [sys.executable, "-c", PROBE, str(tool), ",".join(HEAVY_MODULES)]
+    seconds: list[float] = []
+    loaded: list[str] = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        completed = subprocess.run(command, cwd=tool.parent, env=env, capture_output=True, text=True)
+        seconds.append(time.perf_counter() - started)
+        if completed.returncode != 0:
+            raise RuntimeError(f"{rel(tool)} --help failed:\n{completed.stderr}")
+        marker = [line for line in completed.stderr.splitlines() if line.startswith("LOADED=")]
+        loaded = [name for name in marker[-1].removeprefix("LOADED=").split(",") if name] if marker else []
+    return {"seconds": percentile_summary(seconds), "loaded": loaded}
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description=(
+            "Time `--help` for every script in run_unit_art_workflow_validation.ART_TOOLS with lazy imports and with "
+            f"{EAGER_IMPORTS_ENV}=1, and list the heavy modules each one actually loads."
+        )
+    )
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--output", type=Path, help="Optional JSON report path.")
+    args = parser.parse_args()
+    if args.repeats < 1:
+        parser.error("--repeats must be at least 1")
+
+    results = []
+    for tool in ART_TOOLS:
+        lazy = time_help(tool, False, args.repeats)
+        eager = time_help(tool, True, args.repeats)
+        results.append(
+            {
+                "tool": rel(tool),
+                "lazy_p50_seconds": lazy["seconds"]["p50"],
+                "eager_p50_seconds": eager["seconds"]["p50"],
+                "lazy_loaded": lazy["loaded"],
+                "eager_loaded": eager["loaded"],
+            }
+        )
+
+    report = {
+        "schema_version": 1,
+        "tool": "benchmark_unit_art_startup.py",
+        "python": sys.version.split()[0],
+        "repeats": args.repeats,
+        "lazy_total_p50_seconds": round(sum(result["lazy_p50_seconds"] for result in results), 3),
+        "eager_total_p50_seconds": round(sum(result["eager_p50_seconds"] for result in results), 3),
+        "tools": results,
+    }
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(json.dumps(report, indent=2) + "\n", encoding="utf-8")
+    print("tool                                              lazy_s  eager_s  lazy_loaded")
+    for result in results:
+        name = Path(result["tool"]).name
+        print(f"{name:<49} {result['lazy_p50_seconds']:6.3f}  {result['eager_p50_seconds']:7.3f}  {','.join(result['lazy_loaded']) or '-'}")
+    print(f"total                                             {report['lazy_total_p50_seconds']:6.3f}  {report['eager_total_p50_seconds']:7.3f}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
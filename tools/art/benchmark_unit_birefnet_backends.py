@@ -0,0 +1,120 @@
+from __future__ import annotations
+
+import argparse
+import json
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from export_unit_birefnet_onnx import mask_levels
+from unit_art_birefnet import BACKENDS, DEFAULT_MODEL, DEFAULT_REVISION, ONNX_MASK_TOLERANCE, ModelSpec, model_store_identity
+from unit_art_lazy import lazy_import
+from unit_art_metrics import peak_rss_mb, percentile_summary
+
+np = lazy_import("numpy")
+Image = lazy_import("PIL.Image")
+
+
+def measure_backend(args: argparse.Namespace) -> dict[str, object]:
+    """Load one backend and time repeated single-image predictions in this process."""
+    model_store = args.model_store if args.run_backend == "torch" else None
+    spec = ModelSpec(args.model, args.model_revision, args.run_backend, "cpu", args.onnx_model, args.onnx_threads, model_store=model_store)
+    model_image = Image.open(args.image).convert("RGB").resize((args.input_size, args.input_size), Image.Resampling.BICUBIC)
+    started = time.perf_counter()
+    session = spec.load()
+    load_seconds = time.perf_counter() - started
+    for _ in range(args.warmup):
+        session.predict(model_image)
+    latencies = []
+    for _ in range(args.repeats):
+        started = time.perf_counter()
+        prediction = session.predict(model_image)
+        latencies.append(time.perf_counter() - started)
+    if args.prediction_output is not None:
+        np.save(args.prediction_output, prediction, allow_pickle=False)
+    return {
+        "backend": args.run_backend,
+        "load_seconds": round(load_seconds, 3),
+        "latency_seconds": percentile_summary(latencies),
+        "peak_rss_mb": None if peak_rss_mb() is None else round(peak_rss_mb(), 1),
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description=(
+            "Compare torch and onnxruntime BiRefNet latency, peak memory and mask parity on the CPU. "
+            "Each backend runs in a fresh process so its peak RSS is its own."
+        )
+    )
+    parser.add_argument("--image", required=True, type=Path)
+    parser.add_argument("--output", type=Path, help="Optional JSON report path.")
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    parser.add_argument("--model-revision", default=DEFAULT_REVISION)
+    parser.add_argument("--input-size", type=int, default=1024)
+    parser.add_argument("--onnx-model", type=Path)
+    parser.add_argument("--model-store", type=Path, help="Load the torch backend from this seed_unit_birefnet_model_store.py directory.")
+    parser.add_argument("--onnx-threads", type=int, default=0)
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--run-backend", choices=BACKENDS, help=argparse.SUPPRESS)
+    parser.add_argument("--prediction-output", type=Path, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.model_store is not None:
+        try:
+            args.model, args.model_revision = model_store_identity(args.model_store, args.model, args.model_revision)
+        except (OSError, ValueError, KeyError) as exc:
+            parser.error(str(exc))
+
+    if args.run_backend:
+        print(json.dumps(measure_backend(args)))
+        return 0
+
+    results = []
+    predictions = {}
+    with tempfile.TemporaryDirectory() as scratch:
+        for backend in BACKENDS:
+            prediction_path = Path(scratch) / f"{backend}.npy"
+            command = [sys.executable, __file__, "--run-backend", backend, "--prediction-output", str(prediction_path)] + sys.argv[1:]
+            completed = subprocess.run(command, capture_output=True, text=True)
+            if completed.returncode != 0:
+                print(f"FAIL {backend}: {completed.stderr.strip().splitlines()[-1:]}")
+                return 1
+            results.append(json.loads(completed.stdout.strip().splitlines()[-1]))
+            predictions[backend] = np.load(prediction_path, allow_pickle=False)
+    # The same comparison as export_unit_birefnet_onnx.py --verify-image, so
+    # a run on real weights measures the tolerance that check enforces.
+    delta = np.abs(mask_levels(predictions["torch"]).astype(np.int16) - mask_levels(predictions["onnxruntime"]).astype(np.int16))
+    parity = {
+        "mask_max_level_diff": int(delta.max()),
+        "mask_changed_fraction": round(float(np.count_nonzero(delta)) / delta.size, 6),
+        "tolerance_levels": ONNX_MASK_TOLERANCE,
+    }
+
+    report = {
+        "schema_version": 1,
+        "tool": "benchmark_unit_birefnet_backends.py",
+        "model": args.model,
+        "revision": args.model_revision,
+        "input_size": args.input_size,
+        "onnx_threads": args.onnx_threads,
+        "model_store": None if args.model_store is None else str(args.model_store),
+        "repeats": args.repeats,
+        "backends": results,
+        "parity": parity,
+    }
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(json.dumps(report, indent=2) + "\n", encoding="utf-8")
+    print("backend      load_s  p50_s   p90_s   peak_rss_mb")
+    for result in results:
+        latency = result["latency_seconds"]
+        print(f"{result['backend']:<12} {result['load_seconds']:6.2f}  {latency['p50']:6.3f}  {latency['p90']:6.3f}  {result['peak_rss_mb']}")
+    print(f"mask_max_level_diff={parity['mask_max_level_diff']} changed={parity['mask_changed_fraction']} tolerance_levels={ONNX_MASK_TOLERANCE}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
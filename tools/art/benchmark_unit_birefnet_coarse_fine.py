@@ -0,0 +1,108 @@
+from __future__ import annotations
+
+import argparse
+import json
+import time
+from pathlib import Path
+
+from audit_unit_cutout_orange_fringe import DEFAULT_RAW_KEY_TOLERANCE, edge_metrics
+from benchmark_unit_birefnet_worker import roster_sources
+from quantize_unit_birefnet_onnx import matte_cutout, regressed_metrics
+from remove_unit_background_birefnet import fit_for_model, predict_coarse_to_fine
+from unit_art_birefnet import DEFAULT_MODEL, DEFAULT_REVISION, MaskPredictor, ModelSpec
+from unit_art_lazy import lazy_import
+from unit_art_metrics import percentile_summary
+
+np = lazy_import("numpy")
+Image = lazy_import("PIL.Image")
+
+
+def compare_source(path: Path, predictor: MaskPredictor, args: argparse.Namespace) -> dict[str, object]:
+    raw = Image.open(path).convert("RGB")
+    raw_rgb = np.asarray(raw)
+    started = time.perf_counter()
+    reference = predictor.predict_batch([fit_for_model(raw, args.input_size)[0]])[0][0]
+    full_seconds = time.perf_counter() - started
+    started = time.perf_counter()
+    candidates, _device, _inference, notes = predict_coarse_to_fine(predictor, [raw], args.input_size, args.coarse_size, args.refine_window, 1)
+    coarse_fine_seconds = time.perf_counter() - started
+
+    reference_metrics = edge_metrics(matte_cutout(raw, reference), args.edge_radius, raw_rgb, args.raw_key_tolerance)
+    candidate_metrics = edge_metrics(matte_cutout(raw, candidates[0]), args.edge_radius, raw_rgb, args.raw_key_tolerance)
+    delta = np.abs((reference * 255).astype(np.int16) - (candidates[0] * 255).astype(np.int16))
+    regressed = regressed_metrics(reference_metrics, candidate_metrics, args.max_regression, args.slack_pixels)
+    return {
+        "image": str(path),
+        "status": "fail" if regressed else "pass",
+        "regressed": regressed,
+        "refined_tiles": notes[0].split("=", 1)[1],
+        "full": reference_metrics,
+        "coarse_fine": candidate_metrics,
+        "mask_max_level_diff": int(delta.max()),
+        "mask_mean_level_diff": round(float(delta.mean()), 4),
+        "full_seconds": round(full_seconds, 3),
+        "coarse_fine_seconds": round(coarse_fine_seconds, 3),
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description=(
+            "Compare remove_unit_background_birefnet.py --coarse-size against the full-size pass on raw unit sources: "
+            "inference time per source and the audit edge metrics of each bare matte."
+        )
+    )
+    parser.add_argument("--inputs", required=True, help="Directory or glob of raw unit sources.")
+    parser.add_argument("--output", type=Path, help="Optional JSON report path.")
+    parser.add_argument("--limit", type=int, default=20, help="Sources to compare; 0 runs every source found.")
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    parser.add_argument("--model-revision", default=DEFAULT_REVISION)
+    parser.add_argument("--device", default="cpu", choices=["auto", "cuda", "cpu"])
+    parser.add_argument("--input-size", type=int, default=1024)
+    parser.add_argument("--coarse-size", type=int, default=256)
+    parser.add_argument("--refine-window", type=int, default=192)
+    parser.add_argument("--edge-radius", type=int, default=4)
+    parser.add_argument("--raw-key-tolerance", type=int, default=DEFAULT_RAW_KEY_TOLERANCE)
+    parser.add_argument("--max-regression", type=float, default=0.05, help="Allowed relative growth of each gated audit count (0.05 = 5%%).")
+    parser.add_argument("--slack-pixels", type=int, default=16)
+    args = parser.parse_args()
+
+    sources = roster_sources(args.inputs, args.limit)
+    if not sources:
+        parser.error(f"no sources found for {args.inputs}")
+    predictor = MaskPredictor(ModelSpec(args.model, args.model_revision, "torch", args.device), None)
+    # Load the model before timing anything.
+    predictor.predict_batch([Image.new("RGB", (args.coarse_size, args.coarse_size))])
+    checks = [compare_source(path, predictor, args) for path in sources]
+
+    full = [check["full_seconds"] for check in checks]
+    coarse_fine = [check["coarse_fine_seconds"] for check in checks]
+    report = {
+        "schema_version": 1,
+        "tool": "benchmark_unit_birefnet_coarse_fine.py",
+        "model": args.model,
+        "revision": args.model_revision,
+        "device": predictor.session.device,
+        "input_size": args.input_size,
+        "coarse_size": args.coarse_size,
+        "refine_window": args.refine_window,
+        "image_count": len(checks),
+        "full_seconds": percentile_summary(full),
+        "coarse_fine_seconds": percentile_summary(coarse_fine),
+        "speedup": round(sum(full) / sum(coarse_fine), 3) if sum(coarse_fine) > 0 else None,
+        "failed": sum(check["status"] != "pass" for check in checks),
+        "checks": checks,
+    }
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(json.dumps(report, indent=2) + "\n", encoding="utf-8")
+    for check in checks:
+        detail = ", ".join(check["regressed"]) or "within tolerance"
+        print(f"{check['status'].upper()} {check['image']}: tiles={check['refined_tiles']} {check['full_seconds']}s -> {check['coarse_fine_seconds']}s; {detail}")
+    print(f"speedup={report['speedup']}")
+    print(f"failed={report['failed']}/{len(checks)}")
+    return 1 if report["failed"] else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
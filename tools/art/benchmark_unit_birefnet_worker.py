@@ -0,0 +1,170 @@
+from __future__ import annotations
+
+import argparse
+import glob
+import json
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from unit_art_birefnet import DEFAULT_MODEL, WorkerUnavailable, worker_health
+from unit_art_metrics import percentile_summary
+
+
+TOOLS = Path(__file__).resolve().parent
+SOURCE_SUFFIXES = {".png", ".jpg", ".jpeg", ".webp"}
+
+
+def roster_sources(inputs: str, limit: int) -> list[Path]:
+    path = Path(inputs)
+    if path.is_dir():
+        sources = [child for child in sorted(path.iterdir()) if child.suffix.lower() in SOURCE_SUFFIXES]
+    else:
+        sources = [Path(match) for match in sorted(glob.glob(inputs, recursive=True)) if Path(match).suffix.lower() in SOURCE_SUFFIXES]
+    return sources[:limit] if limit > 0 else sources
+
+
+def cutout_command(args: argparse.Namespace, source: Path, out_dir: Path, worker_url: str | None) -> list[str]:
+    command = [
+        args.python,
+        str(TOOLS / "remove_unit_background_birefnet.py"),
+        "--input", str(source),
+        "--output", str(out_dir / f"{source.stem}_cutout.png"),
+        "--mask-output", str(out_dir / f"{source.stem}_mask.png"),
+        "--review-output", str(out_dir / f"{source.stem}_review.png"),
+        "--model", args.model,
+        "--device", args.device,
+        "--input-size", str(args.input_size),
+        # Both runs must do real inference, not read each other's cached predictions.
+        "--no-cache",
+    ]
+    command += ["--worker-url", worker_url] if worker_url else ["--no-worker"]
+    return command + args.cutout_args
+
+
+def run_roster(args: argparse.Namespace, sources: list[Path], out_dir: Path, worker_url: str | None) -> dict[str, object]:
+    """Run one cutout process per source, the way the roster scripts call the tool."""
+    out_dir.mkdir(parents=True, exist_ok=True)
+    seconds: list[float] = []
+    started = time.perf_counter()
+    for source in sources:
+        image_started = time.perf_counter()
+        completed = subprocess.run(cutout_command(args, source, out_dir, worker_url), capture_output=True, text=True)
+        seconds.append(time.perf_counter() - image_started)
+        if completed.returncode != 0:
+            raise RuntimeError(f"cutout failed for {source}:\n{completed.stderr}")
+        # The inference= line is --timings only; a missed worker always prints worker_fallback=.
+        if worker_url and "worker_fallback=" in completed.stdout:
+            raise RuntimeError(f"cutout for {source} did not use the worker:\n{completed.stdout}")
+    total = time.perf_counter() - started
+    return {
+        "image_count": len(sources),
+        "total_seconds": round(total, 3),
+        "images_per_minute": round(len(sources) * 60.0 / total, 3) if total > 0 else None,
+        "per_image_seconds": percentile_summary(seconds),
+    }
+
+
+def start_worker(args: argparse.Namespace) -> tuple[subprocess.Popen, str, float]:
+    url = f"http://127.0.0.1:{args.port}"
+    command = [
+        args.python,
+        str(TOOLS / "serve_unit_birefnet_worker.py"),
+        "--model", args.model,
+        "--device", args.device,
+        "--port", str(args.port),
+        "--quiet",
+    ]
+    started = time.perf_counter()
+    worker = subprocess.Popen(command)
+    deadline = started + args.worker_start_timeout
+    while True:
+        try:
+            health = worker_health(url)
+        except WorkerUnavailable:
+            if worker.poll() is not None:
+                raise RuntimeError(f"worker exited with code {worker.returncode} before answering")
+            if time.perf_counter() > deadline:
+                worker.terminate()
+                raise RuntimeError(f"worker did not answer at {url} within {args.worker_start_timeout}s")
+            time.sleep(0.5)
+            continue
+        if health.get("model") != args.model:
+            worker.terminate()
+            raise RuntimeError(f"port {args.port} is already serving {health.get('model')}")
+        return worker, url, time.perf_counter() - started
+
+
+def matching_masks(sources: list[Path], cold_dir: Path, warm_dir: Path) -> int:
+    return sum(
+        (cold_dir / f"{source.stem}_mask.png").read_bytes() == (warm_dir / f"{source.stem}_mask.png").read_bytes()
+        for source in sources
+    )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description=(
+            "Benchmark roster cutout throughput: one cold process per image versus thin clients of a warm "
+            "serve_unit_birefnet_worker.py. Both runs use the same cutout flags, and their masks are compared."
+        )
+    )
+    parser.add_argument("--inputs", required=True, help="Directory or glob of raw unit sources.")
+    parser.add_argument("--out-dir", required=True, type=Path)
+    parser.add_argument("--limit", type=int, default=50, help="Roster size; 0 runs every source found.")
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    parser.add_argument("--device", default="cpu", choices=["auto", "cuda", "cpu"])
+    parser.add_argument("--input-size", type=int, default=1024)
+    parser.add_argument("--port", type=int, default=8799, help="Port for the benchmark's own worker, away from the default one.")
+    parser.add_argument("--worker-start-timeout", type=float, default=600.0)
+    parser.add_argument("--python", default=sys.executable, help="Interpreter with torch/transformers installed.")
+    parser.add_argument("cutout_args", nargs=argparse.REMAINDER, help="Extra remove_unit_background_birefnet.py flags after --.")
+    args = parser.parse_args()
+    if args.cutout_args[:1] == ["--"]:
+        args.cutout_args = args.cutout_args[1:]
+
+    sources = roster_sources(args.inputs, args.limit)
+    if not sources:
+        parser.error(f"no sources found for {args.inputs}")
+
+    cold_dir = args.out_dir / "cold"
+    warm_dir = args.out_dir / "warm"
+    cold = run_roster(args, sources, cold_dir, None)
+    worker, url, startup = start_worker(args)
+    try:
+        warm = run_roster(args, sources, warm_dir, url)
+    finally:
+        worker.terminate()
+        worker.wait()
+    warm["worker_startup_seconds"] = round(startup, 3)
+    warm_total = warm["total_seconds"] + startup
+
+    report = {
+        "schema_version": 1,
+        "tool": "benchmark_unit_birefnet_worker.py",
+        "model": args.model,
+        "device": args.device,
+        "input_size": args.input_size,
+        "cutout_args": args.cutout_args,
+        "image_count": len(sources),
+        "cold_process_per_image": cold,
+        "warm_worker": warm,
+        "speedup_including_worker_startup": round(cold["total_seconds"] / warm_total, 3) if warm_total > 0 else None,
+        "identical_masks": matching_masks(sources, cold_dir, warm_dir),
+    }
+    args.out_dir.mkdir(parents=True, exist_ok=True)
+    report_path = args.out_dir / "birefnet_worker_benchmark.json"
+    report_path.write_text(json.dumps(report, indent=2) + "\n", encoding="utf-8")
+    print(f"images={len(sources)}")
+    print(f"cold_total_seconds={cold['total_seconds']}")
+    print(f"warm_total_seconds={warm['total_seconds']}")
+    print(f"worker_startup_seconds={warm['worker_startup_seconds']}")
+    print(f"speedup={report['speedup_including_worker_startup']}")
+    print(f"identical_masks={report['identical_masks']}/{len(sources)}")
+    print(f"report={report_path}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -3,33 +3,27 @@ from __future__ import annotations
 import argparse
 from pathlib import Path
 
-from PIL import Image, ImageDraw, ImageFont
+from unit_art_lazy import lazy_import
+from unit_art_preview import BOARD_CHECKER, Palette, PreviewPyramid, background_tile, scaled_tile
 
-
-SCALES = (384, 256, 128, 96, 64)
+Image = lazy_import("PIL.Image")
+ImageDraw = lazy_import("PIL.ImageDraw")
+ImageFont = lazy_import("PIL.ImageFont")
 
 
-def checker(size: tuple[int, int], tile: int = 24) -> Image.Image:
-    width, height = size
-    out = Image.new("RGBA", size, (34, 36, 44, 255))
-    draw = ImageDraw.Draw(out)
-    for y in range(0, height, tile):
-        for x in range(0, width, tile):
-            if (x // tile + y // tile) % 2 == 0:
-                draw.rectangle((x, y, x + tile - 1, y + tile - 1), fill=(56, 60, 70, 255))
-    return out
+SCALES = (384, 256, 128, 96, 64)
 
 
 def label(draw: ImageDraw.ImageDraw, xy: tuple[int, int], text: str) -> None:
     draw.text(xy, text, fill=(235, 236, 240, 255), font=ImageFont.load_default())
 
 
-def tile(image: Image.Image, size: int, background: Image.Image, caption: str) -> Image.Image:
+def tile(pyramid: PreviewPyramid, size: int, palette: Palette, caption: str) -> Image.Image:
     pad = 18
     label_h = 26
     out = Image.new("RGBA", (size + pad * 2, size + pad * 2 + label_h), (14, 15, 20, 255))
-    bg = background.resize((size, size), Image.Resampling.BICUBIC).convert("RGBA")
-    fg = image.resize((size, size), Image.Resampling.LANCZOS).convert("RGBA")
+    bg = background_tile((size, size), palette, scaled_tile(24, pyramid.size[0], size))
+    fg = pyramid.resize((size, size))
     bg.alpha_composite(fg)
     out.alpha_composite(bg, (pad, pad))
     draw = ImageDraw.Draw(out)
@@ -45,13 +39,13 @@ def main() -> int:
     args = parser.parse_args()
 
     image = Image.open(args.input).convert("RGBA")
-    dark = Image.new("RGBA", image.size, (8, 9, 12, 255))
-    white = Image.new("RGBA", image.size, (255, 255, 255, 255))
-    check = checker(image.size)
+    dark: Palette = ((8, 9, 12, 255),)
+    white: Palette = ((255, 255, 255, 255),)
+    pyramid = PreviewPyramid(image)
 
     rows: list[Image.Image] = []
-    for name, bg in (("checker", check), ("black", dark), ("white", white)):
-        row_tiles = [tile(image, size, bg, f"{name} {size}px") for size in SCALES]
+    for name, palette in (("checker", BOARD_CHECKER), ("black", dark), ("white", white)):
+        row_tiles = [tile(pyramid, size, palette, f"{name} {size}px") for size in SCALES]
         width = sum(item.width for item in row_tiles)
         height = max(item.height for item in row_tiles)
         row = Image.new("RGBA", (width, height), (14, 15, 20, 255))
@@ -3,7 +3,12 @@ from __future__ import annotations
 import argparse
 from pathlib import Path
 
-from PIL import Image, ImageDraw, ImageFont
+from unit_art_lazy import lazy_import
+from unit_art_preview import background_tile
+
+Image = lazy_import("PIL.Image")
+ImageDraw = lazy_import("PIL.ImageDraw")
+ImageFont = lazy_import("PIL.ImageFont")
 
 
 ROOT = Path(__file__).resolve().parents[2]
@@ -100,7 +105,7 @@ def full_panel(image: Image.Image, size: int) -> Image.Image:
     if not has_transparency(image):
         return image.convert("RGB").resize((size, size), Image.Resampling.LANCZOS)
     crop = image.crop(alpha_bbox(image))
-    canvas = Image.new("RGBA", (size, size), SAFETY_ORANGE + (255,))
+    canvas = background_tile((size, size), (SAFETY_ORANGE + (255,),))
     scale = min((size * 0.84) / crop.width, (size * 0.88) / crop.height)
     resized = crop.resize((max(1, int(crop.width * scale)), max(1, int(crop.height * scale))), Image.Resampling.LANCZOS)
     canvas.alpha_composite(resized, ((size - resized.width) // 2, (size - resized.height) // 2))
@@ -120,7 +125,7 @@ def upper_crop_panel(image: Image.Image, size: int) -> Image.Image:
     right = min(image.width, int(center_x + crop_width / 2))
     bottom = min(image.height, int(top + crop_height))
     crop = image.crop((left, top, right, bottom))
-    canvas = Image.new("RGBA", (size, size), SAFETY_ORANGE + (255,))
+    canvas = background_tile((size, size), (SAFETY_ORANGE + (255,),))
     scale = min(size / crop.width, size / crop.height)
     resized = crop.resize((max(1, int(crop.width * scale)), max(1, int(crop.height * scale))), Image.Resampling.LANCZOS)
     canvas.alpha_composite(resized, ((size - resized.width) // 2, (size - resized.height) // 2))
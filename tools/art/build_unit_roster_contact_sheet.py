@@ -4,7 +4,12 @@ import argparse
 import re
 from pathlib import Path
 
-from PIL import Image, ImageDraw, ImageFont
+from unit_art_lazy import lazy_import
+from unit_art_preview import PreviewPyramid
+
+Image = lazy_import("PIL.Image")
+ImageDraw = lazy_import("PIL.ImageDraw")
+ImageFont = lazy_import("PIL.ImageFont")
 
 
 ROOT = Path(__file__).resolve().parents[2]
@@ -50,8 +55,7 @@ def make_tile(info: dict[str, str], asset_path: Path | None, tile_size: int) ->
     out = Image.new("RGBA", (tile_size, tile_size + label_h), (16, 17, 22, 255))
     draw = ImageDraw.Draw(out)
     if asset_path and asset_path.exists():
-        image = Image.open(asset_path).convert("RGBA")
-        image.thumbnail((tile_size - 20, tile_size - 20), Image.Resampling.LANCZOS)
+        image = PreviewPyramid(Image.open(asset_path)).thumbnail((tile_size - 20, tile_size - 20))
         x = (tile_size - image.width) // 2
         y = (tile_size - image.height) // 2
         out.alpha_composite(image, (x, y))
@@ -10,9 +10,19 @@ from datetime import date
 from pathlib import Path
 from typing import Any
 
-from PIL import Image, ImageDraw
+from clean_unit_cutout_orange_edge import assert_edge_clean_delta_contract, edge_clean_delta_stats, stats_output_path
+from postprocess_unit_sprite import decontaminate_green_spill, decontaminate_green_spill_reference, transparent_from_green_screen
+from remove_unit_background_birefnet import fit_for_model, predict_coarse_to_fine
+from unit_art_birefnet import normalize_prediction
+from unit_art_components import border_connected_fallback, border_seed, label_components_fallback, scipy_ndimage
+from unit_art_files import file_sha256
+from unit_art_lazy import lazy_import
+from unit_art_refine import uncertain_band
 
-from clean_unit_cutout_orange_edge import assert_edge_clean_delta_contract, edge_clean_delta_stats, file_sha256, stats_output_path
+np = lazy_import("numpy")
+Image = lazy_import("PIL.Image")
+ImageDraw = lazy_import("PIL.ImageDraw")
+ImageFilter = lazy_import("PIL.ImageFilter")
 
 
 ROOT = Path(__file__).resolve().parents[2]
@@ -63,6 +73,12 @@ CUTOUT_AUDIT_THRESHOLDS = {
     "max_soft_orange_pixels": 20,
     "max_edge_orange_ratio": 0.0006,
 }
+# Coarse-to-fine control: a small frame so it refines in a few tiles, and
+# the step it may add at a band edge beyond the full pass's own step there.
+REFINE_CONTROL_SIZES = {"input_size": 512, "coarse_size": 128, "window": 96}
+MAX_REFINE_BAND_EDGE_STEP = 0.02
+COMPONENT_CONTROL_SEED = 628
+COMPONENT_CONTROL_DENSITIES = (0.3, 0.45, 0.55, 0.6, 0.75)
 STRICT_ZERO_CUTOUT_AUDIT_THRESHOLDS = {
     "edge_radius": 4,
     "max_edge_orange_pixels": 0,
@@ -1888,6 +1904,176 @@ def assert_vellum_first_visual_evidence(metrics_csv: Path, report: list[str]) ->
     report.append("")
 
 
+def write_green_spill_control(path: Path) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    image = Image.new("RGBA", (192, 192), (40, 210, 60, 255))
+    draw = ImageDraw.Draw(image)
+    for index in range(40):
+        draw.ellipse((40 + index, 20 + index, 152 - index, 176 - index // 2), fill=(70 + index * 3, 80 + index, 92 + index * 2, 255))
+    draw.rectangle((90, 4, 102, 40), fill=(150, 120, 90, 255))
+    draw.ellipse((82, 82, 110, 110), fill=(60, 190, 70, 255))
+    image.filter(ImageFilter.GaussianBlur(1.5)).save(path)
+
+
+def assert_green_spill_decontaminate_parity(output_dir: Path, report: list[str]) -> None:
+    report.append("## Green-Spill Decontaminate Parity")
+    report.append("")
+    control_path = output_dir / "green_spill_parity" / "green_spill_parity_control.png"
+    write_green_spill_control(control_path)
+    cutout = transparent_from_green_screen(Image.open(control_path))
+    before = np.asarray(cutout)
+    expected = np.asarray(decontaminate_green_spill_reference(cutout))
+    actual = np.asarray(decontaminate_green_spill(cutout))
+    expected_changed = np.any(expected != before, axis=2)
+    if not np.any(expected_changed):
+        raise RuntimeError("green-spill parity control did not create any spill pixels")
+    if not np.array_equal(expected, actual):
+        mismatched = int(np.count_nonzero(np.any(expected != actual, axis=2)))
+        raise RuntimeError(f"array green-spill decontaminate differs from the per-pixel reference on {mismatched} pixels")
+    report.append(
+        f"- PASS array green-spill decontaminate matches the per-pixel reference exactly on `{rel(control_path)}`: "
+        f"{int(np.count_nonzero(expected_changed))} pixels touched."
+    )
+    report.append("")
+
+
+class SigmoidRangePredictor:
+    """A stand-in for MaskPredictor whose raw sigmoid spans a known 0.1-0.9 range.
+
+    It scores distance from the safety-orange key, so every resolution and
+    crop sees the same field, and its range is narrow enough that stretching
+    any one pass on its own visibly changes that pass's scale.
+    """
+
+    low = 0.1
+    high = 0.9
+
+    def predict_batch(self, model_images: list[Image.Image], stretch: bool = True) -> tuple[list[np.ndarray], str, str]:
+        arrays = []
+        for image in model_images:
+            rgb = np.asarray(image.convert("RGB")).astype(np.float32)
+            distance = np.abs(rgb - np.array([248, 68, 1], dtype=np.float32)).max(axis=2)
+            sigmoid = self.low + (self.high - self.low) / (1.0 + np.exp(-(distance - 60.0) / 8.0))
+            arrays.append(normalize_prediction(sigmoid.astype(np.float32), stretch))
+        return arrays, "cpu", "in-process"
+
+
+def write_refine_control(path: Path) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    image = Image.new("RGB", (768, 768), (248, 68, 1))
+    draw = ImageDraw.Draw(image)
+    draw.ellipse((300, 250, 460, 520), fill=(60, 70, 180))
+    draw.rectangle((360, 200, 384, 300), fill=(230, 220, 200))
+    draw.ellipse((330, 300, 420, 390), fill=(240, 120, 60))
+    image.filter(ImageFilter.GaussianBlur(3)).save(path)
+
+
+def band_edge_steps(arr: np.ndarray, band: np.ndarray) -> np.ndarray:
+    """Absolute steps between 4-neighbours where one side is in the refined band and the other is not."""
+    across = np.abs(np.diff(arr, axis=1))[band[:, 1:] != band[:, :-1]]
+    down = np.abs(np.diff(arr, axis=0))[band[1:, :] != band[:-1, :]]
+    return np.concatenate((across, down))
+
+
+def assert_coarse_to_fine_band_edges(output_dir: Path, report: list[str]) -> None:
+    report.append("## Coarse-To-Fine Band Edges")
+    report.append("")
+    control_path = output_dir / "coarse_to_fine" / "coarse_to_fine_control.png"
+    write_refine_control(control_path)
+    raw = Image.open(control_path)
+    predictor = SigmoidRangePredictor()
+    sizes = REFINE_CONTROL_SIZES
+    reference = predictor.predict_batch([fit_for_model(raw, sizes["input_size"])[0]])[0][0]
+    arrays, _device, _inference, notes = predict_coarse_to_fine(predictor, [raw], sizes["input_size"], sizes["coarse_size"], sizes["window"], 1)
+    if notes[0] == "refined_tiles=full":
+        raise RuntimeError("coarse-to-fine control fell back to a full pass instead of refining tiles")
+    coarse = predictor.predict_batch([fit_for_model(raw, sizes["coarse_size"])[0]], stretch=False)[0][0]
+    band = uncertain_band(normalize_prediction(coarse), sizes["input_size"])
+    # Compare against the full pass's own step at each edge, so a genuinely
+    # steep silhouette does not count as a seam.
+    excess = band_edge_steps(arrays[0], band) - band_edge_steps(reference, band)
+    worst = float(excess.max()) if excess.size else 0.0
+    if worst > MAX_REFINE_BAND_EDGE_STEP:
+        raise RuntimeError(f"coarse-to-fine prediction steps by {worst:.3f} more than the full pass at a refined band edge")
+    if float(arrays[0].min()) != 0.0 or abs(float(arrays[0].max()) - 1.0) > 1e-6:
+        raise RuntimeError("coarse-to-fine prediction is not stretched to 0-1 like a full pass")
+    report.append(
+        f"- PASS coarse-to-fine on a {predictor.low}-{predictor.high} sigmoid stays on the full pass's scale at `{rel(control_path)}`: "
+        f"{notes[0]}, {excess.size} band-edge pairs, worst extra step {worst:.4f} (limit {MAX_REFINE_BAND_EDGE_STEP})."
+    )
+    report.append("")
+
+
+def winding_maze(cells_high: int, cells_wide: int, rng: Any) -> np.ndarray:
+    """A one-pixel-corridor maze from a randomized depth-first walk; True marks the corridors.
+
+    Every corridor is one component whose paths double back on themselves,
+    the worst case for propagation that only grows from the border.
+    """
+    maze = np.zeros((2 * cells_high + 1, 2 * cells_wide + 1), dtype=bool)
+    visited = np.zeros((cells_high, cells_wide), dtype=bool)
+    stack = [(0, 0)]
+    visited[0, 0] = True
+    maze[1, 1] = True
+    while stack:
+        y, x = stack[-1]
+        steps = [(y + dy, x + dx) for dy, dx in ((-1, 0), (1, 0), (0, -1), (0, 1)) if 0 <= y + dy < cells_high and 0 <= x + dx < cells_wide and not visited[y + dy, x + dx]]
+        if not steps:
+            stack.pop()
+            continue
+        ny, nx = steps[int(rng.integers(len(steps)))]
+        visited[ny, nx] = True
+        maze[2 * ny + 1, 2 * nx + 1] = True
+        maze[y + ny + 1, x + nx + 1] = True
+        stack.append((ny, nx))
+    # Open one corridor onto the border so propagation has a seed.
+    maze[0, 1] = True
+    return maze
+
+
+def component_control_masks(rng: Any) -> dict[str, np.ndarray]:
+    masks = {f"random_{density}": rng.random((181, 203)) < density for density in COMPONENT_CONTROL_DENSITIES}
+    maze = winding_maze(48, 56, rng)
+    masks["maze_corridors"] = maze
+    masks["maze_walls"] = ~maze
+    # Knock random holes into the walls so the corridors merge into
+    # separate winding components, some reaching the border only diagonally.
+    masks["maze_broken"] = maze | (rng.random(maze.shape) < 0.04)
+    return masks
+
+
+def assert_component_fallback_parity(output_dir: Path, report: list[str]) -> None:
+    report.append("## Component Fallback Parity")
+    report.append("")
+    ndimage = scipy_ndimage()
+    if ndimage is None:
+        raise RuntimeError("component fallback parity needs scipy.ndimage as its reference")
+    control_path = output_dir / "component_parity" / "component_parity_maze.png"
+    control_path.parent.mkdir(parents=True, exist_ok=True)
+    masks = component_control_masks(np.random.default_rng(COMPONENT_CONTROL_SEED))
+    Image.fromarray(masks["maze_broken"].astype(np.uint8) * 255).save(control_path)
+    components = 0
+    for name, mask in masks.items():
+        for connectivity in (4, 8):
+            structure = ndimage.generate_binary_structure(2, 1 if connectivity == 4 else 2)
+            expected_labels, count = ndimage.label(mask, structure=structure)
+            actual_labels = label_components_fallback(mask, connectivity)
+            if not np.array_equal(expected_labels, actual_labels):
+                mismatched = int(np.count_nonzero(expected_labels != actual_labels))
+                raise RuntimeError(f"label_components_fallback differs from ndimage.label on {name} at {connectivity}-connectivity: {mismatched} pixels")
+            expected_border = ndimage.binary_propagation(border_seed(mask), structure=structure, mask=mask)
+            actual_border = border_connected_fallback(mask, connectivity)
+            if not np.array_equal(expected_border, actual_border):
+                mismatched = int(np.count_nonzero(expected_border != actual_border))
+                raise RuntimeError(f"border_connected_fallback differs from ndimage.binary_propagation on {name} at {connectivity}-connectivity: {mismatched} pixels")
+            components += count
+    report.append(
+        f"- PASS fallback labels and border fill match scipy.ndimage exactly, label numbering included, at 4- and 8-connectivity "
+        f"on {len(masks)} random and winding-maze masks (maze at `{rel(control_path)}`): {components} components compared."
+    )
+    report.append("")
+
+
 def write_report(path: Path, report: list[str]) -> None:
     path.parent.mkdir(parents=True, exist_ok=True)
     path.write_text("\n".join(report).rstrip() + "\n", encoding="utf-8")
@@ -1917,6 +2103,9 @@ def main() -> int:
     assert_synthetic_edge_clean(output_dir, report)
     assert_synthetic_raw_key_hole_clean(output_dir, report)
     assert_proof_matrix_raw_source_gate(output_dir, report)
+    assert_green_spill_decontaminate_parity(output_dir, report)
+    assert_coarse_to_fine_band_edges(output_dir, report)
+    assert_component_fallback_parity(output_dir, report)
     if not args.skip_style:
         metrics_csv = args.metrics_csv if args.metrics_csv is not None else find_latest_metrics_csv()
         if not metrics_csv.is_absolute():
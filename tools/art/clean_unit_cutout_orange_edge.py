@@ -1,24 +1,34 @@
 from __future__ import annotations
 
 import argparse
-import hashlib
 import json
 from pathlib import Path
 
-import numpy as np
-from PIL import Image, ImageDraw, ImageFont
-
 from audit_unit_cutout_orange_fringe import (
     DEFAULT_RAW_KEY_TOLERANCE,
     alpha_edge_band,
+    background_orange_field_residue,
     background_residue_masks,
+    cool_blue_fringe_residue,
+    edge_band_reach,
     raw_background_residue,
     checker,
     safety_orange_residue,
 )
+from unit_art_components import dilate_square
+from unit_art_files import file_sha256
+from unit_art_lazy import lazy_import
+from unit_art_preview import BLACK, WHITE, background_tile
+
+np = lazy_import("numpy")
+Image = lazy_import("PIL.Image")
+ImageDraw = lazy_import("PIL.ImageDraw")
+ImageFont = lazy_import("PIL.ImageFont")
 
 
 ROOT = Path(__file__).resolve().parents[2]
+# Matte-boundary shells the visual fringe clean may peel inward.
+VISUAL_FRINGE_PASSES = 8
 
 
 def rel(path: Path) -> str:
@@ -28,14 +38,6 @@ def rel(path: Path) -> str:
         return str(path)
 
 
-def file_sha256(path: Path) -> str:
-    digest = hashlib.sha256()
-    with path.open("rb") as handle:
-        for chunk in iter(lambda: handle.read(1024 * 1024), b""):
-            digest.update(chunk)
-    return digest.hexdigest()
-
-
 def load_font(size: int) -> ImageFont.ImageFont:
     try:
         return ImageFont.truetype("arial.ttf", size)
@@ -82,29 +84,44 @@ def background_alpha_target_masks(
     raw_source: Image.Image | None,
     raw_key_tolerance: int,
 ) -> tuple[np.ndarray, np.ndarray]:
-    raw_key_target = raw_background_key_target_mask(rgba, raw_source, raw_key_tolerance)
-    cleaned_alpha = rgba[:, :, 3].copy()
-    cleaned_alpha[raw_key_target] = 0
-    visual_target = np.zeros(rgba.shape[:2], dtype=bool)
-    original_alpha = rgba[:, :, 3]
-    original_soft_alpha = (original_alpha > 8) & (original_alpha < 245)
-    original_edge_shell = alpha_edge_band(original_alpha, max(edge_radius * 3, edge_radius))
-    visual_search_shell = (original_alpha > 8) & (original_edge_shell | original_soft_alpha)
-
-    # Clearing one fringe band can expose the next matte boundary. Iterate so the
-    # cleaner and audit agree on a fixed point instead of a single shell. Keep
-    # that iteration inside the original matte boundary so valid interior warm
-    # materials do not get eaten as the edge moves inward.
-    for _index in range(8):
-        target_rgba = rgba.copy()
-        target_rgba[:, :, 3] = cleaned_alpha
-        next_visual = visual_background_fringe_target_mask(target_rgba, edge_radius, raw_source, raw_key_tolerance)
-        next_visual &= visual_search_shell
-        next_visual &= ~visual_target
-        if not np.any(next_visual):
+    """Raw-key pixels to clear, and the visual fringe peeled off the matte boundary.
+
+    Clearing one fringe band can expose the next matte boundary, so the
+    visual target is the fixed point of repeatedly clearing
+    visual_background_fringe_target_mask for up to VISUAL_FRINGE_PASSES
+    shells, kept inside the original matte boundary so valid interior warm
+    materials do not get eaten as the edge moves inward. Only the edge band
+    depends on the shrinking alpha: the raw key, the colour tests and soft
+    alpha are computed once, and a still-visible fringe candidate joins the
+    target one pass after a pixel within the edge band's reach was cleared.
+    """
+    alpha = rgba[:, :, 3]
+    if raw_source is None:
+        return np.zeros(alpha.shape, dtype=bool), np.zeros(alpha.shape, dtype=bool)
+    raw = raw_source.convert("RGB")
+    if raw.size != (rgba.shape[1], rgba.shape[0]):
+        raise ValueError("raw source and cutout image have different sizes")
+    raw_key = raw_background_residue(np.asarray(raw), raw_key_tolerance)
+    raw_key_target = raw_key & (alpha > 0)
+
+    # background_residue_masks' visual_fringe with everything but the edge band fixed.
+    rgb = rgba[:, :, :3]
+    soft_alpha = (alpha > 8) & (alpha < 245)
+    orange_field = background_orange_field_residue(rgb)
+    fringe_colour = (orange_field & safety_orange_residue(rgb)) | (raw_key & (orange_field | cool_blue_fringe_residue(rgb) | soft_alpha))
+    visible = (alpha > 8) & ~raw_key_target
+    search_shell = (alpha > 8) & (alpha_edge_band(alpha, max(edge_radius * 3, edge_radius)) | soft_alpha)
+    candidates = visible & fringe_colour & search_shell
+
+    # A visible pixel is in the edge band once anything within reach is not visible.
+    reach = edge_band_reach(edge_radius)
+    visual_target = candidates & (soft_alpha | dilate_square(~visible, reach))
+    cleared = visual_target
+    for _index in range(VISUAL_FRINGE_PASSES - 1):
+        if not np.any(cleared):
             break
-        visual_target |= next_visual
-        cleaned_alpha[next_visual] = 0
+        cleared = candidates & ~visual_target & dilate_square(cleared, reach)
+        visual_target |= cleared
     return raw_key_target, visual_target
 
 
@@ -376,8 +393,8 @@ def write_review_sheet(
     raw_key_tolerance: int = DEFAULT_RAW_KEY_TOLERANCE,
 ) -> None:
     size = (260, 260)
-    black = Image.new("RGBA", size, (0, 0, 0, 255))
-    white = Image.new("RGBA", size, (255, 255, 255, 255))
+    black = background_tile(size, BLACK)
+    white = background_tile(size, WHITE)
     check = checker(size)
     tiles = [
         label_tile(preview(before, check, size), "before checker"),
@@ -3,25 +3,19 @@ from __future__ import annotations
 import argparse
 from pathlib import Path
 
-import numpy as np
-from PIL import Image, ImageDraw
+from unit_art_birefnet import is_probability_map, load_probability_map
+from unit_art_lazy import lazy_import
+from unit_art_preview import BLACK, CLEAR, REVIEW_CHECKER, WHITE, PreviewPyramid, background_tile, scaled_tile
 
+np = lazy_import("numpy")
+Image = lazy_import("PIL.Image")
+ImageDraw = lazy_import("PIL.ImageDraw")
 
-def checker(size: tuple[int, int], tile: int = 32) -> Image.Image:
-    width, height = size
-    out = Image.new("RGBA", size, (46, 50, 60, 255))
-    draw = ImageDraw.Draw(out)
-    for y in range(0, height, tile):
-        for x in range(0, width, tile):
-            if (x // tile + y // tile) % 2 == 0:
-                draw.rectangle((x, y, x + tile - 1, y + tile - 1), fill=(25, 28, 36, 255))
-    return out
 
-
-def preview_tile(cutout: Image.Image, background: Image.Image, label: str, tile_size: int) -> Image.Image:
+def preview_tile(cutout: PreviewPyramid, background: Image.Image, label: str, tile_size: int) -> Image.Image:
     tile = Image.new("RGBA", (tile_size, tile_size + 46), (18, 19, 24, 255))
-    bg = background.resize((tile_size, tile_size), Image.Resampling.BICUBIC).convert("RGBA")
-    fg = cutout.resize((tile_size, tile_size), Image.Resampling.LANCZOS)
+    bg = background.copy()
+    fg = cutout.resize((tile_size, tile_size))
     bg.alpha_composite(fg)
     tile.alpha_composite(bg, (0, 0))
     draw = ImageDraw.Draw(tile)
@@ -32,15 +26,18 @@ def preview_tile(cutout: Image.Image, background: Image.Image, label: str, tile_
 
 def make_review(raw: Image.Image, mask: Image.Image, cutout: Image.Image, output: Path) -> None:
     tile_size = 384
-    raw_tile = preview_tile(raw.convert("RGBA"), Image.new("RGBA", raw.size, (0, 0, 0, 0)), "raw", tile_size)
+    raw_tile = preview_tile(PreviewPyramid(raw), background_tile((tile_size, tile_size), CLEAR), "raw", tile_size)
     mask_rgba = Image.merge("RGBA", (mask, mask, mask, Image.new("L", mask.size, 255)))
-    mask_tile = preview_tile(mask_rgba, Image.new("RGBA", mask.size, (0, 0, 0, 0)), "combined alpha", tile_size)
+    mask_tile = preview_tile(PreviewPyramid(mask_rgba), background_tile((tile_size, tile_size), CLEAR), "combined alpha", tile_size)
+    cutout_pyramid = PreviewPyramid(cutout)
+    tile_box = (tile_size, tile_size)
+    check = scaled_tile(32, cutout.width, tile_size)
     tiles = [
         raw_tile,
         mask_tile,
-        preview_tile(cutout, checker(cutout.size), "checker preview", tile_size),
-        preview_tile(cutout, Image.new("RGBA", cutout.size, (0, 0, 0, 255)), "black preview", tile_size),
-        preview_tile(cutout, Image.new("RGBA", cutout.size, (255, 255, 255, 255)), "white preview", tile_size),
+        preview_tile(cutout_pyramid, background_tile(tile_box, REVIEW_CHECKER, check), "checker preview", tile_size),
+        preview_tile(cutout_pyramid, background_tile(tile_box, BLACK), "black preview", tile_size),
+        preview_tile(cutout_pyramid, background_tile(tile_box, WHITE), "white preview", tile_size),
     ]
     sheet = Image.new("RGBA", (tile_size * len(tiles), tile_size + 46), (18, 19, 24, 255))
     for index, tile in enumerate(tiles):
@@ -49,11 +46,23 @@ def make_review(raw: Image.Image, mask: Image.Image, cutout: Image.Image, output
     sheet.save(output)
 
 
+def load_alpha(path: Path, size: tuple[int, int], resample: int) -> np.ndarray:
+    """An 8-bit mask or a remove_unit_background_birefnet.py probability map as float32 alpha in 0-1."""
+    if is_probability_map(path):
+        return load_probability_map(path, size, resample)
+    return np.asarray(Image.open(path).convert("L").resize(size, resample)).astype(np.float32) / 255
+
+
 def main() -> int:
     parser = argparse.ArgumentParser()
     parser.add_argument("--source", required=True, type=Path)
-    parser.add_argument("--primary-mask", required=True, type=Path)
-    parser.add_argument("--rescue-mask", required=True, type=Path)
+    parser.add_argument(
+        "--primary-mask",
+        required=True,
+        type=Path,
+        help="8-bit mask, or a --probability-output map (.npy or 16-bit PNG) to combine at full precision and quantize once.",
+    )
+    parser.add_argument("--rescue-mask", required=True, type=Path, help="8-bit mask or probability map.")
     parser.add_argument("--output", required=True, type=Path)
     parser.add_argument("--mask-output", required=True, type=Path)
     parser.add_argument("--review-output", type=Path)
@@ -61,11 +70,8 @@ def main() -> int:
     args = parser.parse_args()
 
     source = Image.open(args.source).convert("RGBA")
-    primary = Image.open(args.primary_mask).convert("L").resize(source.size, Image.Resampling.LANCZOS)
-    rescue = Image.open(args.rescue_mask).convert("L").resize(source.size, Image.Resampling.NEAREST)
-
-    primary_arr = np.asarray(primary).astype(np.uint8)
-    rescue_arr = np.asarray(rescue).astype(np.uint8)
+    primary_arr = load_alpha(args.primary_mask, source.size, Image.Resampling.LANCZOS)
+    rescue_arr = load_alpha(args.rescue_mask, source.size, Image.Resampling.NEAREST)
     if args.mode == "union":
         alpha_arr = np.maximum(primary_arr, rescue_arr)
     elif args.mode == "primary":
@@ -73,7 +79,8 @@ def main() -> int:
     else:
         alpha_arr = rescue_arr
 
-    alpha = Image.fromarray(alpha_arr, "L")
+    # 8-bit inputs round-trip exactly, so only probability maps change the result.
+    alpha = Image.fromarray(np.rint(alpha_arr * 255).astype(np.uint8), "L")
     cutout = source.copy()
     cutout.putalpha(alpha)
 
@@ -0,0 +1,143 @@
+from __future__ import annotations
+
+import argparse
+import json
+from datetime import date
+from pathlib import Path
+
+from unit_art_birefnet import (
+    DEFAULT_MODEL,
+    DEFAULT_REVISION,
+    ONNX_MASK_TOLERANCE,
+    ONNX_OPSET,
+    BiRefNetSession,
+    OnnxSession,
+    default_onnx_path,
+    extract_prediction,
+    onnx_metadata_path,
+)
+from unit_art_files import file_sha256
+from unit_art_lazy import lazy_import
+
+np = lazy_import("numpy")
+Image = lazy_import("PIL.Image")
+
+
+def register_deform_conv_exporter() -> bool:
+    """Use the BiRefNet authors' deform_conv2d exporter when it is installed.
+
+    It lets opsets below 19 export the decoder's deformable convolutions;
+    without it torch needs opset 19's native DeformConv.
+    """
+    try:
+        import deform_conv2d_onnx_exporter
+    except ImportError:
+        return False
+    deform_conv2d_onnx_exporter.register_deform_conv2d_onnx_op()
+    return True
+
+
+def export_graph(session: BiRefNetSession, output: Path, input_size: int, opset: int) -> None:
+    import torch
+
+    class PredictionGraph(torch.nn.Module):
+        def __init__(self, model: torch.nn.Module) -> None:
+            super().__init__()
+            self.model = model
+
+        def forward(self, image: torch.Tensor) -> torch.Tensor:
+            return extract_prediction(self.model(image)).sigmoid()
+
+    graph = PredictionGraph(session.model.to("cpu")).eval()
+    sample = torch.zeros((1, 3, input_size, input_size), dtype=torch.float32)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with torch.no_grad():
+        torch.onnx.export(
+            graph,
+            (sample,),
+            str(output),
+            input_names=["image"],
+            output_names=["prediction"],
+            dynamic_axes={"image": {0: "batch"}, "prediction": {0: "batch"}},
+            opset_version=opset,
+            do_constant_folding=True,
+        )
+
+
+def mask_levels(arr: np.ndarray) -> np.ndarray:
+    # The same 8-bit quantization remove_unit_background_birefnet.py applies before resizing.
+    return (arr * 255).astype(np.uint8)
+
+
+def compare_backends(torch_session: BiRefNetSession, onnx_session: OnnxSession, image_path: Path, input_size: int) -> dict[str, object]:
+    model_image = Image.open(image_path).convert("RGB").resize((input_size, input_size), Image.Resampling.BICUBIC)
+    reference = torch_session.predict(model_image)
+    candidate = onnx_session.predict(model_image)
+    delta = np.abs(mask_levels(reference).astype(np.int16) - mask_levels(candidate).astype(np.int16))
+    return {
+        "image": str(image_path),
+        "probability_max_abs_diff": round(float(np.max(np.abs(reference - candidate))), 6),
+        "mask_max_level_diff": int(delta.max()),
+        "mask_changed_fraction": round(float(np.count_nonzero(delta)) / delta.size, 6),
+        "tolerance_levels": ONNX_MASK_TOLERANCE,
+        "status": "pass" if int(delta.max()) <= ONNX_MASK_TOLERANCE else "fail",
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description=(
+            "Export a BiRefNet checkpoint to ONNX once for remove_unit_background_birefnet.py --backend onnxruntime. "
+            "A JSON sidecar records the model, revision, input size and parity checks."
+        )
+    )
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    parser.add_argument("--model-revision", default=DEFAULT_REVISION)
+    parser.add_argument("--input-size", type=int, default=1024)
+    parser.add_argument("--output", type=Path, help="Graph path (default: the path --backend onnxruntime looks for).")
+    parser.add_argument("--opset", type=int, default=ONNX_OPSET)
+    parser.add_argument(
+        "--verify-image",
+        type=Path,
+        action="append",
+        default=[],
+        help=f"Raw source to run through both backends; export fails if any mask differs by more than {ONNX_MASK_TOLERANCE} levels (provisional, not yet validated). Repeatable.",
+    )
+    args = parser.parse_args()
+
+    output = args.output or default_onnx_path(args.model, args.model_revision)
+    custom_deform_conv = register_deform_conv_exporter()
+    if args.opset < 19 and not custom_deform_conv:
+        parser.error("opsets below 19 need the deform_conv2d_onnx_exporter package for BiRefNet's deformable convolutions")
+
+    session = BiRefNetSession(args.model, "cpu", args.model_revision)
+    export_graph(session, output, args.input_size, args.opset)
+    metadata = {
+        "schema_version": 1,
+        "tool": "export_unit_birefnet_onnx.py",
+        "exported": date.today().isoformat(),
+        "model": args.model,
+        "revision": args.model_revision,
+        "input_size": args.input_size,
+        "opset": args.opset,
+        "custom_deform_conv_exporter": custom_deform_conv,
+        "onnx_sha256": file_sha256(output),
+        "checks": [],
+    }
+    metadata_path = onnx_metadata_path(output)
+    metadata_path.write_text(json.dumps(metadata, indent=2) + "\n", encoding="utf-8")
+
+    if args.verify_image:
+        onnx_session = OnnxSession(output, args.model, args.model_revision)
+        metadata["checks"] = [compare_backends(session, onnx_session, path, args.input_size) for path in args.verify_image]
+        metadata_path.write_text(json.dumps(metadata, indent=2) + "\n", encoding="utf-8")
+
+    print(f"onnx={output}")
+    print(f"metadata={metadata_path}")
+    for check in metadata["checks"]:
+        print(f"{check['status'].upper()} {check['image']}: mask_max_level_diff={check['mask_max_level_diff']} changed={check['mask_changed_fraction']}")
+    return 1 if any(check["status"] != "pass" for check in metadata["checks"]) else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
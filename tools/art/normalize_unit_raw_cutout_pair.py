@@ -4,8 +4,10 @@ import argparse
 import json
 from pathlib import Path
 
-import numpy as np
-from PIL import Image
+from unit_art_lazy import lazy_import
+
+np = lazy_import("numpy")
+Image = lazy_import("PIL.Image")
 
 
 ROOT = Path(__file__).resolve().parents[2]
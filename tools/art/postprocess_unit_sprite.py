@@ -1,58 +1,88 @@
 from __future__ import annotations
 
 import argparse
+import glob
+import json
+import os
+import time
 from collections import deque
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import asdict, dataclass
 from pathlib import Path
 
-from PIL import Image, ImageChops, ImageFilter
+from unit_art_components import StripComponents, border_connected, dilate_square, label_components
+from unit_art_lazy import lazy_import
+from unit_art_metrics import RunMeter, StageTimings, profile_percentiles
+from unit_art_preview import SPRITE_CHECKER, PreviewPyramid, background_tile, fit_size
+from unit_art_strips import RowBits, RowStrip, StripResize, row_strips
 
+np = lazy_import("numpy")
+Image = lazy_import("PIL.Image")
+ImageFilter = lazy_import("PIL.ImageFilter")
 
-def is_green_screen(pixel: tuple[int, int, int, int]) -> bool:
-	r, g, b, a = pixel
-	if a < 8:
-		return True
-	return g >= 64 and g >= int(r * 1.08) and g >= int(b * 1.02) and (g - min(r, b)) >= 12
 
+BATCH_SOURCE_SUFFIXES = {".png", ".jpg", ".jpeg", ".webp"}
+# GaussianBlur(1.25) reads fewer than 8 rows on either side of a pixel.
+STRIP_BLUR_HALO = 8
+# First halo tried around a strip for component-based stages; doubled while a
+# component that reaches the core is still undecided at the window edge.
+STRIP_COMPONENT_HALO = 32
 
-def flood_background(image: Image.Image) -> Image.Image:
-	rgba = image.convert("RGBA")
-	width, height = rgba.size
-	pixels = rgba.load()
-	mask = Image.new("L", rgba.size, 0)
-	mask_pixels = mask.load()
-	queue: deque[tuple[int, int]] = deque()
 
-	for x in range(width):
-		queue.append((x, 0))
-		queue.append((x, height - 1))
-	for y in range(height):
-		queue.append((0, y))
-		queue.append((width - 1, y))
+@dataclass(frozen=True)
+class PostprocessSettings:
+	canvas_size: int = 1024
+	padding: int = 56
+	min_alpha_island_area: int = 96
+	solid_alpha_threshold: int = 176
+	solid_keep_radius: int = 0
+	crop_first: bool = False
+	crop_halo: int = 8
+	strip_rows: int = 0
 
-	while queue:
-		x, y = queue.popleft()
-		if x < 0 or y < 0 or x >= width or y >= height:
-			continue
-		if mask_pixels[x, y] != 0:
-			continue
-		if not is_green_screen(pixels[x, y]):
-			continue
-		mask_pixels[x, y] = 255
-		queue.append((x + 1, y))
-		queue.append((x - 1, y))
-		queue.append((x, y + 1))
-		queue.append((x, y - 1))
 
-	return mask
+@dataclass(frozen=True)
+class BatchJob:
+	input: Path
+	output: Path
+	preview: Path | None = None
+
+
+def green_screen_mask(rgba: np.ndarray) -> np.ndarray:
+	# floor(v * 1.08) == v * 108 // 100 for every 8-bit v, so the ratio tests
+	# stay in int16 instead of going through float64 temporaries.
+	red = rgba[:, :, 0].astype(np.int16)
+	green = rgba[:, :, 1].astype(np.int16)
+	blue = rgba[:, :, 2].astype(np.int16)
+	alpha = rgba[:, :, 3]
+	keyed = (
+		(green >= 64)
+		& (green >= red * 108 // 100)
+		& (green >= blue * 102 // 100)
+		& ((green - np.minimum(red, blue)) >= 12)
+	)
+	return (alpha < 8) | keyed
+
+
+def soften_background(background: np.ndarray) -> np.ndarray:
+	mask = Image.fromarray(np.multiply(background, 255, dtype=np.uint8), "L")
+	return np.asarray(mask.filter(ImageFilter.GaussianBlur(1.25)))
+
+
+def key_green_screen(rgba: np.ndarray) -> int:
+	"""Replace alpha in place with the softened inverse of the border-connected green screen.
+
+	Returns the number of flooded background pixels.
+	"""
+	background = border_connected(green_screen_mask(rgba))
+	np.subtract(255, soften_background(background), out=rgba[:, :, 3])
+	return int(np.count_nonzero(background))
 
 
 def transparent_from_green_screen(source: Image.Image) -> Image.Image:
-	rgba = source.convert("RGBA")
-	background = flood_background(rgba)
-	soft_background = background.filter(ImageFilter.GaussianBlur(1.25))
-	alpha = ImageChops.subtract(Image.new("L", rgba.size, 255), soft_background)
-	rgba.putalpha(alpha)
-	return rgba
+	rgba = np.array(source.convert("RGBA"))
+	key_green_screen(rgba)
+	return Image.fromarray(rgba, "RGBA")
 
 
 def is_green_spill(pixel: tuple[int, int, int, int]) -> bool:
@@ -75,7 +105,153 @@ def neutralize_green_spill(pixel: tuple[int, int, int, int]) -> tuple[int, int,
 	return (r, g, b, a)
 
 
+def green_spill_mask(rgba: np.ndarray) -> np.ndarray:
+	red = rgba[:, :, 0].astype(np.int16)
+	green = rgba[:, :, 1].astype(np.int16)
+	blue = rgba[:, :, 2].astype(np.int16)
+	alpha = rgba[:, :, 3]
+	peak = np.maximum(red, blue)
+	translucent_spill = (alpha < 128) & (green >= peak + 6)
+	keyed_spill = (green >= red * 108 // 100) & (green >= blue * 105 // 100) & ((green - peak) >= 14)
+	return (alpha > 0) & (green >= 56) & (translucent_spill | keyed_spill)
+
+
+def neutralize_green_spill_pixels(rgba: np.ndarray, target: np.ndarray) -> None:
+	peak = np.maximum(rgba[:, :, 0], rgba[:, :, 2])
+	clear = target & (rgba[:, :, 3] < 96)
+	clamp = target & ~clear & (rgba[:, :, 1].astype(np.int16) > peak.astype(np.int16) + 8)
+	rgba[:, :, 1][clamp] = peak[clamp]
+	rgba[clear] = 0
+
+
+def decontaminate_green_spill_pixels(rgba: np.ndarray) -> int:
+	"""Fill and neutralize green spill in place; returns the number of spill pixels found."""
+	rgba[rgba[:, :, 3] == 0] = 0
+	unknown = green_spill_mask(rgba)
+	spill = int(np.count_nonzero(unknown))
+	if spill:
+		fill_green_spill_queue(rgba, unknown)
+	neutralize_green_spill_pixels(rgba, green_spill_mask(rgba))
+	return spill
+
+
 def decontaminate_green_spill(sprite: Image.Image) -> Image.Image:
+	rgba = np.array(sprite.convert("RGBA"))
+	decontaminate_green_spill_pixels(rgba)
+	return Image.fromarray(rgba, "RGBA")
+
+
+def fill_green_spill_queue(rgba: np.ndarray, unknown: np.ndarray, reach: np.ndarray | None = None) -> None:
+	"""Fill spill pixels exactly as decontaminate_green_spill_reference's queue does, one queue generation at a time.
+
+	Generation 0 is the reference's seed queue in raster order; each later
+	generation holds the entries pushed while the previous one drained, in
+	push order. Inside a generation a pixel fills on its first entry that
+	finds a colour source, and averages every source known at that moment,
+	including neighbours filled earlier in the same generation.
+	"""
+	height, width = unknown.shape
+	stride = width + 2
+	# Work on flat arrays with a one-pixel empty border so neighbour offsets
+	# never wrap.
+	padded = np.zeros((height + 2, stride, 4), dtype=np.uint8)
+	padded[1:-1, 1:-1] = rgba
+	flat = padded.reshape(-1, 4)
+	pending = np.zeros((height + 2, stride), dtype=bool)
+	pending[1:-1, 1:-1] = unknown
+	pending = pending.ravel()
+	alpha = flat[:, 3]
+	known = (alpha > 0) & ~pending
+	source = known & (alpha > 8)
+	# The reference visits (x + 1, y), (x - 1, y), (x, y + 1), (x, y - 1).
+	offsets = np.array([1, -1, stride, -stride])
+	# Optional per-pixel dependency reach (-1 where nothing filled): the
+	# longest chain of filled pixels a fill read through, or its generation
+	# if that is larger. The strip mode uses it to tell whether a window
+	# saw everything a core pixel depends on.
+	depth = np.full(pending.shape, -1, dtype=np.int32) if reach is not None else None
+
+	candidates = np.flatnonzero(pending)
+	entries = candidates[np.any(known[candidates[:, None] + offsets[None, :]], axis=1)]
+	generation = 0
+	while entries.size:
+		never = entries.size
+		pixels, first = np.unique(entries, return_index=True)
+		neighbours = pixels[:, None] + offsets[None, :]
+		slots = np.minimum(np.searchsorted(pixels, neighbours), pixels.size - 1)
+		in_generation = pixels[slots] == neighbours
+		opaque = alpha[pixels] >= 96
+		fill_at = np.where(np.any(source[neighbours], axis=1), first, never)
+		waiting = np.flatnonzero(fill_at == never)
+		if waiting.size:
+			# A pixel with no source at the start of the generation fills on
+			# its first entry after an opaque neighbour filled; repeat until
+			# those chains settle.
+			order = np.lexsort((np.arange(entries.size), entries))
+			keys = entries[order].astype(np.int64) * (never + 1) + order
+			lifts = in_generation[waiting] & opaque[slots[waiting]]
+			while True:
+				after = np.where(lifts, fill_at[slots[waiting]], never).min(axis=1)
+				query = pixels[waiting].astype(np.int64) * (never + 1) + after + 1
+				found = np.minimum(np.searchsorted(keys, query), keys.size - 1)
+				hit = (after < never) & (keys[found] >= query) & (keys[found] // (never + 1) == pixels[waiting])
+				settled = np.where(hit, keys[found] % (never + 1), never)
+				if np.array_equal(settled, fill_at[waiting]):
+					break
+				fill_at[waiting] = settled
+
+		filled = np.flatnonzero(fill_at < never)
+		filled = filled[np.argsort(fill_at[filled], kind="stable")]
+		targets = pixels[filled]
+		around = neighbours[filled]
+		# Sources at fill time: those known when the generation started, plus
+		# opaque neighbours this generation filled earlier.
+		earlier = in_generation[filled] & opaque[slots[filled]] & (fill_at[slots[filled]] < fill_at[filled][:, None])
+		weights = source[around] | earlier
+		row_of = np.full(pixels.size, -1, dtype=np.int64)
+		row_of[filled] = np.arange(filled.size)
+		needs = np.where(earlier, row_of[slots[filled]], -1)
+		done = np.zeros(filled.size + 1, dtype=bool)
+		done[-1] = True
+		remaining = np.arange(filled.size)
+		# Fill in dependency levels so each pixel reads the final colour of
+		# every same-generation source it follows.
+		while remaining.size:
+			ready = np.all(done[needs[remaining]], axis=1)
+			rows = remaining[ready]
+			row_weights = weights[rows]
+			counts = np.count_nonzero(row_weights, axis=1)
+			sums = np.einsum("ij,ijk->ik", row_weights.astype(np.int32), flat[around[rows], :3].astype(np.int32))
+			colours = flat[targets[rows]].copy()
+			colours[:, :3] = sums // counts[:, None]
+			peak = np.maximum(colours[:, 0], colours[:, 2])
+			clamp = colours[:, 1].astype(np.int16) > peak.astype(np.int16) + 8
+			colours[clamp, 1] = peak[clamp]
+			colours[colours[:, 3] < 96] = 0
+			flat[targets[rows]] = colours
+			if depth is not None:
+				chained = np.where(row_weights, depth[around[rows]], -1).max(axis=1) + 1
+				depth[targets[rows]] = np.maximum(chained, generation)
+			done[rows] = True
+			remaining = remaining[~ready]
+
+		pending[targets] = False
+		known[targets] = True
+		source[targets] = opaque[filled]
+		# Each fill pushes its still-unknown neighbours in visiting order;
+		# entries for pixels filled later in this generation would be skipped.
+		pushed = around.ravel()
+		entries = pushed[pending[pushed]]
+		generation += 1
+
+	rgba[:] = padded[1:-1, 1:-1]
+	neutralize_green_spill_pixels(rgba, pending.reshape(height + 2, stride)[1:-1, 1:-1])
+	if reach is not None:
+		reach[:] = depth.reshape(height + 2, stride)[1:-1, 1:-1]
+
+
+def decontaminate_green_spill_reference(sprite: Image.Image) -> Image.Image:
+	# Per-pixel BFS kept as the parity reference for decontaminate_green_spill.
 	rgba = sprite.convert("RGBA")
 	width, height = rgba.size
 	pixels = rgba.load()
@@ -158,118 +334,75 @@ def decontaminate_green_spill(sprite: Image.Image) -> Image.Image:
 	return rgba
 
 
-def center_on_canvas(sprite: Image.Image, canvas_size: int, padding: int) -> Image.Image:
-	alpha = sprite.getchannel("A")
-	bbox = alpha.getbbox()
+def alpha_bbox(alpha: np.ndarray) -> tuple[int, int, int, int] | None:
+	"""Return the Image.getbbox-style box of nonzero alpha, or None when empty."""
+	rows = np.flatnonzero(alpha.any(axis=1))
+	if rows.size == 0:
+		return None
+	cols = np.flatnonzero(alpha.any(axis=0))
+	return int(cols[0]), int(rows[0]), int(cols[-1]) + 1, int(rows[-1]) + 1
+
+
+def center_on_canvas(rgba: np.ndarray, canvas_size: int, padding: int) -> np.ndarray:
+	bbox = alpha_bbox(rgba[:, :, 3])
 	if bbox is None:
-		return Image.new("RGBA", (canvas_size, canvas_size), (0, 0, 0, 0))
+		return np.zeros((canvas_size, canvas_size, 4), dtype=np.uint8)
 
-	cropped = sprite.crop(bbox)
+	# Resampling is the one stage that needs Pillow; it reads only the
+	# subject box and the result is pasted straight into the canvas array.
+	left, top, right, bottom = bbox
+	cropped = Image.fromarray(rgba[top:bottom, left:right], "RGBA")
 	max_size = max(1, canvas_size - padding * 2)
 	cropped.thumbnail((max_size, max_size), Image.Resampling.LANCZOS)
-
-	canvas = Image.new("RGBA", (canvas_size, canvas_size), (0, 0, 0, 0))
-	x = (canvas_size - cropped.width) // 2
-	y = canvas_size - padding - cropped.height
-	canvas.alpha_composite(cropped, (x, y))
+	return paste_on_canvas(np.asarray(cropped), canvas_size, padding)
+
+
+def paste_on_canvas(sprite: np.ndarray, canvas_size: int, padding: int) -> np.ndarray:
+	canvas = np.zeros((canvas_size, canvas_size, 4), dtype=np.uint8)
+	height, width = sprite.shape[:2]
+	x = (canvas_size - width) // 2
+	y = canvas_size - padding - height
+	if x < 0 or y < 0:
+		raise ValueError("Destination must be non-negative")
+	# Compositing onto a clear canvas keeps every pixel as-is apart from
+	# zeroing fully transparent ones, so a masked copy gives the same result.
+	target = canvas[y:y + height, x:x + width]
+	target[:] = sprite
+	target[sprite[:, :, 3] == 0] = 0
 	return canvas
 
 
-def remove_small_alpha_islands(sprite: Image.Image, min_area: int) -> Image.Image:
+def remove_small_alpha_islands(rgba: np.ndarray, min_area: int) -> int:
+	"""Clear alpha of components smaller than min_area in place; returns how many were removed."""
 	if min_area <= 0:
-		return sprite
-
-	rgba = sprite.convert("RGBA")
-	width, height = rgba.size
-	alpha = rgba.getchannel("A")
-	alpha_pixels = alpha.load()
-	visited = bytearray(width * height)
-	to_clear: list[tuple[int, int]] = []
-
-	for y in range(height):
-		for x in range(width):
-			index = y * width + x
-			if visited[index] or alpha_pixels[x, y] <= 20:
-				continue
-
-			component: list[tuple[int, int]] = []
-			queue: deque[tuple[int, int]] = deque([(x, y)])
-			visited[index] = 1
-			while queue:
-				cx, cy = queue.popleft()
-				component.append((cx, cy))
-				for nx, ny in ((cx + 1, cy), (cx - 1, cy), (cx, cy + 1), (cx, cy - 1)):
-					if nx < 0 or ny < 0 or nx >= width or ny >= height:
-						continue
-					next_index = ny * width + nx
-					if visited[next_index] or alpha_pixels[nx, ny] <= 20:
-						continue
-					visited[next_index] = 1
-					queue.append((nx, ny))
-
-			if len(component) < min_area:
-				to_clear.extend(component)
-
-	if not to_clear:
-		return rgba
+		return 0
 
-	pixels = rgba.load()
-	for x, y in to_clear:
-		r, g, b, _a = pixels[x, y]
-		pixels[x, y] = (r, g, b, 0)
-	return rgba
+	components = label_components(rgba[:, :, 3] > 20)
+	small = components.areas < min_area
+	small[0] = False
+	removed = int(np.count_nonzero(small))
+	if removed:
+		rgba[:, :, 3][small[components.labels]] = 0
+	return removed
 
 
-def largest_mask_component(mask: Image.Image) -> Image.Image:
-	width, height = mask.size
-	mask_pixels = mask.load()
-	visited = bytearray(width * height)
-	largest: list[tuple[int, int]] = []
+def largest_mask_component(mask: np.ndarray) -> np.ndarray:
+	components = label_components(mask)
+	largest = components.largest_label()
+	if largest == 0:
+		return np.zeros(mask.shape, dtype=bool)
+	return components.labels == largest
 
-	for y in range(height):
-		for x in range(width):
-			index = y * width + x
-			if visited[index] or mask_pixels[x, y] == 0:
-				continue
 
-			component: list[tuple[int, int]] = []
-			queue: deque[tuple[int, int]] = deque([(x, y)])
-			visited[index] = 1
-			while queue:
-				cx, cy = queue.popleft()
-				component.append((cx, cy))
-				for nx, ny in ((cx + 1, cy), (cx - 1, cy), (cx, cy + 1), (cx, cy - 1)):
-					if nx < 0 or ny < 0 or nx >= width or ny >= height:
-						continue
-					next_index = ny * width + nx
-					if visited[next_index] or mask_pixels[nx, ny] == 0:
-						continue
-					visited[next_index] = 1
-					queue.append((nx, ny))
-
-			if len(component) > len(largest):
-				largest = component
-
-	clean = Image.new("L", mask.size, 0)
-	clean_pixels = clean.load()
-	for x, y in largest:
-		clean_pixels[x, y] = 255
-	return clean
-
-
-def keep_near_solid_alpha(sprite: Image.Image, threshold: int, radius: int) -> Image.Image:
+def keep_near_solid_alpha(rgba: np.ndarray, threshold: int, radius: int) -> int:
+	"""Clear alpha in place outside ``radius`` of the largest solid component; returns pixels cleared."""
 	if radius <= 0:
-		return sprite
+		return 0
 
-	rgba = sprite.convert("RGBA")
-	alpha = rgba.getchannel("A")
-	solid = alpha.point(lambda value: 255 if value >= threshold else 0)
-	solid = largest_mask_component(solid)
-	size = radius * 2 + 1
-	keep = solid.filter(ImageFilter.MaxFilter(size))
-	filtered_alpha = ImageChops.multiply(alpha, keep)
-	rgba.putalpha(filtered_alpha)
-	return rgba
+	alpha = rgba[:, :, 3]
+	drop = ~dilate_square(largest_mask_component(alpha >= threshold), radius) & (alpha > 0)
+	alpha[drop] = 0
+	return int(np.count_nonzero(drop))
 
 
 def make_preview(sprite: Image.Image, output_path: Path) -> None:
@@ -279,52 +412,584 @@ def make_preview(sprite: Image.Image, output_path: Path) -> None:
 	width = sum(tile_sizes) + padding * (len(tile_sizes) + 1)
 	height = max(tile_sizes) + padding * 2 + label_h
 	preview = Image.new("RGBA", (width, height), (18, 19, 22, 255))
+	pyramid = PreviewPyramid(sprite)
 	x = padding
 	for tile_size in tile_sizes:
-		tile = Image.new("RGBA", (tile_size, tile_size), (31, 34, 38, 255))
-		check = Image.new("RGBA", (tile_size, tile_size), (0, 0, 0, 0))
-		for yy in range(0, tile_size, 12):
-			for xx in range(0, tile_size, 12):
-				if ((xx // 12) + (yy // 12)) % 2 == 0:
-					for py in range(yy, min(yy + 12, tile_size)):
-						for px in range(xx, min(xx + 12, tile_size)):
-							check.putpixel((px, py), (43, 47, 52, 255))
-		tile.alpha_composite(check)
-		unit = sprite.copy()
-		unit.thumbnail((tile_size, tile_size), Image.Resampling.LANCZOS)
+		tile = background_tile((tile_size, tile_size), SPRITE_CHECKER, 12)
+		unit = pyramid.thumbnail((tile_size, tile_size))
 		tile.alpha_composite(unit, ((tile_size - unit.width) // 2, tile_size - unit.height))
 		preview.alpha_composite(tile, (x, padding))
 		x += tile_size + padding
 	preview.save(output_path)
 
 
-def main() -> None:
+def postprocess_sprite(source: Image.Image, settings: PostprocessSettings, timings: StageTimings | None = None) -> Image.Image:
+	timings = timings if timings is not None else StageTimings()
+	if settings.strip_rows > 0:
+		canvas = postprocess_pixels_strips(source, settings, timings)
+	else:
+		with timings.stage("load"):
+			rgba = np.array(source.convert("RGBA"))
+		canvas = postprocess_pixels(rgba, settings, timings)
+	return Image.fromarray(canvas, "RGBA")
+
+
+def postprocess_pixels(rgba: np.ndarray, settings: PostprocessSettings, timings: StageTimings) -> np.ndarray:
+	"""Run the sprite stages on one RGBA uint8 frame, mutating it in place, and return the canvas."""
+	with timings.stage("flood"):
+		timings.count("pixels_flooded", key_green_screen(rgba))
+	if settings.crop_first:
+		return postprocess_pixels_crop_first(rgba, settings, timings)
+	clean_cutout_pixels(rgba, settings, timings)
+	return finish_on_canvas(rgba, settings, timings)
+
+
+def clean_cutout_pixels(rgba: np.ndarray, settings: PostprocessSettings, timings: StageTimings) -> None:
+	with timings.stage("islands"):
+		timings.count("islands_removed", remove_small_alpha_islands(rgba, settings.min_alpha_island_area))
+	with timings.stage("solid-keep"):
+		timings.count("solid_keep_pixels_cleared", keep_near_solid_alpha(rgba, settings.solid_alpha_threshold, settings.solid_keep_radius))
+	with timings.stage("decontaminate"):
+		timings.count("spill_pixels_fixed", decontaminate_green_spill_pixels(rgba))
+
+
+def finish_on_canvas(cutout: np.ndarray, settings: PostprocessSettings, timings: StageTimings) -> np.ndarray:
+	with timings.stage("center"):
+		canvas = center_on_canvas(cutout, settings.canvas_size, settings.padding)
+	clean_cutout_pixels(canvas, settings, timings)
+	return canvas
+
+
+def subject_crop_box(alpha: np.ndarray, halo: int) -> tuple[int, int, int, int] | None:
+	bbox = alpha_bbox(alpha)
+	if bbox is None:
+		return None
+	left, top, right, bottom = bbox
+	height, width = alpha.shape
+	return (max(0, left - halo), max(0, top - halo), min(width, right + halo), min(height, bottom + halo))
+
+
+def postprocess_pixels_crop_first(rgba: np.ndarray, settings: PostprocessSettings, timings: StageTimings) -> np.ndarray:
+	# The flood has to see the real frame border, so keying stays full-frame.
+	# Every later stage only reads visible pixels, so running it on the subject
+	# box plus a halo matches the full-frame first pass exactly. The canvas is
+	# not cleaned again; see the --crop-first help for the measured difference
+	# from the default run's second pass over resampled pixels.
+	box = subject_crop_box(rgba[:, :, 3], settings.crop_halo)
+	if box is None:
+		return np.zeros((settings.canvas_size, settings.canvas_size, 4), dtype=np.uint8)
+	left, top, right, bottom = box
+	region = rgba[top:bottom, left:right]
+	clean_cutout_pixels(region, settings, timings)
+	with timings.stage("center"):
+		return center_on_canvas(region, settings.canvas_size, settings.padding)
+
+
+def source_rows(source: Image.Image, top: int, bottom: int) -> np.ndarray:
+	return np.array(source.crop((0, top, source.width, bottom)).convert("RGBA"))
+
+
+class StripFrame:
+	"""The strip-mode working frame, rebuilt for any row range instead of held whole.
+
+	Only decisions that need whole-image connectivity are kept at full size,
+	at one bit per pixel: the border-connected green screen and the pixels
+	island culling and solid keep cleared. Spill fixes are kept sparse, per
+	strip top.
+	"""
+
+	def __init__(self, source: Image.Image) -> None:
+		self.source = source
+		self.width, self.height = source.size
+		self.background = RowBits(self.height, self.width)
+		self.cleared = RowBits(self.height, self.width)
+		self.changes: dict[int, tuple[np.ndarray, np.ndarray]] = {}
+
+	def alpha(self, top: int, bottom: int) -> np.ndarray:
+		window_top = max(0, top - STRIP_BLUR_HALO)
+		window_bottom = min(self.height, bottom + STRIP_BLUR_HALO)
+		alpha = 255 - soften_background(self.background[window_top:window_bottom])[top - window_top:bottom - window_top]
+		alpha[self.cleared[top:bottom]] = 0
+		return alpha
+
+	def rows(self, top: int, bottom: int) -> np.ndarray:
+		"""RGBA rows ``[top, bottom)`` after keying, island culling and solid keep."""
+		rgba = source_rows(self.source, top, bottom)
+		rgba[:, :, 3] = self.alpha(top, bottom)
+		return rgba
+
+	def final_alpha(self, strip: RowStrip) -> np.ndarray:
+		alpha = self.alpha(strip.top, strip.bottom)
+		if strip.top in self.changes:
+			index, values = self.changes[strip.top]
+			alpha.reshape(-1)[index] = values[:, 3]
+		return alpha
+
+	def final_rows(self, strip: RowStrip) -> np.ndarray:
+		rgba = self.rows(strip.top, strip.bottom)
+		if strip.top in self.changes:
+			index, values = self.changes[strip.top]
+			rgba.reshape(-1, 4)[index] = values
+		rgba[rgba[:, :, 3] == 0] = 0
+		return rgba
+
+
+def key_green_screen_strips(frame: StripFrame, strip_rows: int) -> int:
+	strips = row_strips(frame.height, strip_rows, 0)
+	components = StripComponents(frame.height)
+	for strip in strips:
+		components.add(strip.top, green_screen_mask(source_rows(frame.source, strip.top, strip.bottom)))
+	components.resolve()
+	for strip in strips:
+		keyed = green_screen_mask(source_rows(frame.source, strip.top, strip.bottom))
+		frame.background[strip.rows] = components.border[components.labels(strip.top, keyed)]
+	return int(components.areas[components.border].sum())
+
+
+def remove_small_alpha_islands_strips(frame: StripFrame, min_area: int, strip_rows: int) -> int:
+	if min_area <= 0:
+		return 0
+	strips = row_strips(frame.height, strip_rows, 0)
+	components = StripComponents(frame.height)
+	for strip in strips:
+		components.add(strip.top, frame.alpha(strip.top, strip.bottom) > 20)
+	components.resolve()
+	small = components.areas < min_area
+	small[0] = False
+	for strip in strips:
+		visible = frame.alpha(strip.top, strip.bottom) > 20
+		frame.cleared[strip.rows] = small[components.labels(strip.top, visible)]
+	return int(np.count_nonzero(small & (components.areas > 0)))
+
+
+def keep_near_solid_alpha_strips(frame: StripFrame, threshold: int, radius: int, strip_rows: int) -> int:
+	if radius <= 0:
+		return 0
+	strips = row_strips(frame.height, strip_rows, 0)
+	components = StripComponents(frame.height)
+	for strip in strips:
+		components.add(strip.top, frame.alpha(strip.top, strip.bottom) >= threshold)
+	components.resolve()
+	largest = components.largest_label()
+	solid = RowBits(frame.height, frame.width)
+	if largest:
+		for strip in strips:
+			solid[strip.rows] = components.labels(strip.top, frame.alpha(strip.top, strip.bottom) >= threshold) == largest
+	cleared = 0
+	for strip in row_strips(frame.height, strip_rows, radius):
+		keep = dilate_square(solid[strip.window], radius)[strip.core]
+		drop = ~keep & (frame.alpha(strip.top, strip.bottom) > 0)
+		frame.cleared[strip.rows] = frame.cleared[strip.rows] | drop
+		cleared += int(np.count_nonzero(drop))
+	return cleared
+
+
+def spill_window_settled(window: np.ndarray, unknown: np.ndarray, reach: np.ndarray, core: slice, cut_top: bool, cut_bottom: bool, halo: int) -> bool:
+	core_reach = reach[core]
+	if np.any(core_reach + 2 >= halo):
+		return False
+	unreached = unknown[core] & (core_reach < 0)
+	if not np.any(unreached) or not (cut_top or cut_bottom):
+		return True
+	# Colour only spreads through spill pixels that stay opaque enough to
+	# become sources. Unreached core spill is final unless such a chain ties
+	# it to a cut edge, where the missing rows could still feed it.
+	components = label_components(unknown & (window[:, :, 3] >= 96))
+	cut = np.zeros(components.count + 1, dtype=bool)
+	if cut_top:
+		cut[components.labels[0]] = True
+	if cut_bottom:
+		cut[components.labels[-1]] = True
+	cut[0] = False
+	tied = cut[components.labels]
+	touching = tied.copy()
+	touching[1:] |= tied[:-1]
+	touching[:-1] |= tied[1:]
+	touching[:, 1:] |= tied[:, :-1]
+	touching[:, :-1] |= tied[:, 1:]
+	return not np.any(unreached & touching[core])
+
+
+def decontaminate_green_spill_strips(frame: StripFrame, strip_rows: int) -> int:
+	# A spill fill with reach k reads colours through a chain of k filled
+	# pixels, and its queue position is set by pushes from within k + 1 steps
+	# of its neighbours, so core pixels with reach below halo - 2 already
+	# match the full-frame fill; otherwise the halo doubles. Core results are
+	# kept aside as sparse changes so every window reads the unfilled frame.
+	height, width = frame.height, frame.width
+	spill = 0
+	for strip in row_strips(height, strip_rows, 0):
+		halo = STRIP_COMPONENT_HALO
+		while True:
+			window_top = max(0, strip.top - halo)
+			window_bottom = min(height, strip.bottom + halo)
+			core = slice(strip.top - window_top, strip.bottom - window_top)
+			window = frame.rows(window_top, window_bottom)
+			window[window[:, :, 3] == 0] = 0
+			before = window[core].copy()
+			unknown = green_spill_mask(window)
+			reach = np.full(unknown.shape, -1, dtype=np.int32)
+			if np.any(unknown):
+				fill_green_spill_queue(window, unknown, reach)
+			if window_top == 0 and window_bottom == height:
+				break
+			if spill_window_settled(window, unknown, reach, core, window_top > 0, window_bottom < height, halo):
+				break
+			halo *= 2
+		spill += int(np.count_nonzero(unknown[core]))
+		rows = window[core]
+		neutralize_green_spill_pixels(rows, green_spill_mask(rows))
+		changed = np.any(rows != before, axis=2)
+		if np.any(changed):
+			ys, xs = np.nonzero(changed)
+			frame.changes[strip.top] = (ys * width + xs, rows[changed])
+	return spill
+
+
+def center_on_canvas_strips(frame: StripFrame, strip_rows: int, canvas_size: int, padding: int) -> np.ndarray:
+	# The same box and thumbnail size as center_on_canvas; StripResize
+	# resamples the box as its strips are finished instead of cropping it.
+	strips = row_strips(frame.height, strip_rows, 0)
+	visible_rows = np.zeros(frame.height, dtype=bool)
+	visible_cols = np.zeros(frame.width, dtype=bool)
+	for strip in strips:
+		alpha = frame.final_alpha(strip)
+		visible_rows[strip.rows] = alpha.any(axis=1)
+		visible_cols |= alpha.any(axis=0)
+	if not np.any(visible_rows):
+		return np.zeros((canvas_size, canvas_size, 4), dtype=np.uint8)
+	ys = np.flatnonzero(visible_rows)
+	xs = np.flatnonzero(visible_cols)
+	left, top, right, bottom = int(xs[0]), int(ys[0]), int(xs[-1]) + 1, int(ys[-1]) + 1
+	max_size = max(1, canvas_size - padding * 2)
+	size = (right - left, bottom - top)
+	resize = StripResize(size, fit_size(size, (max_size, max_size)))
+	for strip in strips:
+		if strip.bottom > top and strip.top < bottom:
+			rgba = frame.final_rows(strip)[max(top, strip.top) - strip.top:min(bottom, strip.bottom) - strip.top, left:right]
+			resize.add(Image.fromarray(rgba, "RGBA"))
+	return paste_on_canvas(np.asarray(resize.result()), canvas_size, padding)
+
+
+def postprocess_pixels_strips(source: Image.Image, settings: PostprocessSettings, timings: StageTimings) -> np.ndarray:
+	# Full-frame state is the decoded source plus bit masks for the decisions
+	# that need whole-image connectivity; every stage rebuilds the rows it
+	# reads from those, and temporaries are sized to a strip and its halo.
+	# The output matches postprocess_pixels exactly.
+	rows = settings.strip_rows
+	with timings.stage("load"):
+		source.load()
+		frame = StripFrame(source)
+	with timings.stage("flood"):
+		timings.count("pixels_flooded", key_green_screen_strips(frame, rows))
+	with timings.stage("islands"):
+		timings.count("islands_removed", remove_small_alpha_islands_strips(frame, settings.min_alpha_island_area, rows))
+	with timings.stage("solid-keep"):
+		timings.count("solid_keep_pixels_cleared", keep_near_solid_alpha_strips(frame, settings.solid_alpha_threshold, settings.solid_keep_radius, rows))
+	with timings.stage("decontaminate"):
+		timings.count("spill_pixels_fixed", decontaminate_green_spill_strips(frame, rows))
+	with timings.stage("center"):
+		canvas = center_on_canvas_strips(frame, rows, settings.canvas_size, settings.padding)
+	clean_cutout_pixels(canvas, settings, timings)
+	return canvas
+
+
+def postprocess_file(
+	input_path: Path,
+	output_path: Path,
+	preview_path: Path | None,
+	settings: PostprocessSettings,
+	timings: StageTimings | None = None,
+) -> None:
+	timings = timings if timings is not None else StageTimings()
+	sprite = postprocess_sprite(Image.open(input_path), settings, timings)
+	with timings.stage("save"):
+		output_path.parent.mkdir(parents=True, exist_ok=True)
+		sprite.save(output_path)
+	if preview_path:
+		with timings.stage("preview"):
+			preview_path.parent.mkdir(parents=True, exist_ok=True)
+			make_preview(sprite, preview_path)
+
+
+def job_record(job: BatchJob, error: str | None = None) -> dict[str, object]:
+	record: dict[str, object] = {
+		"input": str(job.input),
+		"output": str(job.output),
+		"preview": str(job.preview) if job.preview else None,
+	}
+	if error is not None:
+		record["status"] = "fail"
+		record["error"] = error
+		record["elapsed_seconds"] = None
+		record["traced_peak_mb"] = None
+		record["peak_rss_mb"] = None
+		record["stage_seconds"] = None
+	return record
+
+
+def run_batch_job(job: BatchJob, settings: PostprocessSettings, profile: bool = False) -> dict[str, object]:
+	result = job_record(job)
+	timings = StageTimings()
+	with RunMeter(trace=profile) as meter:
+		try:
+			postprocess_file(job.input, job.output, job.preview, settings, timings)
+		except Exception as exc:
+			result["status"] = "fail"
+			result["error"] = f"{type(exc).__name__}: {exc}"
+		else:
+			result["status"] = "pass"
+	stats = meter.stats.as_record()
+	result["elapsed_seconds"] = stats["wall_seconds"]
+	# tracemalloc only runs for --profile-json batches; the peak is null otherwise.
+	result["traced_peak_mb"] = stats["traced_peak_mb"]
+	# Process-wide high-water mark; with a pool it covers every job the worker ran so far.
+	result["peak_rss_mb"] = stats["peak_rss_mb"]
+	result["stage_seconds"] = timings.as_record()
+	if profile:
+		result["profile"] = dict(timings.profile_record(), run=stats)
+	return result
+
+
+def batch_sources(batch: str) -> list[BatchJob | Path]:
+	path = Path(batch)
+	if any(char in batch for char in "*?["):
+		return [Path(match) for match in sorted(glob.glob(batch, recursive=True)) if Path(match).suffix.lower() in BATCH_SOURCE_SUFFIXES]
+	if path.is_dir():
+		return [child for child in sorted(path.iterdir()) if child.suffix.lower() in BATCH_SOURCE_SUFFIXES]
+	if not path.is_file():
+		raise FileNotFoundError(f"batch input not found: {batch}")
+
+	base = path.parent
+	if path.suffix.lower() == ".json":
+		entries = json.loads(path.read_text(encoding="utf-8"))
+		if isinstance(entries, dict):
+			entries = entries.get("sources", [])
+	else:
+		entries = [line.strip() for line in path.read_text(encoding="utf-8").splitlines()]
+		entries = [line for line in entries if line and not line.startswith("#")]
+
+	sources: list[BatchJob | Path] = []
+	for entry in entries:
+		if isinstance(entry, str):
+			sources.append(base / entry)
+			continue
+		output = entry.get("output")
+		preview = entry.get("preview")
+		if output is None:
+			sources.append(base / entry["input"])
+			continue
+		sources.append(BatchJob(base / entry["input"], base / output, base / preview if preview else None))
+	return sources
+
+
+def batch_jobs(sources: list[BatchJob | Path], output_dir: Path | None, preview_dir: Path | None) -> list[BatchJob]:
+	jobs: list[BatchJob] = []
+	for source in sources:
+		if isinstance(source, BatchJob):
+			jobs.append(source)
+			continue
+		if output_dir is None:
+			raise ValueError(f"--output-dir is required for batch source without an explicit output: {source}")
+		preview = preview_dir / f"{source.stem}_preview.png" if preview_dir else None
+		jobs.append(BatchJob(source, output_dir / f"{source.stem}.png", preview))
+	return jobs
+
+
+def run_batch(jobs: list[BatchJob], settings: PostprocessSettings, workers: int, profile: bool = False) -> list[dict[str, object]]:
+	results: list[dict[str, object] | None] = [None] * len(jobs)
+	seen_outputs: set[Path] = set()
+	runnable: list[int] = []
+	for index, job in enumerate(jobs):
+		output = job.output.resolve()
+		if output in seen_outputs:
+			results[index] = job_record(job, "duplicate output path in batch")
+			continue
+		seen_outputs.add(output)
+		runnable.append(index)
+
+	if workers <= 1 or len(runnable) <= 1:
+		for index in runnable:
+			results[index] = run_batch_job(jobs[index], settings, profile)
+	else:
+		with ProcessPoolExecutor(max_workers=min(workers, len(runnable))) as pool:
+			futures = {pool.submit(run_batch_job, jobs[index], settings, profile): index for index in runnable}
+			for future in as_completed(futures):
+				index = futures[future]
+				try:
+					results[index] = future.result()
+				except Exception as exc:
+					# A crashed worker loses only its own sprite; record it and keep going.
+					results[index] = job_record(jobs[index], f"{type(exc).__name__}: {exc}")
+	return [result for result in results if result is not None]
+
+
+def write_batch_manifest(
+	path: Path,
+	batch: str,
+	results: list[dict[str, object]],
+	settings: PostprocessSettings,
+	workers: int,
+	wall_seconds: float,
+) -> None:
+	failed = [result for result in results if result["status"] != "pass"]
+	manifest = {
+		"schema_version": 1,
+		"tool": "postprocess_unit_sprite.py",
+		"batch_input": batch,
+		"workers": workers,
+		"settings": asdict(settings),
+		"file_count": len(results),
+		"pass_count": len(results) - len(failed),
+		"fail_count": len(failed),
+		"wall_seconds": round(wall_seconds, 4),
+		"files": results,
+	}
+	path.parent.mkdir(parents=True, exist_ok=True)
+	path.write_text(json.dumps(manifest, indent=2) + "\n", encoding="utf-8")
+
+
+def write_profile_json(path: Path, report: dict[str, object]) -> None:
+	path.parent.mkdir(parents=True, exist_ok=True)
+	path.write_text(json.dumps(dict({"schema_version": 1, "tool": "postprocess_unit_sprite.py"}, **report), indent=2) + "\n", encoding="utf-8")
+
+
+def batch_profile_report(batch: str, results: list[dict[str, object]], settings: PostprocessSettings, workers: int) -> dict[str, object]:
+	# Failed files stop part-way, so only passing runs feed the percentiles.
+	files = [dict({"input": result["input"], "status": result["status"]}, **(result.get("profile") or {})) for result in results]
+	profiles = [result["profile"] for result in results if result["status"] == "pass" and result.get("profile")]
+	return {
+		"batch_input": batch,
+		"workers": workers,
+		"settings": asdict(settings),
+		"percentiles": profile_percentiles(profiles),
+		"files": files,
+	}
+
+
+def main() -> int:
 	parser = argparse.ArgumentParser(description="Post-process a generated Gamble Battle unit sprite.")
-	parser.add_argument("input", type=Path)
-	parser.add_argument("output", type=Path)
+	parser.add_argument("input", type=Path, nargs="?")
+	parser.add_argument("output", type=Path, nargs="?")
 	parser.add_argument("--canvas-size", type=int, default=1024)
 	parser.add_argument("--padding", type=int, default=56)
 	parser.add_argument("--min-alpha-island-area", type=int, default=96)
 	parser.add_argument("--solid-alpha-threshold", type=int, default=176)
 	parser.add_argument("--solid-keep-radius", type=int, default=0)
 	parser.add_argument("--preview", type=Path)
+	parser.add_argument(
+		"--crop-first",
+		action="store_true",
+		help=(
+			"Run island, solid-keep and spill stages once on the subject box plus --crop-halo, then paste onto the canvas "
+			"without the default run's second pass. The output is NOT byte-identical to the default run: only pixels that pass would clear or "
+			"de-green after resampling differ, i.e. low-alpha green fringe, islands shrunk under the area limit and "
+			"pieces cut off the main solid (measured <=0.2%% of visible pixels on smooth sprites, <=3.1%% on noisy synthetic frames)."
+		),
+	)
+	parser.add_argument("--crop-halo", type=int, default=8, help="Transparent margin kept around the subject box in --crop-first mode.")
+	parser.add_argument(
+		"--strip-rows",
+		type=int,
+		default=0,
+		help=(
+			"Process the full-resolution stages in horizontal strips of this many rows (plus a halo sized to each stage) "
+			"so peak memory follows the strip size on 4K-8K sources. Output is identical to the default mode. 0 disables."
+		),
+	)
+	parser.add_argument("--batch", help="Batch mode: a source directory, a glob pattern, or a JSON/text manifest of sources. Manifest paths are relative to the manifest file.")
+	parser.add_argument("--output-dir", type=Path, help="Batch output directory; each source is written as <stem>.png unless the manifest names an output.")
+	parser.add_argument("--preview-dir", type=Path, help="Optional batch preview directory; previews are written as <stem>_preview.png.")
+	parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Batch process-pool size. Use 1 to run in-process.")
+	parser.add_argument("--batch-manifest", type=Path, help="Batch JSON manifest with per-file status and timings. Defaults to <output-dir>/postprocess_batch_manifest.json.")
+	parser.add_argument(
+		"--timings",
+		action="store_true",
+		help=(
+			"Print wall-clock seconds per pipeline stage, then wall_seconds, traced_peak_mb and peak_rss_mb for the run "
+			"(tracemalloc runs only with this or --profile-json); batch runs sum stage seconds over every file."
+		),
+	)
+	parser.add_argument(
+		"--profile-json",
+		type=Path,
+		help=(
+			"Write wall seconds, CPU seconds and traced peak memory per stage plus stage counters (pixels flooded, "
+			"islands removed, spill pixels fixed) to this JSON file. Batch runs add p50/p90/p99 across files."
+		),
+	)
 	args = parser.parse_args()
 
-	source = Image.open(args.input)
-	cutout = transparent_from_green_screen(source)
-	cutout = remove_small_alpha_islands(cutout, args.min_alpha_island_area)
-	cutout = keep_near_solid_alpha(cutout, args.solid_alpha_threshold, args.solid_keep_radius)
-	cutout = decontaminate_green_spill(cutout)
-	sprite = center_on_canvas(cutout, args.canvas_size, args.padding)
-	sprite = remove_small_alpha_islands(sprite, args.min_alpha_island_area)
-	sprite = keep_near_solid_alpha(sprite, args.solid_alpha_threshold, args.solid_keep_radius)
-	sprite = decontaminate_green_spill(sprite)
-	args.output.parent.mkdir(parents=True, exist_ok=True)
-	sprite.save(args.output)
-	if args.preview:
-		args.preview.parent.mkdir(parents=True, exist_ok=True)
-		make_preview(sprite, args.preview)
+	settings = PostprocessSettings(
+		canvas_size=args.canvas_size,
+		padding=args.padding,
+		min_alpha_island_area=args.min_alpha_island_area,
+		solid_alpha_threshold=args.solid_alpha_threshold,
+		solid_keep_radius=args.solid_keep_radius,
+		crop_first=args.crop_first,
+		crop_halo=args.crop_halo,
+		strip_rows=args.strip_rows,
+	)
+	if args.strip_rows < 0:
+		parser.error("--strip-rows must be 0 or positive")
+	if args.strip_rows and args.crop_first:
+		parser.error("--strip-rows cannot be combined with --crop-first")
+	if args.batch is None:
+		if args.input is None or args.output is None:
+			parser.error("input and output are required unless --batch is used")
+		timings = StageTimings()
+		profiling = args.timings or args.profile_json is not None
+		with RunMeter(trace=profiling) as meter:
+			postprocess_file(args.input, args.output, args.preview, settings, timings)
+		if args.timings:
+			for line in timings.report(meter.stats.wall_seconds):
+				print(line)
+		if args.profile_json:
+			report = {"input": str(args.input), "output": str(args.output), "settings": asdict(settings), "run": meter.stats.as_record()}
+			write_profile_json(args.profile_json, dict(report, **timings.profile_record()))
+		if profiling:
+			for line in meter.stats.lines():
+				print(line)
+		return 0
+
+	if args.input is not None or args.output is not None or args.preview is not None:
+		parser.error("positional input/output and --preview cannot be combined with --batch")
+	try:
+		jobs = batch_jobs(batch_sources(args.batch), args.output_dir, args.preview_dir)
+	except (OSError, ValueError, KeyError) as exc:
+		parser.error(str(exc))
+	if not jobs:
+		parser.error(f"no batch sources found for {args.batch}")
+	manifest_path = args.batch_manifest
+	if manifest_path is None:
+		if args.output_dir is None:
+			parser.error("--batch-manifest is required when --output-dir is not set")
+		manifest_path = args.output_dir / "postprocess_batch_manifest.json"
+
+	started = time.perf_counter()
+	results = run_batch(jobs, settings, args.workers, profile=args.profile_json is not None)
+	if args.profile_json:
+		write_profile_json(args.profile_json, batch_profile_report(args.batch, results, settings, args.workers))
+		# The profile file holds the per-stage detail; the manifest keeps its usual shape.
+		for result in results:
+			result.pop("profile", None)
+	write_batch_manifest(manifest_path, args.batch, results, settings, args.workers, time.perf_counter() - started)
+	failed = [result for result in results if result["status"] != "pass"]
+	for result in failed:
+		print(f"FAIL {result['input']}: {result['error']}")
+	if args.timings:
+		totals = StageTimings()
+		for result in results:
+			for name, seconds in (result.get("stage_seconds") or {}).items():
+				totals.seconds[name] = totals.seconds.get(name, 0.0) + seconds
+		for line in totals.report():
+			print(line)
+	print(f"processed={len(results)}")
+	print(f"wall_seconds={round(time.perf_counter() - started, 4)}")
+	print(f"failed={len(failed)}")
+	print(f"manifest={manifest_path}")
+	return 1 if failed else 0
 
 
 if __name__ == "__main__":
-	main()
+	raise SystemExit(main())
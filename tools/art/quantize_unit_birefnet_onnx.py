@@ -0,0 +1,150 @@
+from __future__ import annotations
+
+import argparse
+import json
+import time
+from datetime import date
+from pathlib import Path
+
+from audit_unit_cutout_orange_fringe import DEFAULT_RAW_KEY_TOLERANCE, GATED_METRICS, edge_metrics
+from unit_art_birefnet import (
+    DEFAULT_MODEL,
+    DEFAULT_REVISION,
+    OnnxSession,
+    default_onnx_path,
+    onnx_metadata_path,
+    probability_mask,
+)
+from unit_art_files import file_sha256
+from unit_art_lazy import lazy_import
+
+np = lazy_import("numpy")
+Image = lazy_import("PIL.Image")
+
+
+def matte_cutout(raw: Image.Image, arr: np.ndarray) -> np.ndarray:
+    # The bare matte over raw RGB, before any despill or edge cleanup could hide a regression.
+    rgba = np.array(raw.convert("RGBA"))
+    rgba[:, :, 3] = np.asarray(probability_mask(arr, raw.size))
+    return rgba
+
+
+def regressed_metrics(reference: dict[str, int], candidate: dict[str, int], max_regression: float, slack_pixels: int) -> list[str]:
+    return [
+        name
+        for name in GATED_METRICS
+        if candidate[name] > reference[name] * (1.0 + max_regression) + slack_pixels
+    ]
+
+
+def gate_check(
+    path: Path,
+    fp32: OnnxSession,
+    int8: OnnxSession,
+    args: argparse.Namespace,
+) -> dict[str, object]:
+    raw = Image.open(path).convert("RGB")
+    model_image = raw.resize((fp32.input_size, fp32.input_size), Image.Resampling.BICUBIC)
+    raw_rgb = np.asarray(raw)
+    started = time.perf_counter()
+    reference = fp32.predict(model_image)
+    fp32_seconds = time.perf_counter() - started
+    started = time.perf_counter()
+    candidate = int8.predict(model_image)
+    int8_seconds = time.perf_counter() - started
+
+    reference_metrics = edge_metrics(matte_cutout(raw, reference), args.edge_radius, raw_rgb, args.raw_key_tolerance)
+    candidate_metrics = edge_metrics(matte_cutout(raw, candidate), args.edge_radius, raw_rgb, args.raw_key_tolerance)
+    delta = np.abs((reference * 255).astype(np.int16) - (candidate * 255).astype(np.int16))
+    regressed = regressed_metrics(reference_metrics, candidate_metrics, args.max_regression, args.slack_pixels)
+    return {
+        "image": str(path),
+        "status": "fail" if regressed else "pass",
+        "regressed": regressed,
+        "fp32": reference_metrics,
+        "int8": candidate_metrics,
+        "mask_max_level_diff": int(delta.max()),
+        "mask_mean_level_diff": round(float(delta.mean()), 4),
+        "fp32_seconds": round(fp32_seconds, 3),
+        "int8_seconds": round(int8_seconds, 3),
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description=(
+            "Dynamically quantize an exported BiRefNet ONNX graph to INT8 weights once, then gate it: every "
+            "--verify-image is cut out with the FP32 and INT8 graphs and compared with the orange-fringe audit "
+            "metrics. remove_unit_background_birefnet.py --precision int8 refuses the graph unless the gate passed."
+        )
+    )
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    parser.add_argument("--model-revision", default=DEFAULT_REVISION)
+    parser.add_argument("--source", type=Path, help="FP32 graph (default: the export_unit_birefnet_onnx.py output path).")
+    parser.add_argument("--output", type=Path, help="INT8 graph (default: the path --precision int8 looks for).")
+    parser.add_argument(
+        "--op-types",
+        default="MatMul,Gemm,Conv",
+        help="Comma-separated ONNX ops to quantize: the backbone's linear layers and the decoder's convolutions.",
+    )
+    parser.add_argument("--verify-image", type=Path, action="append", required=True, help="Raw source for the quality gate. Repeatable.")
+    parser.add_argument("--edge-radius", type=int, default=4)
+    parser.add_argument("--raw-key-tolerance", type=int, default=DEFAULT_RAW_KEY_TOLERANCE)
+    parser.add_argument(
+        "--max-regression",
+        type=float,
+        default=0.05,
+        help="Allowed relative growth of each gated audit count over FP32 (0.05 = 5%%), on top of --slack-pixels.",
+    )
+    parser.add_argument("--slack-pixels", type=int, default=16, help="Absolute allowance so near-zero FP32 counts do not fail on a few pixels.")
+    parser.add_argument("--onnx-threads", type=int, default=0)
+    args = parser.parse_args()
+
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    source = args.source or default_onnx_path(args.model, args.model_revision)
+    output = args.output or default_onnx_path(args.model, args.model_revision, "int8")
+    fp32 = OnnxSession(source, args.model, args.model_revision, args.onnx_threads)
+    op_types = [name.strip() for name in args.op_types.split(",") if name.strip()]
+    output.parent.mkdir(parents=True, exist_ok=True)
+    quantize_dynamic(str(source), str(output), weight_type=QuantType.QInt8, op_types_to_quantize=op_types)
+
+    metadata = json.loads(onnx_metadata_path(source).read_text(encoding="utf-8"))
+    metadata.update(
+        {
+            "tool": "quantize_unit_birefnet_onnx.py",
+            "quantized": date.today().isoformat(),
+            "precision": "int8",
+            "quantized_op_types": op_types,
+            "source_onnx_sha256": file_sha256(source),
+            "onnx_sha256": file_sha256(output),
+            "gate": {"status": "pending"},
+        }
+    )
+    metadata_path = onnx_metadata_path(output)
+    metadata_path.write_text(json.dumps(metadata, indent=2) + "\n", encoding="utf-8")
+
+    int8 = OnnxSession(output, args.model, args.model_revision, args.onnx_threads, "int8", require_gate=False)
+    checks = [gate_check(path, fp32, int8, args) for path in args.verify_image]
+    metadata["gate"] = {
+        "status": "pass" if all(check["status"] == "pass" for check in checks) else "fail",
+        "metrics": list(GATED_METRICS),
+        "max_regression": args.max_regression,
+        "slack_pixels": args.slack_pixels,
+        "edge_radius": args.edge_radius,
+        "raw_key_tolerance": args.raw_key_tolerance,
+        "checks": checks,
+    }
+    metadata_path.write_text(json.dumps(metadata, indent=2) + "\n", encoding="utf-8")
+
+    print(f"onnx={output}")
+    print(f"metadata={metadata_path}")
+    for check in checks:
+        detail = ", ".join(check["regressed"]) or "within gate"
+        print(f"{check['status'].upper()} {check['image']}: {detail}; fp32={check['fp32_seconds']}s int8={check['int8_seconds']}s")
+    print(f"gate={metadata['gate']['status']}")
+    return 0 if metadata["gate"]["status"] == "pass" else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
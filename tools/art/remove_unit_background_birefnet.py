@@ -1,36 +1,138 @@
 from __future__ import annotations
 
 import argparse
+import csv
+import json
+import math
+import os
+from collections.abc import Callable, Iterator
+from dataclasses import dataclass
 from pathlib import Path
 
-import numpy as np
-import torch
-from PIL import Image, ImageDraw, ImageFilter
-from torchvision import transforms
-from transformers import AutoModelForImageSegmentation
-
+from audit_unit_cutout_orange_fringe import GATED_METRICS, edge_metrics
 from clean_unit_cutout_orange_edge import clean_cutout_background
+from unit_art_birefnet import (
+    BACKENDS,
+    CACHE_DIR_ENV,
+    DEFAULT_CACHE_MAX_MB,
+    DEFAULT_MODEL,
+    DEFAULT_REVISION,
+    DEFAULT_WORKER_URL,
+    MODEL_STORE_ENV,
+    PROBABILITY_FORMATS,
+    WORKER_URL_ENV,
+    PRECISIONS,
+    MaskPredictor,
+    ModelSpec,
+    PredictionCache,
+    ProbabilityRows,
+    configured_model_store,
+    default_cache_dir,
+    model_store_identity,
+    normalize_prediction,
+    probability_map,
+    probability_mask,
+    save_probability_map,
+)
+from unit_art_files import file_sha256
+from unit_art_lazy import lazy_import
+from unit_art_metrics import RunMeter
+from unit_art_pipeline import PipelineStage, run_pipeline
+from unit_art_preview import BLACK, REVIEW_CHECKER, WHITE, PreviewPyramid, background_tile, preview_halvings, scaled_tile
+from unit_art_refine import REFINE_CONTEXT, composite_refinement, refine_tiles, tile_count, uncertain_band
+from unit_art_strips import PngStripWriter, RowStrip, StripReduce, StripResize, row_strips
+
+np = lazy_import("numpy")
+Image = lazy_import("PIL.Image")
+ImageDraw = lazy_import("PIL.ImageDraw")
+ImageFilter = lazy_import("PIL.ImageFilter")
 
-SAFETY_ORANGE_KEY = np.array([248, 68, 1], dtype=np.int16)
+SAFETY_ORANGE_KEY = (248, 68, 1)
 DEFAULT_RAW_KEY_TOLERANCE = 20
+# despill_orange_rgb grows its near-background mask with MaxFilter(13).
+DESPILL_HALO = 6
+BATCH_SOURCE_SUFFIXES = {".png", ".jpg", ".jpeg", ".webp"}
+# Core size of the windows --foreground-band-margin solves one at a time.
+FOREGROUND_TILE = 64
+# BiRefNet's backbone downsamples by 32, so every forward-pass size must divide by it.
+MODEL_SIZE_MULTIPLE = 32
+REVIEW_TILE = 384
 
 
-def extract_prediction(output: object) -> torch.Tensor:
-    if isinstance(output, torch.Tensor):
-        return output
-    if isinstance(output, dict):
-        for value in reversed(list(output.values())):
-            try:
-                return extract_prediction(value)
-            except TypeError:
-                continue
-    if isinstance(output, (list, tuple)):
-        for value in reversed(output):
-            try:
-                return extract_prediction(value)
-            except TypeError:
-                continue
-    raise TypeError(f"Could not find tensor prediction in output type {type(output)!r}")
+@dataclass(frozen=True)
+class CutoutJob:
+    input: Path
+    output: Path
+    mask_output: Path
+    review_output: Path
+    probability_output: Path | None = None
+
+
+@dataclass(frozen=True)
+class SweepVariant:
+    """One --threshold/--feather/--raw-key-tolerance combination of a --sweep-dir run."""
+
+    threshold: int
+    feather: float
+    raw_key_tolerance: int
+
+    @property
+    def label(self) -> str:
+        return f"t{self.threshold}_f{self.feather:g}_k{self.raw_key_tolerance}"
+
+
+@dataclass(frozen=True)
+class DecodedBatch:
+    """Sources of one batch, opened and looked up in the cache, waiting for inference."""
+
+    jobs: list[CutoutJob]
+    raws: list[Image.Image]
+    keys: list[str | None]
+    arrays: list[np.ndarray | None]
+    model_images: list[Image.Image | None]
+
+
+@dataclass(frozen=True)
+class PredictedCutout:
+    job: CutoutJob
+    raw: Image.Image
+    arr: np.ndarray
+    device: str
+    inference: str
+    refinement: str | None = None
+
+
+@dataclass(frozen=True)
+class CleanedCutout:
+    """The final cutout and mask, or in strip mode the strips write_cutout composites as it writes them."""
+
+    predicted: PredictedCutout
+    cutout: Image.Image | None
+    mask: Image.Image | None
+    safety_orange_cleaned: int = 0
+    raw_key_alpha_cleared: int = 0
+    visual_fringe_alpha_cleared: int = 0
+    strips: Iterator[tuple[RowStrip, np.ndarray]] | None = None
+
+
+def parse_sweep_ints(text: str) -> list[int]:
+    try:
+        values = [int(part.strip()) for part in text.split(",") if part.strip()]
+    except ValueError:
+        values = []
+    if not values or any(value < 0 or value > 255 for value in values):
+        raise argparse.ArgumentTypeError("sweep values must be comma-separated integers from 0 to 255")
+    return values
+
+
+def parse_sweep_floats(text: str) -> list[float]:
+    try:
+        values = [float(part.strip()) for part in text.split(",") if part.strip()]
+    except ValueError:
+        values = []
+    if not values or any(value < 0 for value in values):
+        raise argparse.ArgumentTypeError("sweep values must be comma-separated non-negative numbers")
+    return values
 
 
 def fit_for_model(image: Image.Image, size: int) -> tuple[Image.Image, tuple[int, int]]:
@@ -38,17 +140,6 @@ def fit_for_model(image: Image.Image, size: int) -> tuple[Image.Image, tuple[int
     return rgb.resize((size, size), Image.Resampling.BICUBIC), rgb.size
 
 
-def checker(size: tuple[int, int], tile: int = 32) -> Image.Image:
-    width, height = size
-    out = Image.new("RGBA", size, (46, 50, 60, 255))
-    draw = ImageDraw.Draw(out)
-    for y in range(0, height, tile):
-        for x in range(0, width, tile):
-            if (x // tile + y // tile) % 2 == 0:
-                draw.rectangle((x, y, x + tile - 1, y + tile - 1), fill=(25, 28, 36, 255))
-    return out
-
-
 def defringe_orange_edges(source: Image.Image, mask: Image.Image) -> Image.Image:
     rgb = np.asarray(source.convert("RGB")).astype(np.int16)
     alpha = np.asarray(mask).astype(np.int16)
@@ -113,7 +204,7 @@ def safety_orange_residue(rgb: np.ndarray) -> np.ndarray:
 
 def background_key_residue(rgb: np.ndarray, tolerance: int = DEFAULT_RAW_KEY_TOLERANCE) -> np.ndarray:
     values = rgb.astype(np.int16)
-    distance = np.max(np.abs(values - SAFETY_ORANGE_KEY), axis=2)
+    distance = np.max(np.abs(values - np.array(SAFETY_ORANGE_KEY, dtype=np.int16)), axis=2)
     return distance <= tolerance
 
 
@@ -128,14 +219,12 @@ def alpha_edge_band(mask: Image.Image, radius: int) -> np.ndarray:
     return dilated & ~eroded
 
 
-def estimate_foreground_rgb(source: Image.Image, mask: Image.Image) -> np.ndarray:
+def solve_foreground(rgb: np.ndarray, alpha: np.ndarray) -> np.ndarray:
     from pymatting import estimate_foreground_ml
 
-    rgb = np.asarray(source.convert("RGB")).astype(np.float64) / 255.0
-    alpha = np.asarray(mask).astype(np.float64) / 255.0
     foreground = estimate_foreground_ml(
-        rgb,
-        alpha,
+        rgb.astype(np.float64) / 255.0,
+        alpha.astype(np.float64) / 255.0,
         regularization=1e-5,
         n_small_iterations=10,
         n_big_iterations=2,
@@ -143,6 +232,38 @@ def estimate_foreground_rgb(source: Image.Image, mask: Image.Image) -> np.ndarra
     return np.clip(foreground * 255.0, 0, 255).astype(np.uint8)
 
 
+def estimate_foreground_rgb(source: Image.Image, mask: Image.Image) -> np.ndarray:
+    return solve_foreground(np.asarray(source.convert("RGB")), np.asarray(mask))
+
+
+def estimate_foreground_band(source: Image.Image, mask: Image.Image, margin: int) -> np.ndarray:
+    """estimate_foreground_rgb solved only where alpha is fractional.
+
+    Opaque pixels keep their source RGB and transparent ones are zeroed.
+    The solver runs once per FOREGROUND_TILE tile that holds soft alpha, on
+    the tile plus ``margin`` pixels of context, and only the tile's soft
+    pixels take its result. The float64 working set is one window instead
+    of the whole frame.
+    """
+    rgb = np.asarray(source.convert("RGB"))
+    alpha = np.asarray(mask)
+    soft = (alpha > 0) & (alpha < 255)
+    out = np.where((alpha == 255)[:, :, None], rgb, 0).astype(np.uint8)
+    height, width = alpha.shape
+    for top in range(0, height, FOREGROUND_TILE):
+        for left in range(0, width, FOREGROUND_TILE):
+            bottom, right = min(height, top + FOREGROUND_TILE), min(width, left + FOREGROUND_TILE)
+            target = soft[top:bottom, left:right]
+            if not target.any():
+                continue
+            window_top, window_left = max(0, top - margin), max(0, left - margin)
+            window = (slice(window_top, min(height, bottom + margin)), slice(window_left, min(width, right + margin)))
+            foreground = solve_foreground(rgb[window], alpha[window])
+            core = foreground[top - window_top:bottom - window_top, left - window_left:right - window_left]
+            out[top:bottom, left:right][target] = core[target]
+    return out
+
+
 def despill_orange_rgb(rgb: np.ndarray, source: Image.Image, mask: Image.Image) -> np.ndarray:
     raw_rgb = np.asarray(source.convert("RGB")).astype(np.uint8)
     alpha = np.asarray(mask).astype(np.uint8)
@@ -182,10 +303,57 @@ def clear_raw_key_alpha(raw: Image.Image, mask: Image.Image, raw_key_tolerance:
     return Image.fromarray(alpha, "L"), int(np.count_nonzero(target))
 
 
-def preview_tile(cutout: Image.Image, background: Image.Image, label: str, tile_size: int) -> Image.Image:
+def feather_halo(feather: float) -> int:
+    # Pillow's GaussianBlur runs three box passes that together reach about
+    # three radii; keep a couple of rows of slack on top.
+    return math.ceil(feather * 3) + 2 if feather > 0 else 0
+
+
+def cutout_rows(
+    raw: Image.Image,
+    mask_rows: Callable[[int, int], Image.Image],
+    strip_rows: int,
+    feather: float,
+    defringe_orange: bool,
+    despill_orange: bool,
+) -> Iterator[tuple[RowStrip, np.ndarray]]:
+    """Feather, defringe and despill the matte one strip at a time, yielding each strip's RGBA rows.
+
+    ``mask_rows(top, bottom)`` returns those rows of the thresholded
+    full-size mask. Each strip reads enough halo rows for the feather blur
+    and the despill dilation, so the rows match the whole-frame path.
+    """
+    width, height = raw.size
+    halo = feather_halo(feather) + (DESPILL_HALO if despill_orange else 0)
+    for strip in row_strips(height, strip_rows, halo):
+        window_raw = raw.crop((0, strip.window_top, width, strip.window_bottom)).convert("RGB")
+        window_mask = mask_rows(strip.window_top, strip.window_bottom)
+        if feather > 0:
+            window_mask = window_mask.filter(ImageFilter.GaussianBlur(feather))
+        if defringe_orange:
+            window_mask = defringe_orange_edges(window_raw, window_mask)
+        rgb = np.asarray(window_raw).astype(np.uint8)
+        if despill_orange:
+            rgb = despill_orange_rgb(rgb, window_raw, window_mask)
+        rows = np.empty((strip.bottom - strip.top, width, 4), dtype=np.uint8)
+        rows[:, :, :3] = rgb[strip.core]
+        rows[:, :, 3] = np.asarray(window_mask)[strip.core]
+        yield strip, rows
+
+
+def join_cutout_rows(size: tuple[int, int], strips: Iterator[tuple[RowStrip, np.ndarray]]) -> tuple[Image.Image, Image.Image]:
+    """Assemble cutout_rows into a whole-frame cutout and mask, for the steps that need the whole frame."""
+    out = np.empty((size[1], size[0], 4), dtype=np.uint8)
+    for strip, rows in strips:
+        out[strip.rows] = rows
+    cutout = Image.fromarray(out, "RGBA")
+    return cutout, cutout.getchannel("A")
+
+
+def preview_tile(cutout: PreviewPyramid, background: Image.Image, label: str, tile_size: int) -> Image.Image:
     tile = Image.new("RGBA", (tile_size, tile_size + 46), (18, 19, 24, 255))
-    bg = background.resize((tile_size, tile_size), Image.Resampling.BICUBIC).convert("RGBA")
-    fg = cutout.resize((tile_size, tile_size), Image.Resampling.LANCZOS)
+    bg = background.copy()
+    fg = cutout.resize((tile_size, tile_size))
     bg.alpha_composite(fg)
     tile.alpha_composite(bg, (0, 0))
     draw = ImageDraw.Draw(tile)
@@ -195,26 +363,38 @@ def preview_tile(cutout: Image.Image, background: Image.Image, label: str, tile_
 
 
 def make_review_sheet(raw: Image.Image, mask: Image.Image, cutout: Image.Image, output: Path) -> None:
-    tile_size = 384
+    tile_box = (REVIEW_TILE, REVIEW_TILE)
+    mask_rgba = Image.merge("RGBA", (mask, mask, mask, Image.new("L", mask.size, 255)))
+    save_review_sheet(
+        raw.convert("RGBA").resize(tile_box, Image.Resampling.LANCZOS),
+        mask_rgba.resize(tile_box, Image.Resampling.LANCZOS),
+        PreviewPyramid(cutout),
+        output,
+    )
+
+
+def save_review_sheet(raw_preview: Image.Image, mask_preview: Image.Image, cutout: PreviewPyramid, output: Path) -> None:
+    tile_size = REVIEW_TILE
     raw_tile = Image.new("RGBA", (tile_size, tile_size + 46), (18, 19, 24, 255))
-    raw_tile.alpha_composite(raw.convert("RGBA").resize((tile_size, tile_size), Image.Resampling.LANCZOS))
+    raw_tile.alpha_composite(raw_preview)
     draw = ImageDraw.Draw(raw_tile)
     draw.rectangle((0, tile_size, tile_size, tile_size + 46), fill=(12, 13, 17, 255))
     draw.text((14, tile_size + 14), "raw", fill=(235, 236, 240, 255))
 
-    mask_rgba = Image.merge("RGBA", (mask, mask, mask, Image.new("L", mask.size, 255)))
     mask_tile = Image.new("RGBA", (tile_size, tile_size + 46), (18, 19, 24, 255))
-    mask_tile.alpha_composite(mask_rgba.resize((tile_size, tile_size), Image.Resampling.LANCZOS))
+    mask_tile.alpha_composite(mask_preview)
     draw = ImageDraw.Draw(mask_tile)
     draw.rectangle((0, tile_size, tile_size, tile_size + 46), fill=(12, 13, 17, 255))
     draw.text((14, tile_size + 14), "BiRefNet alpha", fill=(235, 236, 240, 255))
 
+    tile_box = (tile_size, tile_size)
+    check = scaled_tile(32, cutout.size[0], tile_size)
     tiles = [
         raw_tile,
         mask_tile,
-        preview_tile(cutout, checker(cutout.size), "checker preview", tile_size),
-        preview_tile(cutout, Image.new("RGBA", cutout.size, (0, 0, 0, 255)), "black preview", tile_size),
-        preview_tile(cutout, Image.new("RGBA", cutout.size, (255, 255, 255, 255)), "white preview", tile_size),
+        preview_tile(cutout, background_tile(tile_box, REVIEW_CHECKER, check), "checker preview", tile_size),
+        preview_tile(cutout, background_tile(tile_box, BLACK), "black preview", tile_size),
+        preview_tile(cutout, background_tile(tile_box, WHITE), "white preview", tile_size),
     ]
     sheet = Image.new("RGBA", (tile_size * len(tiles), tile_size + 46), (18, 19, 24, 255))
     for index, tile in enumerate(tiles):
@@ -223,97 +403,672 @@ def make_review_sheet(raw: Image.Image, mask: Image.Image, cutout: Image.Image,
     sheet.save(output)
 
 
+def cutout_jobs(
+    input_dir: Path | None,
+    manifest: Path | None,
+    output_dir: Path | None,
+    probability_format: str | None = None,
+) -> list[CutoutJob]:
+    """Expand --input-dir or a JSON/text manifest into jobs.
+
+    Manifest entries are source paths or objects with ``input`` and optional
+    ``output``, ``mask_output``, ``review_output`` and ``probability_output``,
+    relative to the manifest file. Missing outputs go to ``output_dir`` as
+    ``<stem>_cutout.png``, ``<stem>_mask.png`` and ``<stem>_review.png``.
+    With ``probability_format``, each source without an explicit
+    ``probability_output`` gets ``<stem>_probability.<format>`` next to its mask.
+    """
+    entries: list[str | dict[str, str]]
+    if input_dir is not None:
+        base = input_dir
+        entries = [child.name for child in sorted(input_dir.iterdir()) if child.suffix.lower() in BATCH_SOURCE_SUFFIXES]
+    else:
+        base = manifest.parent
+        if manifest.suffix.lower() == ".json":
+            loaded = json.loads(manifest.read_text(encoding="utf-8"))
+            entries = loaded.get("sources", []) if isinstance(loaded, dict) else loaded
+        else:
+            lines = [line.strip() for line in manifest.read_text(encoding="utf-8").splitlines()]
+            entries = [line for line in lines if line and not line.startswith("#")]
+
+    jobs = []
+    for entry in entries:
+        entry = {"input": entry} if isinstance(entry, str) else entry
+        source = base / entry["input"]
+        outputs = {}
+        for key, suffix in (("output", "cutout"), ("mask_output", "mask"), ("review_output", "review")):
+            if entry.get(key):
+                outputs[key] = base / entry[key]
+            elif output_dir is None:
+                raise ValueError(f"--output-dir is required for {source} without an explicit {key}")
+            else:
+                outputs[key] = output_dir / f"{source.stem}_{suffix}.png"
+        if entry.get("probability_output"):
+            outputs["probability_output"] = base / entry["probability_output"]
+        elif probability_format:
+            outputs["probability_output"] = outputs["mask_output"].parent / f"{source.stem}_probability.{probability_format}"
+        jobs.append(CutoutJob(source, **outputs))
+    return jobs
+
+
 def main() -> None:
     parser = argparse.ArgumentParser()
-    parser.add_argument("--input", required=True, type=Path)
-    parser.add_argument("--output", required=True, type=Path)
-    parser.add_argument("--mask-output", required=True, type=Path)
-    parser.add_argument("--review-output", required=True, type=Path)
-    parser.add_argument("--model", default="ZhengPeng7/BiRefNet")
+    parser.add_argument("--input", type=Path)
+    parser.add_argument("--output", type=Path)
+    parser.add_argument("--mask-output", type=Path)
+    parser.add_argument(
+        "--probability-output",
+        type=Path,
+        help=(
+            "Also write the prediction at source size before any 8-bit step: float32 for .npy, 16-bit grayscale otherwise. "
+            "combine_unit_alpha_masks.py reads either."
+        ),
+    )
+    parser.add_argument("--review-output", type=Path)
+    parser.add_argument("--input-dir", type=Path, help="Batch mode: cut out every PNG/JPEG/WebP source in this directory.")
+    parser.add_argument("--manifest", type=Path, help="Batch mode: JSON or text manifest of sources (see cutout_jobs).")
+    parser.add_argument("--output-dir", type=Path, help="Batch output directory for sources without explicit outputs.")
+    parser.add_argument("--probability-format", choices=PROBABILITY_FORMATS, help="Batch mode: write <stem>_probability.<format> next to each mask.")
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=4,
+        help="Batch mode: sources per forward pass. Model activations and decoded sources grow with it; lower it when RAM or VRAM is short.",
+    )
+    parser.add_argument(
+        "--pipeline",
+        action="store_true",
+        help="Batch mode: decode, infer, clean and encode in separate threads with bounded queues, so PNG and NumPy work overlaps inference.",
+    )
+    parser.add_argument("--queue-size", type=int, default=2, help="--pipeline: items allowed to wait between two stages; each holds decoded sources.")
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    parser.add_argument("--model-revision", default=DEFAULT_REVISION, help="Hub branch, tag or commit. Pin a commit so cached predictions cannot go stale.")
+    parser.add_argument(
+        "--model-store",
+        type=Path,
+        help=(
+            f"Directory written by seed_unit_birefnet_model_store.py (default ${MODEL_STORE_ENV} with --backend torch). In-process torch loads then verify its hash manifest and "
+            "memory-map its safetensors weights with no hub calls; --model and --model-revision default to the store's."
+        ),
+    )
     parser.add_argument("--input-size", type=int, default=1024)
-    parser.add_argument("--device", default="auto", choices=["auto", "cuda", "cpu"])
+    parser.add_argument("--device", default="auto", choices=["auto", "cuda", "cpu"], help="Device for in-process torch inference; a worker keeps its own.")
+    parser.add_argument(
+        "--backend",
+        default="torch",
+        choices=BACKENDS,
+        help="onnxruntime runs the graph written by export_unit_birefnet_onnx.py on the CPU; its export check holds masks to a provisional, not yet validated ONNX_MASK_TOLERANCE of torch.",
+    )
+    parser.add_argument("--onnx-model", type=Path, help="Exported graph for --backend onnxruntime (default: the export_unit_birefnet_onnx.py output path).")
+    parser.add_argument("--onnx-threads", type=int, default=0, help="onnxruntime intra-op threads; 0 uses one per physical core.")
+    parser.add_argument(
+        "--precision",
+        default="fp32",
+        choices=PRECISIONS,
+        help="int8 runs the dynamically quantized graph cached by quantize_unit_birefnet_onnx.py (onnxruntime only); it is refused unless that graph passed the audit-metric gate.",
+    )
+    parser.add_argument(
+        "--worker-url",
+        default=os.environ.get(WORKER_URL_ENV, DEFAULT_WORKER_URL),
+        help=f"Warm serve_unit_birefnet_worker.py to ask for the mask first (default ${WORKER_URL_ENV} or {DEFAULT_WORKER_URL}).",
+    )
+    parser.add_argument("--no-worker", action="store_true", help="Always load the model in-process.")
+    parser.add_argument(
+        "--cache-dir",
+        type=Path,
+        default=default_cache_dir(),
+        help=f"Prediction cache keyed by source hash, model, revision and input size (default ${CACHE_DIR_ENV} or ~/.cache/unit_art/birefnet_predictions).",
+    )
+    parser.add_argument("--cache-max-mb", type=int, default=DEFAULT_CACHE_MAX_MB, help="Evict least recently used predictions beyond this size.")
+    parser.add_argument("--no-cache", action="store_true", help="Always run inference and leave the cache untouched.")
+    parser.add_argument(
+        "--coarse-size",
+        type=int,
+        default=0,
+        help="Coarse-to-fine mode: predict the whole frame at this size, then rerun only tiles on the silhouette's unsure band at --input-size. 0 disables; 256 suits typical unit sprites.",
+    )
+    parser.add_argument("--refine-window", type=int, default=192, help="Coarse-to-fine mode: model window per refinement tile, in --input-size pixels.")
     parser.add_argument("--threshold", type=int, default=0)
     parser.add_argument("--feather", type=float, default=0.0)
     parser.add_argument("--defringe-orange", action="store_true")
     parser.add_argument("--foreground-ml", action="store_true")
+    parser.add_argument(
+        "--foreground-band-margin",
+        type=int,
+        default=0,
+        help="Solve --foreground-ml only on soft-alpha tiles with this many pixels of context, copying opaque RGB and zeroing transparent pixels. 0 solves the whole frame; 8 suits typical sprites.",
+    )
     parser.add_argument("--despill-orange", action="store_true")
     parser.add_argument("--edge-orange-clean", action="store_true")
     parser.add_argument("--edge-clean-radius", type=int, default=4)
     parser.add_argument("--raw-key-tolerance", type=int, default=DEFAULT_RAW_KEY_TOLERANCE)
+    parser.add_argument(
+        "--strip-rows",
+        type=int,
+        default=0,
+        help=(
+            "Feather, defringe and despill the full-size matte in horizontal strips of this many rows and stream them into the "
+            "outputs to bound memory on 4K-8K sources. --edge-orange-clean and --sweep-dir still join the whole frame. 0 disables."
+        ),
+    )
+    parser.add_argument(
+        "--timings",
+        action="store_true",
+        help=(
+            "Also print inference= (cache, worker or in-process), model_load_seconds, wall_seconds, traced_peak_mb, "
+            "peak_rss_mb and the --pipeline stage usage; tracemalloc runs only with this flag."
+        ),
+    )
+    parser.add_argument(
+        "--sweep-dir",
+        type=Path,
+        help=(
+            "Sweep mode for one --input: run inference once, then write a cutout per --sweep-threshold/--sweep-feather/"
+            "--sweep-raw-key-tolerance combination, a comparison sheet (--review-output) and <stem>_sweep.csv ranked by audit fringe "
+            "plus lost foreground. --output and --mask-output get the top-ranked variant."
+        ),
+    )
+    parser.add_argument("--sweep-threshold", type=parse_sweep_ints, help="Comma-separated --threshold values (default: --threshold).")
+    parser.add_argument("--sweep-feather", type=parse_sweep_floats, help="Comma-separated --feather values (default: --feather).")
+    parser.add_argument(
+        "--sweep-raw-key-tolerance",
+        type=parse_sweep_ints,
+        help="Comma-separated --raw-key-tolerance values for the edge clean and the audit (default: --raw-key-tolerance).",
+    )
     args = parser.parse_args()
+    if args.strip_rows < 0:
+        parser.error("--strip-rows must be 0 or positive")
+    if args.strip_rows and args.foreground_ml:
+        parser.error("--foreground-ml solves over the whole frame and cannot be combined with --strip-rows")
+    if args.foreground_band_margin < 0:
+        parser.error("--foreground-band-margin must be 0 or positive")
+    if args.foreground_band_margin and not args.foreground_ml:
+        parser.error("--foreground-band-margin needs --foreground-ml")
+    if args.precision != "fp32" and args.backend != "onnxruntime":
+        parser.error(f"--precision {args.precision} needs --backend onnxruntime")
+    if args.model_store is not None and args.backend != "torch":
+        parser.error("--model-store holds torch weights; exported ONNX graphs load from --onnx-model")
+    args.model_store = configured_model_store(args.model_store, args.backend)
+    if args.model_store is not None:
+        try:
+            args.model, args.model_revision = model_store_identity(args.model_store, args.model, args.model_revision)
+        except (OSError, ValueError, KeyError) as exc:
+            parser.error(str(exc))
+    if args.batch_size < 1:
+        parser.error("--batch-size must be at least 1")
+    if args.queue_size < 1:
+        parser.error("--queue-size must be at least 1")
+    if args.coarse_size:
+        if args.backend != "torch":
+            parser.error("--coarse-size runs the model at several sizes; exported ONNX graphs have a fixed input size, so use --backend torch")
+        for name, value in (("--coarse-size", args.coarse_size), ("--refine-window", args.refine_window)):
+            if value <= 0 or value % MODEL_SIZE_MULTIPLE or value >= args.input_size:
+                parser.error(f"{name} must be a positive multiple of {MODEL_SIZE_MULTIPLE} below --input-size")
+        if args.refine_window <= 2 * REFINE_CONTEXT:
+            parser.error(f"--refine-window must exceed twice the {REFINE_CONTEXT}-pixel tile context")
+    sweeps = (args.sweep_threshold, args.sweep_feather, args.sweep_raw_key_tolerance)
+    if args.sweep_dir is None and any(values is not None for values in sweeps):
+        parser.error("--sweep-threshold, --sweep-feather and --sweep-raw-key-tolerance need --sweep-dir")
+    if args.sweep_dir is not None:
+        if args.input is None or args.input_dir is not None or args.manifest is not None:
+            parser.error("--sweep-dir sweeps a single --input")
+        stem = args.input.stem
+        args.output = args.output or args.sweep_dir / f"{stem}_cutout.png"
+        args.mask_output = args.mask_output or args.sweep_dir / f"{stem}_mask.png"
+        args.review_output = args.review_output or args.sweep_dir / f"{stem}_sweep.png"
+        args.sweep_threshold = args.sweep_threshold or [args.threshold]
+        args.sweep_feather = args.sweep_feather or [args.feather]
+        args.sweep_raw_key_tolerance = args.sweep_raw_key_tolerance or [args.raw_key_tolerance]
+    single = (args.input, args.output, args.mask_output, args.review_output)
+    if args.input_dir is None and args.manifest is None:
+        if any(value is None for value in single):
+            parser.error("--input, --output, --mask-output and --review-output are required unless --input-dir or --manifest is used")
+        if args.probability_format is not None:
+            parser.error("--probability-format names batch outputs; use --probability-output for a single source")
+        jobs = [CutoutJob(*single, args.probability_output)]
+    else:
+        if args.input_dir is not None and args.manifest is not None:
+            parser.error("use either --input-dir or --manifest")
+        if any(value is not None for value in single) or args.probability_output is not None:
+            parser.error("--input/--output/--mask-output/--review-output/--probability-output cannot be combined with --input-dir or --manifest")
+        try:
+            jobs = cutout_jobs(args.input_dir, args.manifest, args.output_dir, args.probability_format)
+        except (OSError, ValueError, KeyError) as exc:
+            parser.error(str(exc))
+        if not jobs:
+            parser.error("no batch sources found")
 
-    raw = Image.open(args.input).convert("RGBA")
-    model_image, original_size = fit_for_model(raw, args.input_size)
+    spec = ModelSpec(args.model, args.model_revision, args.backend, args.device, args.onnx_model, args.onnx_threads, args.precision, args.model_store)
+    predictor = MaskPredictor(spec, None if args.no_worker else args.worker_url)
+    cache = None if args.no_cache else PredictionCache(args.cache_dir, args.cache_max_mb * 1024 * 1024)
+    batches = [jobs[start:start + args.batch_size] for start in range(0, len(jobs), args.batch_size)]
+    pipeline = None
+    with RunMeter(trace=args.timings) as meter:
+        if args.sweep_dir is not None:
+            predicted = infer_batch(args, decode_batch(args, jobs, predictor, cache), predictor, cache)[0]
+            for line in sweep_prediction(args, predicted, args.sweep_dir):
+                print(line, flush=True)
+        elif args.pipeline:
+            pipeline = run_pipeline(batches, pipeline_stages(args, predictor, cache), args.queue_size)
+        else:
+            for batch in batches:
+                for report in remove_backgrounds(args, batch, predictor, cache):
+                    for line in report:
+                        print(line, flush=True)
+    # The default report stays the device, model, counts and paths; timing
+    # and where inference ran are opt-in.
+    if not args.timings:
+        return
+    if predictor.load_seconds is not None:
+        print(f"model_load_seconds={predictor.load_seconds:.3f}")
+    for line in meter.stats.lines():
+        print(line)
+    if pipeline is not None:
+        for line in pipeline.lines():
+            print(line)
 
-    device = "cuda" if args.device == "auto" and torch.cuda.is_available() else args.device
-    if device == "auto":
-        device = "cpu"
 
-    model = AutoModelForImageSegmentation.from_pretrained(args.model, trust_remote_code=True)
-    model.to(device)
-    model.eval()
+def load_source(path: Path, strip_rows: int) -> Image.Image:
+    # Strip mode keeps the decoded source as-is and converts it per strip. Pillow
+    # cannot decode a PNG a few rows at a time, so this frame is the floor.
+    return Image.open(path) if strip_rows else Image.open(path).convert("RGBA")
 
-    transform = transforms.Compose(
-        [
-            transforms.ToTensor(),
-            transforms.Normalize([0.485, 0.456, 0.406], [0.229, 0.224, 0.225]),
-        ]
-    )
-    tensor = transform(model_image).unsqueeze(0).to(device)
-    with torch.no_grad():
-        pred = extract_prediction(model(tensor)).sigmoid().detach().cpu()[0].squeeze()
-
-    arr = pred.numpy()
-    while arr.ndim > 2:
-        if arr.shape[0] == 1:
-            arr = arr[0]
-        elif arr.shape[-1] == 1:
-            arr = arr[..., 0]
+
+def decode_batch(
+    args: argparse.Namespace,
+    jobs: list[CutoutJob],
+    predictor: MaskPredictor,
+    cache: PredictionCache | None = None,
+) -> DecodedBatch:
+    """Open a batch's sources, look them up in the cache and resize the misses for the model."""
+    raws = [load_source(job.input, args.strip_rows) for job in jobs]
+    for raw in raws:
+        raw.load()
+    keys: list[str | None] = [None] * len(jobs)
+    arrays: list[np.ndarray | None] = [None] * len(jobs)
+    if cache is not None:
+        # "stretch" keeps entries from before the composite was stretched as a whole from being served.
+        refine = {"coarse_size": args.coarse_size, "window": args.refine_window, "stretch": "composite"} if args.coarse_size else None
+        keys = [cache.key(file_sha256(job.input), predictor.spec, args.input_size, refine) for job in jobs]
+        arrays = [cache.get(key) for key in keys]
+    # Coarse-to-fine mode resizes to several sizes itself.
+    model_images = [
+        fit_for_model(raw, args.input_size)[0] if arr is None and not args.coarse_size else None
+        for raw, arr in zip(raws, arrays)
+    ]
+    return DecodedBatch(jobs, raws, keys, arrays, model_images)
+
+
+def infer_batch(
+    args: argparse.Namespace,
+    batch: DecodedBatch,
+    predictor: MaskPredictor,
+    cache: PredictionCache | None = None,
+) -> list[PredictedCutout]:
+    """Run a single forward pass over the batch's cache misses and store their predictions."""
+    arrays = list(batch.arrays)
+    sources: dict[int, tuple[str, str]] = {}
+    refinements: list[str | None] = [None] * len(batch.jobs)
+    missing = [index for index, arr in enumerate(arrays) if arr is None]
+    if missing:
+        if args.coarse_size:
+            predicted, device, inference, refined = predict_coarse_to_fine(
+                predictor,
+                [batch.raws[index] for index in missing],
+                args.input_size,
+                args.coarse_size,
+                args.refine_window,
+                args.batch_size,
+            )
         else:
-            arr = np.max(arr, axis=0)
-    arr = (arr - arr.min()) / max(float(arr.max() - arr.min()), 1e-6)
-    mask = Image.fromarray((arr * 255).astype(np.uint8), "L").resize(original_size, Image.Resampling.LANCZOS)
-    if args.threshold > 0:
-        mask = mask.point(lambda value: 255 if value >= args.threshold else 0)
-    if args.feather > 0:
-        mask = mask.filter(ImageFilter.GaussianBlur(args.feather))
+            predicted, device, inference = predictor.predict_batch([batch.model_images[index] for index in missing])
+            refined = [None] * len(missing)
+        for index, arr, refinement in zip(missing, predicted, refined):
+            arrays[index] = arr
+            sources[index] = (device, inference)
+            refinements[index] = refinement
+            if cache is not None:
+                cache.put(batch.keys[index], arr)
+    # A cached prediction reports the device a fresh one would run on.
+    cached = (predictor.resolved_device(), "cache") if len(sources) < len(batch.jobs) else None
+    return [
+        PredictedCutout(job, raw, arr, *sources.get(index, cached), refinement)
+        for index, (job, raw, arr, refinement) in enumerate(zip(batch.jobs, batch.raws, arrays, refinements))
+    ]
+
+
+def remove_backgrounds(
+    args: argparse.Namespace,
+    jobs: list[CutoutJob],
+    predictor: MaskPredictor,
+    cache: PredictionCache | None = None,
+) -> list[list[str]]:
+    """Cut out one batch: a single forward pass for cache misses, then the per-image steps in job order."""
+    predicted = infer_batch(args, decode_batch(args, jobs, predictor, cache), predictor, cache)
+    reports = []
+    while predicted:
+        reports.append(write_cutout(args, clean_prediction(args, predicted.pop(0))))
+    return reports
+
+
+def pipeline_stages(args: argparse.Namespace, predictor: MaskPredictor, cache: PredictionCache | None) -> list[PipelineStage]:
+    """remove_backgrounds split into decode, inference, NumPy clean-up and PNG encode threads.
+
+    Inference still takes whole batches; the stages after it take one image
+    at a time, so an image can be cleaned and saved while the next batch
+    runs through the model. Streamed strip mode cleans each strip as the
+    PNG writers ask for it, so there clean and encode are one
+    ``clean-encode`` stage and its usage reports them together.
+    """
+
+    def write(cleaned: CleanedCutout) -> list[list[str]]:
+        report = write_cutout(args, cleaned)
+        for line in report:
+            print(line, flush=True)
+        return []
+
+    stages = [
+        PipelineStage("decode", lambda jobs: [decode_batch(args, jobs, predictor, cache)]),
+        PipelineStage("infer", lambda batch: infer_batch(args, batch, predictor, cache)),
+    ]
+    if args.strip_rows and not args.edge_orange_clean:
+        return stages + [PipelineStage("clean-encode", lambda predicted: write(clean_prediction(args, predicted)))]
+    return stages + [
+        PipelineStage("clean", lambda predicted: [clean_prediction(args, predicted)]),
+        PipelineStage("encode", write),
+    ]
+
+
+def predict_coarse_to_fine(
+    predictor: MaskPredictor,
+    raws: list[Image.Image],
+    input_size: int,
+    coarse_size: int,
+    window: int,
+    batch_size: int,
+) -> tuple[list[np.ndarray], str, str, list[str]]:
+    """Predict whole frames at ``coarse_size``, then rerun only the tiles on each unsure band at ``input_size``.
+
+    The result is an ``input_size`` prediction like a full pass: coarse
+    values where the coarse pass was sure, refined values on the band. An
+    image whose band covers so many tiles that refinement would cost as many
+    model pixels as a full pass gets the full pass instead. Also returns a
+    ``refined_tiles=`` note per image.
+
+    Every pass keeps the raw sigmoid so coarse and tile values share one
+    scale; each finished prediction is then stretched once, like a full
+    pass's.
+    """
+    coarse, device, inference = predictor.predict_batch([fit_for_model(raw, coarse_size)[0] for raw in raws], stretch=False)
+    fine_images = [fit_for_model(raw, input_size)[0] for raw in raws]
+    # The band's sure/unsure bounds are on the stretched 0-1 scale.
+    bands = [uncertain_band(normalize_prediction(arr), input_size) for arr in coarse]
+    plans: list[list | None] = []
+    for band in bands:
+        tiles = refine_tiles(band, window, REFINE_CONTEXT)
+        plans.append(tiles if coarse_size ** 2 + len(tiles) * window ** 2 < input_size ** 2 else None)
+
+    # Keep each tile forward pass at about the pixel count of a full-size batch.
+    chunk = batch_size * max(1, (input_size // window) ** 2)
+    crops = [fine.crop(tile.window) for fine, tiles in zip(fine_images, plans) if tiles for tile in tiles]
+    tile_predictions: list[np.ndarray] = []
+    for start in range(0, len(crops), chunk):
+        # A crop's own range says nothing about the frame's, so it is not stretched.
+        predicted, device, inference = predictor.predict_batch(crops[start:start + chunk], stretch=False)
+        tile_predictions += predicted
+    del crops
+    full = [index for index, tiles in enumerate(plans) if tiles is None]
+    full_predictions: list[np.ndarray] = []
+    if full:
+        full_predictions, device, inference = predictor.predict_batch([fine_images[index] for index in full], stretch=False)
+
+    total = tile_count(input_size, window, REFINE_CONTEXT)
+    arrays: list[np.ndarray] = []
+    notes: list[str] = []
+    for arr, band, tiles in zip(coarse, bands, plans):
+        if tiles is None:
+            arrays.append(normalize_prediction(full_predictions.pop(0)))
+            notes.append("refined_tiles=full")
+            continue
+        arrays.append(normalize_prediction(composite_refinement(arr, band, tiles, tile_predictions[:len(tiles)])))
+        del tile_predictions[:len(tiles)]
+        notes.append(f"refined_tiles={len(tiles)}/{total}")
+    return arrays, device, inference, notes
+
+
+def threshold_mask(mask: Image.Image, threshold: int) -> Image.Image:
+    return mask.point(lambda value: 255 if value >= threshold else 0) if threshold > 0 else mask
+
+
+def composite_cutout(args: argparse.Namespace, raw: Image.Image, mask: Image.Image, feather: float) -> tuple[Image.Image, Image.Image]:
+    """Feather, defringe, foreground-solve and despill a thresholded mask into the RGBA cutout and its final mask."""
+    if args.strip_rows:
+        strips = cutout_rows(
+            raw,
+            lambda top, bottom: mask.crop((0, top, raw.width, bottom)),
+            args.strip_rows,
+            feather,
+            args.defringe_orange,
+            args.despill_orange,
+        )
+        return join_cutout_rows(raw.size, strips)
+    if feather > 0:
+        mask = mask.filter(ImageFilter.GaussianBlur(feather))
     if args.defringe_orange:
         mask = defringe_orange_edges(raw, mask)
 
-    rgb = estimate_foreground_rgb(raw, mask) if args.foreground_ml else np.asarray(raw.convert("RGB")).astype(np.uint8)
+    if args.foreground_ml and args.foreground_band_margin:
+        rgb = estimate_foreground_band(raw, mask, args.foreground_band_margin)
+    elif args.foreground_ml:
+        rgb = estimate_foreground_rgb(raw, mask)
+    else:
+        rgb = np.asarray(raw.convert("RGB")).astype(np.uint8)
     if args.despill_orange:
         rgb = despill_orange_rgb(rgb, raw, mask)
-    safety_orange_cleaned = 0
-    raw_key_alpha_cleared = 0
-    visual_fringe_alpha_cleared = 0
-
     cutout = Image.fromarray(rgb, "RGB").convert("RGBA")
     cutout.putalpha(mask)
-    if args.edge_orange_clean:
-        cutout, safety_orange_cleaned, raw_key_alpha_cleared, visual_fringe_alpha_cleared = clean_cutout_background(
-            cutout,
-            args.edge_clean_radius,
-            raw,
-            args.raw_key_tolerance,
-        )
-        mask = cutout.getchannel("A")
+    return cutout, mask
+
+
+def edge_clean_cutout(
+    args: argparse.Namespace,
+    predicted: PredictedCutout,
+    cutout: Image.Image,
+    mask: Image.Image,
+    raw_key_tolerance: int,
+) -> CleanedCutout:
+    if not args.edge_orange_clean:
+        return CleanedCutout(predicted, cutout, mask)
+    cutout, safety_orange_cleaned, raw_key_alpha_cleared, visual_fringe_alpha_cleared = clean_cutout_background(
+        cutout,
+        args.edge_clean_radius,
+        predicted.raw,
+        raw_key_tolerance,
+    )
+    return CleanedCutout(predicted, cutout, cutout.getchannel("A"), safety_orange_cleaned, raw_key_alpha_cleared, visual_fringe_alpha_cleared)
+
 
-    args.output.parent.mkdir(parents=True, exist_ok=True)
-    args.mask_output.parent.mkdir(parents=True, exist_ok=True)
-    cutout.save(args.output)
-    mask.save(args.mask_output)
-    make_review_sheet(raw, mask, cutout, args.review_output)
+def clean_prediction(args: argparse.Namespace, predicted: PredictedCutout) -> CleanedCutout:
+    """Turn a prediction into the final cutout and mask: every NumPy and filter step, no file I/O.
 
-    print(f"device={device}")
-    print(f"model={args.model}")
+    In strip mode the full-size mask is never built. Without
+    --edge-orange-clean the strips are left for write_cutout to composite
+    and stream out one at a time; the edge clean follows fringe across the
+    whole frame, so with it the strips are joined into a whole cutout first.
+    """
+    if not args.strip_rows:
+        mask = threshold_mask(probability_mask(predicted.arr, predicted.raw.size), args.threshold)
+        cutout, mask = composite_cutout(args, predicted.raw, mask, args.feather)
+        return edge_clean_cutout(args, predicted, cutout, mask, args.raw_key_tolerance)
+    probability = ProbabilityRows(predicted.arr, predicted.raw.size)
+    strips = cutout_rows(
+        predicted.raw,
+        lambda top, bottom: threshold_mask(probability.rows(top, bottom), args.threshold),
+        args.strip_rows,
+        args.feather,
+        args.defringe_orange,
+        args.despill_orange,
+    )
+    if not args.edge_orange_clean:
+        return CleanedCutout(predicted, None, None, strips=strips)
+    cutout, mask = join_cutout_rows(predicted.raw.size, strips)
+    return edge_clean_cutout(args, predicted, cutout, mask, args.raw_key_tolerance)
+
+
+def write_cutout_strips(raw: Image.Image, strips: Iterator[tuple[RowStrip, np.ndarray]], job: CutoutJob) -> None:
+    """Stream strip-mode rows into the cutout and mask PNGs and the review sheet's reduced copies.
+
+    The files match the whole-frame path's; beyond the decoded source only a
+    strip and the review-size previews are held.
+    """
+    size = raw.size
+    tile_box = (REVIEW_TILE, REVIEW_TILE)
+    raw_preview = StripResize(size, tile_box)
+    mask_preview = StripResize(size, tile_box)
+    cutout_level = StripReduce(preview_halvings(size, tile_box))
+    job.output.parent.mkdir(parents=True, exist_ok=True)
+    job.mask_output.parent.mkdir(parents=True, exist_ok=True)
+    with PngStripWriter(job.output, size, "RGBA") as cutout_png, PngStripWriter(job.mask_output, size, "L") as mask_png:
+        for strip, rows in strips:
+            alpha = rows[:, :, 3]
+            cutout_png.write(rows)
+            mask_png.write(alpha)
+            raw_preview.add(raw.crop((0, strip.top, raw.width, strip.bottom)).convert("RGBA"))
+            mask_preview.add(Image.fromarray(np.dstack((alpha, alpha, alpha, np.full_like(alpha, 255))), "RGBA"))
+            cutout_level.add(Image.fromarray(rows, "RGBA").convert("RGBa"))
+    save_review_sheet(raw_preview.result(), mask_preview.result(), PreviewPyramid.from_level(size, cutout_level.result()), job.review_output)
+
+
+def write_cutout(args: argparse.Namespace, cleaned: CleanedCutout) -> list[str]:
+    """Save the cutout, mask and review sheet, and return the report lines."""
+    predicted = cleaned.predicted
+    job = predicted.job
+    if cleaned.strips is not None:
+        write_cutout_strips(predicted.raw, cleaned.strips, job)
+    else:
+        job.output.parent.mkdir(parents=True, exist_ok=True)
+        job.mask_output.parent.mkdir(parents=True, exist_ok=True)
+        cleaned.cutout.save(job.output)
+        cleaned.mask.save(job.mask_output)
+        make_review_sheet(predicted.raw, cleaned.mask, cleaned.cutout, job.review_output)
+    if job.probability_output is not None:
+        save_probability_map(job.probability_output, probability_map(predicted.arr, predicted.raw.size))
+
+    report = [f"device={predicted.device}", f"model={args.model}"]
+    if args.timings:
+        report.append(f"inference={predicted.inference}")
+    if args.backend != "torch":
+        report.append(f"backend={args.backend}")
+    if args.precision != "fp32":
+        report.append(f"precision={args.precision}")
+    if predicted.refinement:
+        report.append(predicted.refinement)
     if args.edge_orange_clean:
-        print(f"safety_orange_cleaned={safety_orange_cleaned}")
-        print(f"edge_orange_cleaned={safety_orange_cleaned}")
-        print(f"raw_key_alpha_cleared={raw_key_alpha_cleared}")
-        print(f"visual_fringe_alpha_cleared={visual_fringe_alpha_cleared}")
-    print(args.output)
-    print(args.mask_output)
-    print(args.review_output)
+        report += [
+            f"safety_orange_cleaned={cleaned.safety_orange_cleaned}",
+            f"edge_orange_cleaned={cleaned.safety_orange_cleaned}",
+            f"raw_key_alpha_cleared={cleaned.raw_key_alpha_cleared}",
+            f"visual_fringe_alpha_cleared={cleaned.visual_fringe_alpha_cleared}",
+        ]
+    report += [str(job.output), str(job.mask_output), str(job.review_output)]
+    return report + ([str(job.probability_output)] if job.probability_output is not None else [])
+
+
+def sweep_prediction(args: argparse.Namespace, predicted: PredictedCutout, sweep_dir: Path) -> list[str]:
+    """Cut one prediction out with every sweep combination and write the cutouts, comparison sheet and ranking CSV.
+
+    Every variant starts from the same probability map. The resize to source
+    size runs once, each threshold once, and feathering, defringe,
+    foreground solving and despill once per threshold/feather pair; only the
+    edge clean and the audit run per raw-key tolerance. Variants are ranked
+    by their gated audit fringe counts plus ``lost_foreground_pixels``, the
+    pixels the bare prediction holds at alpha 128 or more that the variant
+    drops below it, so clearing the whole sprite never ranks first.
+    """
+    raw = predicted.raw
+    raw_rgb = np.asarray(raw.convert("RGB"))
+    stem = predicted.job.input.stem
+    base = probability_mask(predicted.arr, raw.size)
+    foreground = np.asarray(base) >= 128
+    tile_size = 256
+    checker = scaled_tile(32, raw.width, tile_size)
+    rows: list[dict[str, object]] = []
+    tiles: list[Image.Image] = []
+    best: tuple[int, CleanedCutout] | None = None
+    sweep_dir.mkdir(parents=True, exist_ok=True)
+    for threshold in args.sweep_threshold:
+        mask = threshold_mask(base, threshold)
+        for feather in args.sweep_feather:
+            cutout, composite_mask = composite_cutout(args, raw, mask, feather)
+            for tolerance in args.sweep_raw_key_tolerance:
+                variant = SweepVariant(threshold, feather, tolerance)
+                cleaned = edge_clean_cutout(args, predicted, cutout, composite_mask, tolerance)
+                rgba = np.asarray(cleaned.cutout)
+                metrics = edge_metrics(rgba, args.edge_clean_radius, raw_rgb, tolerance)
+                fringe = sum(metrics[name] for name in GATED_METRICS)
+                lost = int(np.count_nonzero(foreground & (rgba[:, :, 3] < 128)))
+                path = sweep_dir / f"{stem}_{variant.label}.png"
+                cleaned.cutout.save(path)
+                rows.append(
+                    {
+                        "label": variant.label,
+                        "threshold": threshold,
+                        "feather": feather,
+                        "raw_key_tolerance": tolerance,
+                        "score": fringe + lost,
+                        "fringe_pixels": fringe,
+                        "lost_foreground_pixels": lost,
+                        "alpha_pixels": int(np.count_nonzero(rgba[:, :, 3] > 8)),
+                        **metrics,
+                        "safety_orange_cleaned": cleaned.safety_orange_cleaned,
+                        "raw_key_alpha_cleared": cleaned.raw_key_alpha_cleared,
+                        "visual_fringe_alpha_cleared": cleaned.visual_fringe_alpha_cleared,
+                        "cutout": str(path),
+                    }
+                )
+                tiles.append(
+                    preview_tile(
+                        PreviewPyramid(cleaned.cutout),
+                        background_tile((tile_size, tile_size), REVIEW_CHECKER, checker),
+                        f"{variant.label}\nfringe={fringe} lost={lost}",
+                        tile_size,
+                    )
+                )
+                if best is None or fringe + lost < best[0]:
+                    best = (fringe + lost, cleaned)
+
+    order = sorted(range(len(rows)), key=lambda index: (rows[index]["score"], index))
+    ranked = [{"rank": rank, **rows[index]} for rank, index in enumerate(order, start=1)]
+    csv_path = sweep_dir / f"{stem}_sweep.csv"
+    with csv_path.open("w", encoding="utf-8", newline="") as handle:
+        writer = csv.DictWriter(handle, fieldnames=list(ranked[0].keys()))
+        writer.writeheader()
+        writer.writerows(ranked)
+
+    columns = min(len(tiles), max(1, math.ceil(math.sqrt(len(tiles)))))
+    sheet_rows = math.ceil(len(tiles) / columns)
+    sheet = Image.new("RGBA", (tile_size * columns, (tile_size + 46) * sheet_rows), (18, 19, 24, 255))
+    for position, index in enumerate(order):
+        ImageDraw.Draw(tiles[index]).text((tile_size - 44, tile_size + 14), f"#{position + 1}", fill=(235, 236, 240, 255))
+        sheet.alpha_composite(tiles[index], ((position % columns) * tile_size, (position // columns) * (tile_size + 46)))
+    job = predicted.job
+    for path in (job.review_output, job.output, job.mask_output):
+        path.parent.mkdir(parents=True, exist_ok=True)
+    sheet.save(job.review_output)
+    # The top-ranked variant doubles as the run's cutout and mask.
+    best[1].cutout.save(job.output)
+    best[1].mask.save(job.mask_output)
+    if job.probability_output is not None:
+        save_probability_map(job.probability_output, probability_map(predicted.arr, raw.size))
+
+    report = [f"device={predicted.device}", f"model={args.model}"]
+    if args.timings:
+        report.append(f"inference={predicted.inference}")
+    if predicted.refinement:
+        report.append(predicted.refinement)
+    report += [f"sweep_variants={len(rows)}", f"sweep_best={ranked[0]['label']}", f"sweep_best_score={ranked[0]['score']}"]
+    report += [str(job.output), str(job.mask_output), str(job.review_output), str(csv_path)]
+    return report + ([str(job.probability_output)] if job.probability_output is not None else [])
 
 
 if __name__ == "__main__":
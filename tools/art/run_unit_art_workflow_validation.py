@@ -9,9 +9,12 @@ import sys
 from datetime import date
 from pathlib import Path
 
-from PIL import Image, ImageDraw
+from clean_unit_cutout_orange_edge import assert_edge_clean_delta_contract, edge_clean_delta_stats, stats_output_path
+from unit_art_files import file_sha256
+from unit_art_lazy import lazy_import
 
-from clean_unit_cutout_orange_edge import assert_edge_clean_delta_contract, edge_clean_delta_stats, file_sha256, stats_output_path
+Image = lazy_import("PIL.Image")
+ImageDraw = lazy_import("PIL.ImageDraw")
 
 
 ROOT = Path(__file__).resolve().parents[2]
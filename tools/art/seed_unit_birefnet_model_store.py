@@ -0,0 +1,85 @@
+from __future__ import annotations
+
+import argparse
+import json
+import shutil
+from datetime import date
+from pathlib import Path
+
+from unit_art_birefnet import (
+    DEFAULT_MODEL,
+    DEFAULT_REVISION,
+    MODEL_STORE_MANIFEST,
+    default_model_store,
+    verify_model_store,
+)
+from unit_art_files import file_sha256
+
+
+# What transformers needs to build BiRefNet offline: config, remote code and
+# safetensors weights. Pickled .bin/.pth checkpoints are never copied.
+STORE_PATTERNS = ("*.json", "*.py", "*.safetensors")
+
+
+def seed_store(model: str, revision: str, output: Path, from_cache: bool) -> dict[str, object]:
+    """Copy one hub snapshot into ``output`` and write its hash manifest."""
+    from huggingface_hub import snapshot_download
+
+    snapshot = Path(snapshot_download(repo_id=model, revision=revision, allow_patterns=list(STORE_PATTERNS), local_files_only=from_cache))
+    names = sorted(path.relative_to(snapshot).as_posix() for path in snapshot.rglob("*") if path.is_file())
+    if not any(name.endswith(".safetensors") for name in names):
+        raise ValueError(f"{model}@{revision} has no safetensors weights")
+    output.mkdir(parents=True, exist_ok=True)
+    files = {}
+    for name in names:
+        target = output / name
+        target.parent.mkdir(parents=True, exist_ok=True)
+        # The hub cache holds symlinks into its blob store; copy the bytes.
+        shutil.copyfile(snapshot / name, target)
+        files[name] = {"bytes": target.stat().st_size, "sha256": file_sha256(target)}
+    manifest = {
+        "schema_version": 1,
+        "tool": "seed_unit_birefnet_model_store.py",
+        "seeded": date.today().isoformat(),
+        "model": model,
+        "revision": revision,
+        # The hub cache names each snapshot directory after its commit.
+        "commit": snapshot.name,
+        "files": files,
+    }
+    (output / MODEL_STORE_MANIFEST).write_text(json.dumps(manifest, indent=2) + "\n", encoding="utf-8")
+    return manifest
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description=(
+            "Copy a BiRefNet checkpoint's safetensors weights, config and remote code into a local model store with a sha256 manifest, "
+            "for remove_unit_background_birefnet.py --model-store and serve_unit_birefnet_worker.py --model-store."
+        )
+    )
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    parser.add_argument("--model-revision", default=DEFAULT_REVISION, help="Pin a commit so the store and cached predictions cannot drift.")
+    parser.add_argument("--output", type=Path, help="Store directory (default: ~/.cache/unit_art/models/<model>@<revision>).")
+    parser.add_argument("--from-cache", action="store_true", help="Seed from the local Hugging Face cache only, with no network access.")
+    parser.add_argument("--verify-only", action="store_true", help="Rehash an existing store against its manifest instead of seeding it.")
+    args = parser.parse_args()
+
+    output = args.output or default_model_store(args.model, args.model_revision)
+    if not args.verify_only:
+        seed_store(args.model, args.model_revision, output, args.from_cache)
+    try:
+        manifest = verify_model_store(output, full=True)
+    except (OSError, ValueError) as exc:
+        print(f"FAIL {output}: {exc}")
+        return 1
+    print(f"model_store={output}")
+    print(f"model={manifest['model']}@{manifest['revision']}")
+    print(f"commit={manifest['commit']}")
+    print(f"files={len(manifest['files'])}")
+    print(f"bytes={sum(entry['bytes'] for entry in manifest['files'].values())}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
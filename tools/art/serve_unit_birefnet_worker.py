@@ -0,0 +1,180 @@
+from __future__ import annotations
+
+import argparse
+import json
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+# Imported eagerly, unlike the lazy_import tools: request threads would
+# otherwise race to finish the deferred import, and LazyLoader is not
+# thread-safe before Python 3.12.
+import numpy as np
+from PIL import Image
+
+from unit_art_birefnet import (
+    BACKENDS,
+    DEFAULT_MODEL,
+    DEFAULT_REVISION,
+    DEFAULT_WORKER_URL,
+    MODEL_STORE_ENV,
+    PRECISIONS,
+    BiRefNetSession,
+    ModelSpec,
+    OnnxSession,
+    configured_model_store,
+    encode_array,
+    model_store_identity,
+)
+
+
+class WorkerState:
+    def __init__(self, session: BiRefNetSession | OnnxSession, load_seconds: float, quiet: bool = False) -> None:
+        self.session = session
+        self.load_seconds = load_seconds
+        self.quiet = quiet
+        self.started = time.time()
+        self.served = 0
+        # One model instance: health checks stay responsive while predictions queue here.
+        self.lock = threading.Lock()
+
+    def health(self) -> dict[str, object]:
+        return {
+            "status": "ok",
+            "model": self.session.model_name,
+            "revision": self.session.revision,
+            "backend": self.session.backend,
+            "precision": self.session.precision,
+            "device": self.session.device,
+            "load_seconds": round(self.load_seconds, 3),
+            "uptime_seconds": round(time.time() - self.started, 3),
+            "served": self.served,
+        }
+
+
+def make_handler(state: WorkerState) -> type[BaseHTTPRequestHandler]:
+    class Handler(BaseHTTPRequestHandler):
+        def send_json(self, status: int, payload: dict[str, object]) -> None:
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self) -> None:
+            if urllib.parse.urlsplit(self.path).path != "/health":
+                self.send_json(404, {"error": f"unknown path {self.path}"})
+                return
+            self.send_json(200, state.health())
+
+        def do_POST(self) -> None:
+            parts = urllib.parse.urlsplit(self.path)
+            if parts.path != "/predict":
+                self.send_json(404, {"error": f"unknown path {self.path}"})
+                return
+            query = urllib.parse.parse_qs(parts.query)
+            try:
+                model = query["model"][0]
+                revision = query.get("revision", [DEFAULT_REVISION])[0]
+                backend = query.get("backend", ["torch"])[0]
+                precision = query.get("precision", ["fp32"])[0]
+                width = int(query["width"][0])
+                height = int(query["height"][0])
+                count = int(query.get("count", ["1"])[0])
+                stretch = query.get("stretch", ["1"])[0] != "0"
+                length = int(self.headers.get("Content-Length", "0"))
+            except (KeyError, IndexError, ValueError) as exc:
+                self.send_json(400, {"error": f"bad predict request: {exc}"})
+                return
+            payload = self.rfile.read(length)
+            session = state.session
+            if (model, revision, backend, precision) != (session.model_name, session.revision, session.backend, session.precision):
+                served = f"{session.model_name}@{session.revision} on {session.backend} {session.precision}"
+                self.send_json(409, {"error": f"worker serves {served}, not {model}@{revision} on {backend} {precision}"})
+                return
+            frame = width * height * 3
+            if count < 1 or length != frame * count:
+                self.send_json(400, {"error": f"expected {count} x {frame} RGB bytes, got {length}"})
+                return
+            try:
+                images = [Image.frombytes("RGB", (width, height), payload[index * frame:(index + 1) * frame]) for index in range(count)]
+                with state.lock:
+                    arrays = state.session.predict_batch(images, stretch)
+                    state.served += count
+            except Exception as exc:
+                self.send_json(500, {"error": f"{type(exc).__name__}: {exc}"})
+                return
+            body = encode_array(np.stack(arrays))
+            self.send_response(200)
+            self.send_header("Content-Type", "application/octet-stream")
+            self.send_header("Content-Length", str(len(body)))
+            self.send_header("X-Device", state.session.device)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format: str, *args: object) -> None:
+            if not state.quiet:
+                super().log_message(format, *args)
+
+    return Handler
+
+
+def main() -> None:
+    default = urllib.parse.urlsplit(DEFAULT_WORKER_URL)
+    parser = argparse.ArgumentParser(
+        description=(
+            "Keep a BiRefNet model loaded and serve masks to remove_unit_background_birefnet.py over localhost HTTP, "
+            "so each cutout run skips model load."
+        )
+    )
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    parser.add_argument("--model-revision", default=DEFAULT_REVISION)
+    parser.add_argument(
+        "--model-store",
+        type=Path,
+        help=f"Load torch weights from this seed_unit_birefnet_model_store.py directory without hub calls (default ${MODEL_STORE_ENV} with --backend torch).",
+    )
+    parser.add_argument("--device", default="auto", choices=["auto", "cuda", "cpu"])
+    parser.add_argument("--backend", default="torch", choices=BACKENDS)
+    parser.add_argument("--onnx-model", type=Path, help="Exported graph for --backend onnxruntime (default: the export_unit_birefnet_onnx.py output path).")
+    parser.add_argument("--onnx-threads", type=int, default=0, help="onnxruntime intra-op threads; 0 uses one per physical core.")
+    parser.add_argument("--precision", default="fp32", choices=PRECISIONS, help="int8 serves the gated graph from quantize_unit_birefnet_onnx.py.")
+    parser.add_argument("--host", default=default.hostname, help="Bind address. Keep it on loopback; the worker has no authentication.")
+    parser.add_argument("--port", type=int, default=default.port)
+    parser.add_argument("--quiet", action="store_true", help="Do not log each request.")
+    args = parser.parse_args()
+    if args.model_store is not None and args.backend != "torch":
+        parser.error("--model-store holds torch weights; exported ONNX graphs load from --onnx-model")
+    args.model_store = configured_model_store(args.model_store, args.backend)
+    if args.model_store is not None:
+        try:
+            args.model, args.model_revision = model_store_identity(args.model_store, args.model, args.model_revision)
+        except (OSError, ValueError, KeyError) as exc:
+            parser.error(str(exc))
+
+    started = time.perf_counter()
+    spec = ModelSpec(args.model, args.model_revision, args.backend, args.device, args.onnx_model, args.onnx_threads, args.precision, args.model_store)
+    session = spec.load()
+    state = WorkerState(session, time.perf_counter() - started, args.quiet)
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(state))
+    print(f"model={session.model_name}")
+    print(f"backend={session.backend}")
+    print(f"precision={session.precision}")
+    print(f"device={session.device}")
+    if args.model_store is not None:
+        print(f"model_store={args.model_store}")
+    print(f"load_seconds={state.load_seconds:.3f}")
+    print(f"url=http://{args.host}:{server.server_port}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,677 @@
+from __future__ import annotations
+
+import contextlib
+import hashlib
+import io
+import json
+import os
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+
+from unit_art_files import file_sha256, file_stamp
+from unit_art_lazy import lazy_import
+from unit_art_strips import LanczosRows
+
+np = lazy_import("numpy")
+Image = lazy_import("PIL.Image")
+
+
+DEFAULT_MODEL = "ZhengPeng7/BiRefNet"
+DEFAULT_REVISION = "main"
+BACKENDS = ("torch", "onnxruntime")
+PRECISIONS = ("fp32", "int8")
+IMAGENET_MEAN = (0.485, 0.456, 0.406)
+IMAGENET_STD = (0.229, 0.224, 0.225)
+# BiRefNet's decoder uses deformable convolutions, which ONNX only has as a
+# standard op from opset 19.
+ONNX_OPSET = 19
+# Largest per-pixel difference allowed between torch and onnxruntime masks,
+# in 8-bit alpha levels at the model resolution. The export check enforces it.
+# Provisional: it has not been validated against a real BiRefNet export yet;
+# set it from benchmark_unit_birefnet_backends.py's mask_max_level_diff on
+# the roster once that has been measured.
+ONNX_MASK_TOLERANCE = 2
+DEFAULT_WORKER_URL = "http://127.0.0.1:8765"
+WORKER_URL_ENV = "UNIT_ART_BIREFNET_WORKER"
+# Inference on a CPU box can take a minute or more per image; connecting to a
+# worker that is not running fails immediately regardless of this timeout.
+WORKER_TIMEOUT_SECONDS = 600.0
+CACHE_DIR_ENV = "UNIT_ART_PREDICTION_CACHE"
+DEFAULT_CACHE_MAX_MB = 2048
+# Bump when the cached array's meaning changes so old entries stop matching.
+PREDICTION_CACHE_VERSION = 1
+# Full scale of a 16-bit probability-map PNG.
+PROBABILITY_PNG_MAX = 65535
+PROBABILITY_FORMATS = ("npy", "png")
+MODEL_STORE_ENV = "UNIT_ART_MODEL_STORE"
+MODEL_STORE_MANIFEST = "unit_art_model_store.json"
+# Size and mtime of each file at its last full hash check, so later loads
+# only rehash files that changed on disk.
+MODEL_STORE_STAMP = "unit_art_model_store.verified.json"
+
+
+@dataclass(frozen=True)
+class ModelSpec:
+    """Which BiRefNet weights, and which runtime, produce a prediction."""
+
+    model: str = DEFAULT_MODEL
+    revision: str = DEFAULT_REVISION
+    backend: str = "torch"
+    device: str = "auto"
+    onnx_model: Path | None = None
+    onnx_threads: int = 0
+    precision: str = "fp32"
+    model_store: Path | None = None
+
+    def onnx_path(self) -> Path:
+        return self.onnx_model or default_onnx_path(self.model, self.revision, self.precision)
+
+    def load(self) -> BiRefNetSession | OnnxSession:
+        if self.backend == "onnxruntime":
+            return OnnxSession(self.onnx_path(), self.model, self.revision, self.onnx_threads, self.precision)
+        if self.precision != "fp32":
+            raise ValueError(f"--precision {self.precision} runs a quantized ONNX graph; use --backend onnxruntime")
+        return BiRefNetSession(self.model, self.device, self.revision, self.model_store)
+
+
+class WorkerUnavailable(Exception):
+    """No usable worker answered; the caller should run the model in-process."""
+
+
+def resolve_device(device: str) -> str:
+    import torch
+
+    if device == "auto":
+        return "cuda" if torch.cuda.is_available() else "cpu"
+    return device
+
+
+def extract_prediction(output: object):
+    import torch
+
+    if isinstance(output, torch.Tensor):
+        return output
+    if isinstance(output, dict):
+        for value in reversed(list(output.values())):
+            try:
+                return extract_prediction(value)
+            except TypeError:
+                continue
+    if isinstance(output, (list, tuple)):
+        for value in reversed(output):
+            try:
+                return extract_prediction(value)
+            except TypeError:
+                continue
+    raise TypeError(f"Could not find tensor prediction in output type {type(output)!r}")
+
+
+def normalize_prediction(arr: np.ndarray, stretch: bool = True) -> np.ndarray:
+    """Squeeze a sigmoid prediction to 2-D and, with ``stretch``, stretch it to the 0-1 range."""
+    while arr.ndim > 2:
+        if arr.shape[0] == 1:
+            arr = arr[0]
+        elif arr.shape[-1] == 1:
+            arr = arr[..., 0]
+        else:
+            arr = np.max(arr, axis=0)
+    if not stretch:
+        return arr
+    return (arr - arr.min()) / max(float(arr.max() - arr.min()), 1e-6)
+
+
+def probability_mask(arr: np.ndarray, size: tuple[int, int]) -> Image.Image:
+    """Quantize a normalized prediction to 8-bit alpha and resize it to the source size."""
+    return Image.fromarray((arr * 255).astype(np.uint8), "L").resize(size, Image.Resampling.LANCZOS)
+
+
+class ProbabilityRows:
+    """Rows of probability_mask, computed strip by strip without the full-size mask.
+
+    The horizontal LANCZOS pass runs once at model height and LanczosRows
+    finishes only the rows asked for, so every strip equals the same rows of
+    probability_mask while holding no more than one model-height band.
+    """
+
+    def __init__(self, arr: np.ndarray, size: tuple[int, int]) -> None:
+        small = Image.fromarray((arr * 255).astype(np.uint8), "L")
+        width, height = size
+        if width != small.width:
+            small = small.resize((width, small.height), Image.Resampling.LANCZOS, box=(0, 0, small.width, small.height))
+        self.wide = np.asarray(small)
+        self.vertical = LanczosRows(small.height, height) if height != small.height else None
+
+    def rows(self, top: int, bottom: int) -> Image.Image:
+        if self.vertical is None:
+            return Image.fromarray(self.wide[top:bottom], "L")
+        return Image.fromarray(self.vertical.rows(self.wide, top, bottom), "L")
+
+
+def probability_map(arr: np.ndarray, size: tuple[int, int], resample: int | None = None) -> np.ndarray:
+    """Resize a probability map to ``size`` in float32 and clip it to 0-1, with no 8-bit step on the way."""
+    resample = Image.Resampling.LANCZOS if resample is None else resample
+    resized = Image.fromarray(np.asarray(arr, dtype=np.float32), "F").resize(size, resample)
+    return np.clip(np.asarray(resized), 0.0, 1.0)
+
+
+def save_probability_map(path: Path, arr: np.ndarray) -> None:
+    """Write a 0-1 map as float32 .npy, or as a 16-bit grayscale PNG for any other suffix."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if path.suffix.lower() == ".npy":
+        np.save(path, np.asarray(arr, dtype=np.float32), allow_pickle=False)
+    else:
+        Image.fromarray(np.rint(np.asarray(arr) * PROBABILITY_PNG_MAX).astype(np.uint16), "I;16").save(path)
+
+
+def is_probability_map(path: Path) -> bool:
+    """True for a .npy map or a 16-bit PNG, false for an ordinary 8-bit mask."""
+    if path.suffix.lower() == ".npy":
+        return True
+    with Image.open(path) as image:
+        return image.mode.startswith("I")
+
+
+def load_probability_map(path: Path, size: tuple[int, int] | None = None, resample: int | None = None) -> np.ndarray:
+    """Read a map written by save_probability_map as float32 in 0-1, resized to ``size`` if it differs."""
+    if path.suffix.lower() == ".npy":
+        arr = np.load(path, allow_pickle=False).astype(np.float32, copy=False)
+    else:
+        with Image.open(path) as image:
+            arr = np.asarray(image).astype(np.float32) / PROBABILITY_PNG_MAX
+    if arr.ndim != 2:
+        raise ValueError(f"{path} holds a {arr.ndim}-D array, not a 2-D probability map")
+    if size is not None and (arr.shape[1], arr.shape[0]) != tuple(size):
+        return probability_map(arr, size, resample)
+    return arr
+
+
+class BiRefNetSession:
+    """A BiRefNet model loaded once and kept on its device for repeated predictions.
+
+    torch, torchvision and transformers are imported here rather than at
+    module level so worker clients never pay for them. With ``model_store``
+    the weights come from a directory written by
+    seed_unit_birefnet_model_store.py: its manifest is checked first, then
+    transformers loads the safetensors file, which is memory-mapped rather
+    than unpickled, without any hub request.
+    """
+
+    def __init__(
+        self,
+        model: str = DEFAULT_MODEL,
+        device: str = "auto",
+        revision: str = DEFAULT_REVISION,
+        model_store: Path | None = None,
+    ) -> None:
+        from torchvision import transforms
+        from transformers import AutoModelForImageSegmentation
+
+        self.model_name = model
+        self.revision = revision
+        self.backend = "torch"
+        self.precision = "fp32"
+        self.model_store = model_store
+        self.device = resolve_device(device)
+        if model_store is None:
+            self.model = AutoModelForImageSegmentation.from_pretrained(model, trust_remote_code=True, revision=revision)
+        else:
+            manifest = verify_model_store(model_store)
+            if (manifest["model"], manifest["revision"]) != (model, revision):
+                raise ValueError(f"{model_store} holds {manifest['model']}@{manifest['revision']}, not {model}@{revision}")
+            self.model = AutoModelForImageSegmentation.from_pretrained(
+                str(model_store),
+                trust_remote_code=True,
+                local_files_only=True,
+                use_safetensors=True,
+            )
+        self.model.to(self.device)
+        self.model.eval()
+        self.transform = transforms.Compose(
+            [
+                transforms.ToTensor(),
+                transforms.Normalize([0.485, 0.456, 0.406], [0.229, 0.224, 0.225]),
+            ]
+        )
+
+    def predict(self, model_image: Image.Image) -> np.ndarray:
+        """Return the normalized foreground probability at the model input resolution."""
+        return self.predict_batch([model_image])[0]
+
+    def predict_batch(self, model_images: list[Image.Image], stretch: bool = True) -> list[np.ndarray]:
+        """Run one forward pass over same-sized images; each prediction is normalized on its own.
+
+        ``stretch=False`` keeps the raw sigmoid, for crops whose own value
+        range says nothing about the frame's.
+        """
+        import torch
+
+        tensor = torch.stack([self.transform(image.convert("RGB")) for image in model_images]).to(self.device)
+        with torch.no_grad():
+            pred = extract_prediction(self.model(tensor)).sigmoid().detach().cpu()
+        return [normalize_prediction(pred[index].squeeze().numpy(), stretch) for index in range(len(model_images))]
+
+
+def default_store_dir() -> Path:
+    return Path.home() / ".cache" / "unit_art"
+
+
+def default_model_store(model: str, revision: str) -> Path:
+    return default_store_dir() / "models" / f"{model.replace('/', '--')}@{revision}"
+
+
+def configured_model_store(model_store: Path | None, backend: str) -> Path | None:
+    """An explicit --model-store, else $UNIT_ART_MODEL_STORE for torch loads only.
+
+    The variable is a machine-wide default, so it must not stop an
+    onnxruntime run; only an explicit --model-store conflicts with one.
+    """
+    if model_store is not None or backend != "torch":
+        return model_store
+    configured = os.environ.get(MODEL_STORE_ENV)
+    return Path(configured) if configured else None
+
+
+def hub_cache_dir() -> Path:
+    configured = os.environ.get("HF_HUB_CACHE")
+    if configured:
+        return Path(configured)
+    return Path(os.environ.get("HF_HOME", Path.home() / ".cache" / "huggingface")) / "hub"
+
+
+@lru_cache(maxsize=8)
+def hub_commit(spec: ModelSpec) -> str | None:
+    """The hub commit a torch load of ``spec`` resolves to, when it is known offline.
+
+    A model store records the commit it was seeded from; a commit hash given
+    as the revision is its own answer; otherwise the Hugging Face cache's
+    ``refs/<revision>`` file names the snapshot the last download resolved to.
+    Returns None when none of those is available.
+    """
+    if spec.model_store is not None:
+        try:
+            return str(read_model_store(spec.model_store).get("commit") or "") or None
+        except (OSError, ValueError):
+            return None
+    if len(spec.revision) == 40 and all(char in "0123456789abcdef" for char in spec.revision):
+        return spec.revision
+    ref = hub_cache_dir() / f"models--{spec.model.replace('/', '--')}" / "refs" / spec.revision
+    try:
+        return ref.read_text(encoding="utf-8").strip() or None
+    except OSError:
+        return None
+
+
+def read_model_store(directory: Path) -> dict[str, object]:
+    path = directory / MODEL_STORE_MANIFEST
+    if not path.is_file():
+        raise FileNotFoundError(f"no model store manifest at {path}; run seed_unit_birefnet_model_store.py first")
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def model_store_identity(directory: Path, model: str, revision: str) -> tuple[str, str]:
+    """The model id and revision a store was seeded from.
+
+    ``model`` and ``revision`` are the command-line values: left at their
+    defaults they take the store's values, otherwise they must match it.
+    """
+    manifest = read_model_store(directory)
+    stored = (str(manifest["model"]), str(manifest["revision"]))
+    for given, default, value in zip((model, revision), (DEFAULT_MODEL, DEFAULT_REVISION), stored):
+        if given not in (default, value):
+            raise ValueError(f"{directory} holds {stored[0]}@{stored[1]}, not {model}@{revision}")
+    return stored
+
+
+def verify_model_store(directory: Path, full: bool = False) -> dict[str, object]:
+    """Check every file a store's manifest lists against its recorded size and sha256, and return the manifest.
+
+    A file whose size and mtime still match the stamp of its last full check
+    is not rehashed unless ``full`` is set, so a warm load costs a few stat
+    calls instead of reading the weights twice. Raises ValueError when a
+    file is missing or differs; reseed the store then.
+    """
+    manifest = read_model_store(directory)
+    files = manifest["files"]
+    if not any(name.endswith(".safetensors") for name in files):
+        raise ValueError(f"{directory / MODEL_STORE_MANIFEST} lists no safetensors weights")
+    manifest_sha256 = file_sha256(directory / MODEL_STORE_MANIFEST)
+    stamp_path = directory / MODEL_STORE_STAMP
+    stamps: dict[str, list[int]] = {}
+    if not full and stamp_path.is_file():
+        try:
+            stamp = json.loads(stamp_path.read_text(encoding="utf-8"))
+        except ValueError:
+            stamp = {}
+        if stamp.get("manifest_sha256") == manifest_sha256:
+            stamps = stamp.get("files", {})
+    current = {}
+    rehashed = False
+    for name, entry in sorted(files.items()):
+        path = directory / name
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            raise ValueError(f"{path} is listed in {MODEL_STORE_MANIFEST} but missing") from None
+        if stat.st_size != entry["bytes"]:
+            raise ValueError(f"{path} is {stat.st_size} bytes, the manifest records {entry['bytes']}")
+        current[name] = [stat.st_size, stat.st_mtime_ns]
+        if stamps.get(name) != current[name]:
+            if file_sha256(path) != entry["sha256"]:
+                raise ValueError(f"{path} does not match the sha256 in {MODEL_STORE_MANIFEST}")
+            rehashed = True
+    if rehashed:
+        record = {"schema_version": 1, "manifest_sha256": manifest_sha256, "files": current}
+        try:
+            stamp_path.write_text(json.dumps(record, indent=2) + "\n", encoding="utf-8")
+        except OSError:
+            # A read-only store is still verified, just in full on every load.
+            pass
+    return manifest
+
+
+def default_onnx_path(model: str, revision: str, precision: str = "fp32") -> Path:
+    suffix = "" if precision == "fp32" else f".{precision}"
+    return default_store_dir() / "onnx" / f"{model.replace('/', '--')}@{revision}{suffix}.onnx"
+
+
+def onnx_metadata_path(path: Path) -> Path:
+    return path.with_suffix(".json")
+
+
+def image_batch_array(model_images: list[Image.Image]) -> np.ndarray:
+    """Stack images as the normalized NCHW float32 batch torchvision's ToTensor + Normalize would build."""
+    rgb = np.stack([np.asarray(image.convert("RGB")) for image in model_images]).astype(np.float32) / np.float32(255)
+    return np.ascontiguousarray(((rgb - np.array(IMAGENET_MEAN, dtype=np.float32)) / np.array(IMAGENET_STD, dtype=np.float32)).transpose(0, 3, 1, 2))
+
+
+class OnnxSession:
+    """An exported BiRefNet graph run by onnxruntime on the CPU.
+
+    The graph comes from export_unit_birefnet_onnx.py and already ends in the
+    sigmoid, so predictions go through the same normalization as the torch
+    session. Inter-op parallelism is off because the graph is one chain;
+    ``threads`` sets intra-op threads, and 0 keeps onnxruntime's default of
+    one per physical core. A quantized graph is refused unless its metadata
+    records a passing quality gate from quantize_unit_birefnet_onnx.py.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        model: str = DEFAULT_MODEL,
+        revision: str = DEFAULT_REVISION,
+        threads: int = 0,
+        precision: str = "fp32",
+        require_gate: bool = True,
+    ) -> None:
+        import onnxruntime
+
+        if not path.is_file() or not onnx_metadata_path(path).is_file():
+            raise FileNotFoundError(f"no exported graph at {path}; run export_unit_birefnet_onnx.py first")
+        metadata = json.loads(onnx_metadata_path(path).read_text(encoding="utf-8"))
+        if (metadata["model"], metadata["revision"]) != (model, revision):
+            raise ValueError(f"{path} was exported from {metadata['model']}@{metadata['revision']}, not {model}@{revision}")
+        if metadata.get("precision", "fp32") != precision:
+            raise ValueError(f"{path} holds a {metadata.get('precision', 'fp32')} graph, not {precision}")
+        if require_gate and precision != "fp32" and metadata.get("gate", {}).get("status") != "pass":
+            raise ValueError(f"{path} has not passed the {precision} quality gate; rerun quantize_unit_birefnet_onnx.py")
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.execution_mode = onnxruntime.ExecutionMode.ORT_SEQUENTIAL
+        options.inter_op_num_threads = 1
+        if threads > 0:
+            options.intra_op_num_threads = threads
+        self.session = onnxruntime.InferenceSession(str(path), options, providers=["CPUExecutionProvider"])
+        self.model_name = model
+        self.revision = revision
+        self.backend = "onnxruntime"
+        self.precision = precision
+        self.device = "cpu"
+        self.input_size = int(metadata["input_size"])
+
+    def predict(self, model_image: Image.Image) -> np.ndarray:
+        return self.predict_batch([model_image])[0]
+
+    def predict_batch(self, model_images: list[Image.Image], stretch: bool = True) -> list[np.ndarray]:
+        batch = image_batch_array(model_images)
+        if batch.shape[2:] != (self.input_size, self.input_size):
+            raise ValueError(f"the ONNX graph was exported for --input-size {self.input_size}, got {batch.shape[3]}x{batch.shape[2]}")
+        pred = self.session.run(["prediction"], {"image": batch})[0]
+        return [normalize_prediction(pred[index].squeeze(), stretch) for index in range(len(model_images))]
+
+
+class MaskPredictor:
+    """Worker-first BiRefNet predictions for one or many runs of the same model.
+
+    The first time no worker can serve a request, the predictor switches to
+    an in-process session for the rest of its life, loading it only once.
+    ``load_seconds`` records how long that load took, and ``device`` the
+    device the last prediction ran on.
+    """
+
+    def __init__(self, spec: ModelSpec, worker_url: str | None = DEFAULT_WORKER_URL) -> None:
+        self.spec = spec
+        self.worker_url = worker_url
+        self.session: BiRefNetSession | OnnxSession | None = None
+        self.load_seconds: float | None = None
+        self.device: str | None = None
+
+    def resolved_device(self) -> str:
+        """The torch or onnxruntime device predictions run on, without running one.
+
+        Cached predictions report this. It is the device of the last
+        prediction if there was one; otherwise onnxruntime is always the CPU,
+        a matching worker reports its own device, and ``auto`` is resolved
+        the way an in-process torch load would.
+        """
+        if self.device is not None:
+            return self.device
+        if self.spec.backend == "onnxruntime":
+            return "cpu"
+        if self.spec.device != "auto":
+            return self.spec.device
+        if self.worker_url:
+            try:
+                health = worker_health(self.worker_url)
+            except WorkerUnavailable:
+                health = {}
+            served = (health.get("model"), health.get("revision"), health.get("backend"), health.get("precision"))
+            if served == (self.spec.model, self.spec.revision, self.spec.backend, self.spec.precision) and health.get("device"):
+                return str(health["device"])
+        try:
+            return resolve_device("auto")
+        except ImportError:
+            # No torch here, so nothing in-process could use a GPU.
+            return "cpu"
+
+    def predict_batch(self, model_images: list[Image.Image], stretch: bool = True) -> tuple[list[np.ndarray], str, str]:
+        """Return the predictions, the device they ran on and where inference happened."""
+        if self.worker_url:
+            try:
+                arrays, device = worker_predict(self.worker_url, self.spec, model_images, stretch=stretch)
+                self.device = device
+                return arrays, device, "worker"
+            except WorkerUnavailable as exc:
+                print(f"worker_fallback={exc}")
+                self.worker_url = None
+        if self.session is None:
+            started = time.perf_counter()
+            self.session = self.spec.load()
+            self.load_seconds = time.perf_counter() - started
+        self.device = self.session.device
+        return self.session.predict_batch(model_images, stretch), self.session.device, "in-process"
+
+
+def encode_array(arr: np.ndarray) -> bytes:
+    buffer = io.BytesIO()
+    np.save(buffer, arr, allow_pickle=False)
+    return buffer.getvalue()
+
+
+def decode_array(payload: bytes) -> np.ndarray:
+    return np.load(io.BytesIO(payload), allow_pickle=False)
+
+
+def worker_health(url: str, timeout: float = 2.0) -> dict[str, object]:
+    """Return the worker's /health record, or raise WorkerUnavailable."""
+    try:
+        with urllib.request.urlopen(f"{url.rstrip('/')}/health", timeout=timeout) as response:
+            return json.loads(response.read().decode("utf-8"))
+    except (urllib.error.URLError, OSError, ValueError) as exc:
+        raise WorkerUnavailable(f"no worker at {url}: {exc}") from exc
+
+
+def worker_predict(
+    url: str,
+    spec: ModelSpec,
+    model_images: list[Image.Image],
+    timeout: float = WORKER_TIMEOUT_SECONDS,
+    stretch: bool = True,
+) -> tuple[list[np.ndarray], str]:
+    """Ask a running worker for the arrays BiRefNetSession.predict_batch returns.
+
+    The request body is the already-resized, same-sized RGB images as raw
+    bytes, so the worker skips decoding and both paths feed the model
+    identical pixels. Returns the predictions and the worker's device.
+    Raises WorkerUnavailable when nothing is listening or the worker serves a
+    different model, revision or backend; any other worker failure is raised
+    as RuntimeError.
+    """
+    rgbs = [image.convert("RGB") for image in model_images]
+    width, height = rgbs[0].size
+    if any(rgb.size != (width, height) for rgb in rgbs):
+        raise ValueError("worker batches need images of one size")
+    query = urllib.parse.urlencode(
+        {
+            "model": spec.model,
+            "revision": spec.revision,
+            "backend": spec.backend,
+            "precision": spec.precision,
+            "width": width,
+            "height": height,
+            "count": len(rgbs),
+            "stretch": int(stretch),
+        }
+    )
+    request = urllib.request.Request(
+        f"{url.rstrip('/')}/predict?{query}",
+        data=b"".join(rgb.tobytes() for rgb in rgbs),
+        headers={"Content-Type": "application/octet-stream"},
+        method="POST",
+    )
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            return list(decode_array(response.read())), response.headers.get("X-Device", "worker")
+    except urllib.error.HTTPError as exc:
+        detail = exc.read().decode("utf-8", errors="replace")
+        if exc.code == 409:
+            raise WorkerUnavailable(detail) from exc
+        raise RuntimeError(f"worker at {url} failed with HTTP {exc.code}: {detail}") from exc
+    except (urllib.error.URLError, ConnectionError) as exc:
+        raise WorkerUnavailable(f"no worker at {url}: {exc}") from exc
+
+
+def default_cache_dir() -> Path:
+    configured = os.environ.get(CACHE_DIR_ENV)
+    return Path(configured) if configured else default_store_dir() / "birefnet_predictions"
+
+
+class PredictionCache:
+    """Normalized BiRefNet predictions on disk, keyed by what determines them.
+
+    The key covers the source file bytes, model id, model revision, backend,
+    precision and input size, plus the hub commit a torch load resolves to
+    when that is known, the ONNX graph's path, size and mtime on
+    onnxruntime and the coarse-to-fine settings when that mode made the
+    prediction, so only post-processing flags can change between a cached
+    run and a fresh one. Entries are .npy files; a hit refreshes the file's mtime and
+    eviction removes the oldest mtimes first once the directory exceeds
+    ``max_bytes``.
+    """
+
+    def __init__(self, directory: Path, max_bytes: int) -> None:
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.write_failed = False
+
+    @staticmethod
+    def key(source_sha256: str, spec: ModelSpec, input_size: int, refine: dict[str, int] | None = None) -> str:
+        fields: dict[str, object] = {
+            "version": PREDICTION_CACHE_VERSION,
+            "source_sha256": source_sha256,
+            "model": spec.model,
+            "revision": spec.revision,
+            "backend": spec.backend,
+            "precision": spec.precision,
+            "input_size": input_size,
+        }
+        commit = hub_commit(spec) if spec.backend == "torch" else None
+        if commit:
+            # A branch revision such as "main" moves when upstream pushes new
+            # weights; the commit it resolved to does not.
+            fields["commit"] = commit
+        if spec.backend == "onnxruntime":
+            # A re-export or re-quantization to the same path changes the
+            # graph without changing the model or revision; size and mtime
+            # catch that without hashing the weights on every run.
+            path = spec.onnx_path().resolve()
+            fields["onnx_model"] = [str(path), file_stamp(path)]
+        if refine:
+            # Only coarse-to-fine entries carry this, so full-pass keys are unchanged.
+            fields["refine"] = refine
+        return hashlib.sha256(json.dumps(fields, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def path(self, key: str) -> Path:
+        return self.directory / f"{key}.npy"
+
+    def get(self, key: str) -> np.ndarray | None:
+        path = self.path(key)
+        try:
+            arr = np.load(path, allow_pickle=False)
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError):
+            # A truncated or foreign file is a miss; drop it so it is rewritten.
+            with contextlib.suppress(OSError):
+                path.unlink(missing_ok=True)
+            return None
+        return arr
+
+    def put(self, key: str, arr: np.ndarray) -> None:
+        path = self.path(key)
+        temporary = path.with_name(f"{path.stem}.{os.getpid()}.tmp")
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            with temporary.open("wb") as handle:
+                np.save(handle, np.asarray(arr, dtype=np.float32), allow_pickle=False)
+            os.replace(temporary, path)
+            self.evict()
+        except OSError as exc:
+            # The prediction is already in hand; a read-only or full cache
+            # only costs the next run a recompute.
+            with contextlib.suppress(OSError):
+                temporary.unlink(missing_ok=True)
+            if not self.write_failed:
+                print(f"cache_write_failed={exc}")
+            self.write_failed = True
+
+    def evict(self) -> None:
+        entries = []
+        for path in self.directory.glob("*.npy"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _mtime, size, _path in entries)
+        for _mtime, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
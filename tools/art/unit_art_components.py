@@ -0,0 +1,265 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+from unit_art_lazy import lazy_import
+
+np = lazy_import("numpy")
+
+
+@dataclass(frozen=True)
+class MaskComponents:
+    """Connected components of a boolean mask, indexed by label.
+
+    Label 0 is the background. Labels follow raster order of each
+    component's first pixel, matching scipy.ndimage.label. ``boxes`` rows are
+    inclusive ``(min_x, min_y, max_x, max_y)``.
+    """
+
+    labels: np.ndarray
+    areas: np.ndarray
+    boxes: np.ndarray
+
+    @property
+    def count(self) -> int:
+        return len(self.areas) - 1
+
+    def largest_label(self) -> int:
+        if self.count == 0:
+            return 0
+        return int(np.argmax(self.areas[1:])) + 1
+
+
+def scipy_ndimage():
+    """Return scipy.ndimage when it is installed, otherwise None."""
+    try:
+        from scipy import ndimage
+    except ImportError:
+        return None
+    return ndimage
+
+
+def border_seed(mask: np.ndarray) -> np.ndarray:
+    seed = np.zeros(mask.shape, dtype=bool)
+    seed[0, :] = mask[0, :]
+    seed[-1, :] = mask[-1, :]
+    seed[:, 0] = mask[:, 0]
+    seed[:, -1] = mask[:, -1]
+    return seed
+
+
+def border_connected_fallback(mask: np.ndarray, connectivity: int = 4) -> np.ndarray:
+    # Label the mask with the row-run union-find and keep every component
+    # with a pixel on the border. Cost follows the number of runs, so long
+    # winding background paths cost no more than straight ones.
+    labels = label_components_fallback(mask, connectivity)
+    touches = np.zeros(int(labels.max()) + 1, dtype=bool)
+    touches[labels[border_seed(mask)]] = True
+    touches[0] = False
+    return touches[labels]
+
+
+def border_connected(mask: np.ndarray, connectivity: int = 4) -> np.ndarray:
+    """Return mask pixels 4- or 8-connected to an image border."""
+    if connectivity not in (4, 8):
+        raise ValueError(f"connectivity must be 4 or 8, got {connectivity}")
+    mask = np.asarray(mask, dtype=bool)
+    if mask.size == 0:
+        return mask.copy()
+    ndimage = scipy_ndimage()
+    if ndimage is None:
+        return border_connected_fallback(mask, connectivity)
+    structure = ndimage.generate_binary_structure(2, 1 if connectivity == 4 else 2)
+    return ndimage.binary_propagation(border_seed(mask), structure=structure, mask=mask)
+
+
+def dilate_square(mask: np.ndarray, radius: int) -> np.ndarray:
+    # Separable box dilation from running sums; matches ImageFilter.MaxFilter
+    # on a binary mask but costs the same for any radius.
+    out = mask
+    for axis in (0, 1):
+        length = out.shape[axis]
+        sums = np.cumsum(out, axis=axis, dtype=np.int32)
+        sums = np.concatenate((np.zeros_like(sums.take([0], axis=axis)), sums), axis=axis)
+        index = np.arange(length)
+        upper = np.minimum(index + radius + 1, length)
+        lower = np.maximum(index - radius, 0)
+        out = (sums.take(upper, axis=axis) - sums.take(lower, axis=axis)) > 0
+    return out
+
+
+def row_run_ids(mask: np.ndarray) -> np.ndarray:
+    """Number every horizontal run of mask pixels in raster order, starting at 1."""
+    starts = mask.copy()
+    starts[:, 1:] &= ~mask[:, :-1]
+    return np.where(mask, np.cumsum(starts.ravel()).reshape(mask.shape), 0)
+
+
+def run_adjacency(mask: np.ndarray, run_ids: np.ndarray, connectivity: int) -> tuple[np.ndarray, np.ndarray]:
+    pairs = [(mask[:-1, :] & mask[1:, :], run_ids[:-1, :], run_ids[1:, :])]
+    if connectivity == 8:
+        pairs.append((mask[:-1, :-1] & mask[1:, 1:], run_ids[:-1, :-1], run_ids[1:, 1:]))
+        pairs.append((mask[:-1, 1:] & mask[1:, :-1], run_ids[:-1, 1:], run_ids[1:, :-1]))
+    upper = np.concatenate([ids[touching] for touching, ids, _lower in pairs])
+    lower = np.concatenate([ids[touching] for touching, _upper, ids in pairs])
+    keys = np.unique(upper.astype(np.int64) << 32 | lower.astype(np.int64))
+    return keys >> 32, keys & 0xFFFFFFFF
+
+
+def merged_roots(count: int, upper: np.ndarray, lower: np.ndarray) -> np.ndarray:
+    """Map ids ``0..count`` to the smallest id they are linked to through ``upper``/``lower`` pairs."""
+    root = np.arange(count + 1)
+    while upper.size:
+        merged = np.minimum(root[upper], root[lower])
+        previous = root.copy()
+        np.minimum.at(root, upper, merged)
+        np.minimum.at(root, lower, merged)
+        while True:
+            jumped = root[root]
+            if np.array_equal(jumped, root):
+                break
+            root = jumped
+        if np.array_equal(root, previous):
+            break
+    return root
+
+
+def label_components_fallback(mask: np.ndarray, connectivity: int) -> np.ndarray:
+    # Union-find over row runs instead of pixels: runs touching across
+    # adjacent rows are merged by repeated min-root propagation with pointer
+    # jumping. Each component settles on its first run in raster order, which
+    # keeps label numbering identical to scipy.ndimage.label.
+    run_ids = row_run_ids(mask)
+    run_count = int(run_ids.max()) if run_ids.size else 0
+    root = merged_roots(run_count, *run_adjacency(mask, run_ids, connectivity))
+    _roots, run_labels = np.unique(root[1:], return_inverse=True)
+    lookup = np.concatenate(([0], run_labels.ravel() + 1)).astype(np.int32)
+    return lookup[run_ids]
+
+
+def label_components(mask: np.ndarray, connectivity: int = 4) -> MaskComponents:
+    """Label a boolean mask once and collect per-component areas and boxes."""
+    if connectivity not in (4, 8):
+        raise ValueError(f"connectivity must be 4 or 8, got {connectivity}")
+    mask = np.asarray(mask, dtype=bool)
+    ndimage = scipy_ndimage()
+    if mask.size == 0:
+        labels = np.zeros(mask.shape, dtype=np.int32)
+    elif ndimage is None:
+        labels = label_components_fallback(mask, connectivity)
+    else:
+        structure = ndimage.generate_binary_structure(2, 1 if connectivity == 4 else 2)
+        labels = np.zeros(mask.shape, dtype=np.int32)
+        ndimage.label(mask, structure=structure, output=labels)
+    count = int(labels.max()) if labels.size else 0
+    # bincount widens its input to intp, so count in row blocks rather than
+    # copying a large label image at once.
+    areas = np.zeros(count + 1, dtype=np.int64)
+    block = max(1, (1 << 20) // max(1, labels.shape[1]))
+    for top in range(0, len(labels), block):
+        areas += np.bincount(labels[top:top + block].ravel(), minlength=count + 1)
+    areas[0] = 0
+    boxes = np.zeros((count + 1, 4), dtype=np.int64)
+    if count and ndimage is not None:
+        # find_objects walks the labels once without per-pixel index arrays.
+        for label, (rows, cols) in enumerate(ndimage.find_objects(labels), start=1):
+            boxes[label] = (cols.start, rows.start, cols.stop - 1, rows.stop - 1)
+    elif count:
+        ys, xs = np.nonzero(labels)
+        ids = labels[ys, xs]
+        boxes[:, 0] = mask.shape[1]
+        boxes[:, 1] = mask.shape[0]
+        np.minimum.at(boxes[:, 0], ids, xs)
+        np.minimum.at(boxes[:, 1], ids, ys)
+        np.maximum.at(boxes[:, 2], ids, xs)
+        np.maximum.at(boxes[:, 3], ids, ys)
+        boxes[0] = 0
+    return MaskComponents(labels=labels, areas=areas, boxes=boxes)
+
+
+class StripComponents:
+    """Whole-image connected components of a mask that is labelled one row strip at a time.
+
+    Strips are added top to bottom. Each is labelled on its own and labels
+    that touch across a seam are merged, so only seam rows and per-label
+    totals are kept, never a full-size label image. A component is named by
+    its smallest strip label; as labels follow raster order within a strip
+    and strips follow each other, that order is the raster order of each
+    component's first pixel, as in label_components. ``labels`` relabels the
+    same strip rows on a second pass.
+    """
+
+    def __init__(self, height: int, connectivity: int = 4) -> None:
+        self.height = height
+        self.connectivity = connectivity
+        self.offsets: dict[int, int] = {}
+        self.count = 0
+        self.strip_areas: list[np.ndarray] = []
+        self.strip_border: list[np.ndarray] = []
+        self.upper: list[np.ndarray] = []
+        self.lower: list[np.ndarray] = []
+        self.last_row: np.ndarray | None = None
+        self.root = np.zeros(1, dtype=np.int64)
+        self.areas = np.zeros(1, dtype=np.int64)
+        self.border = np.zeros(1, dtype=bool)
+
+    def add(self, top: int, mask: np.ndarray) -> None:
+        components = label_components(mask, self.connectivity)
+        labels = components.labels
+        offset = self.count
+        self.offsets[top] = offset
+        first = np.where(labels[0] > 0, labels[0] + offset, 0)
+        last = np.where(labels[-1] > 0, labels[-1] + offset, 0)
+        border = np.zeros(components.count + 1, dtype=bool)
+        border[labels[:, 0]] = True
+        border[labels[:, -1]] = True
+        if top == 0:
+            border[labels[0]] = True
+        if top + len(labels) == self.height:
+            border[labels[-1]] = True
+        if self.last_row is not None:
+            seams = [(self.last_row, first)]
+            if self.connectivity == 8:
+                seams += [(self.last_row[:-1], first[1:]), (self.last_row[1:], first[:-1])]
+            for above, below in seams:
+                touching = (above > 0) & (below > 0)
+                self.upper.append(above[touching])
+                self.lower.append(below[touching])
+        self.strip_areas.append(components.areas[1:])
+        self.strip_border.append(border[1:])
+        self.count += components.count
+        self.last_row = last
+
+    def resolve(self) -> None:
+        """Merge the seams once every strip is in; fills ``root``, ``areas`` and ``border``."""
+        upper = np.concatenate(self.upper) if self.upper else np.zeros(0, dtype=np.int64)
+        lower = np.concatenate(self.lower) if self.lower else np.zeros(0, dtype=np.int64)
+        self.root = merged_roots(self.count, upper.astype(np.int64), lower.astype(np.int64))
+        roots = self.root[1:]
+        self.areas = np.zeros(self.count + 1, dtype=np.int64)
+        if self.count:
+            np.add.at(self.areas, roots, np.concatenate(self.strip_areas))
+        self.border = np.zeros(self.count + 1, dtype=bool)
+        if self.count:
+            self.border[roots[np.concatenate(self.strip_border)]] = True
+        self.strip_areas = []
+        self.strip_border = []
+        self.upper = []
+        self.lower = []
+
+    @property
+    def component_count(self) -> int:
+        return int(np.count_nonzero(self.areas))
+
+    def largest_label(self) -> int:
+        if self.count == 0 or not self.areas.any():
+            return 0
+        return int(np.argmax(self.areas[1:])) + 1
+
+    def labels(self, top: int, mask: np.ndarray) -> np.ndarray:
+        """Whole-image component labels of the strip added at ``top``, from the same mask rows."""
+        offset = self.offsets[top]
+        local = label_components(mask, self.connectivity).labels
+        lookup = self.root[offset:offset + int(local.max(initial=0)) + 1].copy()
+        lookup[0] = 0
+        return lookup[local]
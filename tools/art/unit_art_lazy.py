@@ -0,0 +1,52 @@
+from __future__ import annotations
+
+import importlib
+import importlib.util
+import os
+import sys
+from types import ModuleType
+
+
+# Set to 1 to import everything up front, e.g. to compare startup times.
+EAGER_IMPORTS_ENV = "UNIT_ART_EAGER_IMPORTS"
+_deferred: list[ModuleType] = []
+
+
+def lazy_import(name: str) -> ModuleType:
+    """Return module ``name`` without running it until an attribute is first read.
+
+    The art tools bind numpy and Pillow this way at module level, so
+    ``--help``, argument errors and code paths that never touch pixels skip
+    their import cost. A module that is already imported is returned as is,
+    and ``UNIT_ART_EAGER_IMPORTS=1`` imports immediately.
+    Module-level code must not read attributes of the result, or the import
+    happens right there.
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+    if os.environ.get(EAGER_IMPORTS_ENV) == "1":
+        return importlib.import_module(name)
+    spec = importlib.util.find_spec(name)
+    if spec is None or spec.loader is None:
+        raise ModuleNotFoundError(f"No module named {name!r}", name=name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    _deferred.append(module)
+    parent, _, child = name.rpartition(".")
+    if parent:
+        setattr(sys.modules[parent], child, module)
+    return module
+
+
+def load_deferred() -> None:
+    """Finish every pending lazy import on the calling thread.
+
+    Call this before starting worker threads. LazyLoader is not thread-safe
+    before Python 3.12, and a second thread can see a module half-executed.
+    """
+    for module in _deferred:
+        getattr(module, "__name__")
+    _deferred.clear()
@@ -0,0 +1,221 @@
+from __future__ import annotations
+
+import sys
+import time
+import tracemalloc
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass
+
+from unit_art_lazy import lazy_import
+
+np = lazy_import("numpy")
+
+
+PROFILE_PERCENTILES = (50, 90, 99)
+
+# tracemalloc keeps one peak per process. Stage profiles reset it to see each
+# stage's own high-water mark, so the peak they discard is carried here for
+# RunMeter to fold back in.
+carried_traced_peak = 0
+
+
+@dataclass(frozen=True)
+class RunStats:
+    wall_seconds: float
+    traced_peak_mb: float | None
+    peak_rss_mb: float | None
+
+    def as_record(self) -> dict[str, float | None]:
+        return {
+            "wall_seconds": round(self.wall_seconds, 4),
+            "traced_peak_mb": None if self.traced_peak_mb is None else round(self.traced_peak_mb, 2),
+            "peak_rss_mb": None if self.peak_rss_mb is None else round(self.peak_rss_mb, 2),
+        }
+
+    def lines(self) -> list[str]:
+        return [f"{key}={value}" for key, value in self.as_record().items()]
+
+
+def reset_traced_peak() -> None:
+    """Reset the tracemalloc peak, remembering the discarded one for RunMeter."""
+    global carried_traced_peak
+    carried_traced_peak = max(carried_traced_peak, tracemalloc.get_traced_memory()[1])
+    tracemalloc.reset_peak()
+
+
+def windows_peak_working_set_mb() -> float | None:
+    try:
+        import ctypes
+        from ctypes import wintypes
+
+        class ProcessMemoryCounters(ctypes.Structure):
+            _fields_ = [
+                ("cb", wintypes.DWORD),
+                ("PageFaultCount", wintypes.DWORD),
+                ("PeakWorkingSetSize", ctypes.c_size_t),
+                ("WorkingSetSize", ctypes.c_size_t),
+                ("QuotaPeakPagedPoolUsage", ctypes.c_size_t),
+                ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t),
+                ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                ("PagefileUsage", ctypes.c_size_t),
+                ("PeakPagefileUsage", ctypes.c_size_t),
+            ]
+
+        counters = ProcessMemoryCounters()
+        counters.cb = ctypes.sizeof(counters)
+        handle = ctypes.windll.kernel32.GetCurrentProcess()
+        if not ctypes.windll.psapi.GetProcessMemoryInfo(handle, ctypes.byref(counters), counters.cb):
+            return None
+    except (AttributeError, OSError):
+        return None
+    return counters.PeakWorkingSetSize / (1024 * 1024)
+
+
+def peak_rss_mb() -> float | None:
+    """Peak resident set size of this process so far, or None when the platform cannot say."""
+    try:
+        import resource
+    except ImportError:
+        return windows_peak_working_set_mb()
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is bytes on macOS and kilobytes elsewhere.
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+class RunMeter:
+    """Measure wall-clock time and peak memory of one run.
+
+    With ``trace`` set, ``traced_peak_mb`` is the tracemalloc peak inside the
+    block, which covers NumPy buffers but not Pillow's own image memory.
+    Tracing slows every allocation, so callers only ask for it when the run
+    is being profiled; otherwise the traced peak is None. ``peak_rss_mb`` is
+    the process-wide high-water mark and covers both.
+    """
+
+    def __init__(self, trace: bool = False) -> None:
+        self.trace = trace
+        self.stats: RunStats | None = None
+        self.started = 0.0
+        self.owns_tracing = False
+
+    def __enter__(self) -> RunMeter:
+        global carried_traced_peak
+        if not self.trace:
+            self.started = time.perf_counter()
+            return self
+        self.owns_tracing = not tracemalloc.is_tracing()
+        if self.owns_tracing:
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+        carried_traced_peak = 0
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        wall = time.perf_counter() - self.started
+        traced = None
+        if self.trace:
+            traced = max(carried_traced_peak, tracemalloc.get_traced_memory()[1]) / (1024 * 1024)
+            if self.owns_tracing:
+                tracemalloc.stop()
+        self.stats = RunStats(wall_seconds=wall, traced_peak_mb=traced, peak_rss_mb=peak_rss_mb())
+
+
+class StageTimings:
+    """Wall-clock and CPU seconds, traced peak memory and counters per named pipeline stage.
+
+    A stage that runs more than once sums its seconds and keeps its highest
+    peak. Peaks are only recorded while tracemalloc is tracing, i.e. inside a
+    RunMeter with ``trace`` set; they are the process-wide traced high-water mark during the
+    stage, so they include buffers the stage inherited from earlier ones.
+    """
+
+    def __init__(self) -> None:
+        self.seconds: dict[str, float] = {}
+        self.cpu_seconds: dict[str, float] = {}
+        self.traced_peaks: dict[str, int] = {}
+        self.counts: dict[str, int] = {}
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        tracing = tracemalloc.is_tracing()
+        if tracing:
+            reset_traced_peak()
+        started = time.perf_counter()
+        cpu_started = time.process_time()
+        try:
+            yield
+        finally:
+            self.seconds[name] = self.seconds.get(name, 0.0) + time.perf_counter() - started
+            self.cpu_seconds[name] = self.cpu_seconds.get(name, 0.0) + time.process_time() - cpu_started
+            if tracing:
+                peak = tracemalloc.get_traced_memory()[1]
+                self.traced_peaks[name] = max(self.traced_peaks.get(name, 0), peak)
+
+    def count(self, name: str, value: int) -> None:
+        self.counts[name] = self.counts.get(name, 0) + int(value)
+
+    def as_record(self) -> dict[str, float]:
+        return {name: round(seconds, 4) for name, seconds in self.seconds.items()}
+
+    def profile_record(self) -> dict[str, object]:
+        stages = {}
+        for name, seconds in self.seconds.items():
+            peak = self.traced_peaks.get(name)
+            stages[name] = {
+                "wall_seconds": round(seconds, 4),
+                "cpu_seconds": round(self.cpu_seconds[name], 4),
+                "traced_peak_mb": None if peak is None else round(peak / (1024 * 1024), 2),
+            }
+        return {"stages": stages, "counts": dict(self.counts)}
+
+    def report(self, total_seconds: float | None = None) -> list[str]:
+        total = total_seconds if total_seconds is not None else sum(self.seconds.values())
+        width = max([len(name) for name in self.seconds] + [len("total")])
+        lines = [f"{'stage':<{width}}  seconds   share"]
+        for name, seconds in self.seconds.items():
+            share = seconds / total if total > 0 else 0.0
+            lines.append(f"{name:<{width}}  {seconds:7.3f}  {share:6.1%}")
+        lines.append(f"{'total':<{width}}  {total:7.3f}")
+        return lines
+
+
+def percentile_summary(values: list[float]) -> dict[str, float]:
+    """Linear-interpolated percentiles plus min/max/mean of a metric across runs."""
+    data = np.asarray(values, dtype=np.float64)
+    summary = {f"p{percent}": round(float(np.percentile(data, percent)), 4) for percent in PROFILE_PERCENTILES}
+    summary["min"] = round(float(data.min()), 4)
+    summary["max"] = round(float(data.max()), 4)
+    summary["mean"] = round(float(data.mean()), 4)
+    return summary
+
+
+def profile_percentiles(profiles: list[dict[str, object]]) -> dict[str, object]:
+    """Aggregate per-run ``profile_record`` dicts into percentile summaries.
+
+    Each stage metric, counter and optional whole-run metric (``run``, e.g. a
+    RunStats record) is summarised over the runs that recorded it, with
+    ``runs`` saying how many that was.
+    """
+    stage_values: dict[str, dict[str, list[float]]] = {}
+    count_values: dict[str, list[float]] = {}
+    run_values: dict[str, list[float]] = {}
+    for profile in profiles:
+        for metric, value in profile.get("run", {}).items():
+            if value is not None:
+                run_values.setdefault(metric, []).append(value)
+        for name, metrics in profile["stages"].items():
+            for metric, value in metrics.items():
+                if value is not None:
+                    stage_values.setdefault(name, {}).setdefault(metric, []).append(value)
+        for name, value in profile["counts"].items():
+            count_values.setdefault(name, []).append(value)
+    stages = {
+        name: {metric: dict(percentile_summary(values), runs=len(values)) for metric, values in metrics.items()}
+        for name, metrics in stage_values.items()
+    }
+    counts = {name: dict(percentile_summary(values), runs=len(values)) for name, values in count_values.items()}
+    run = {metric: dict(percentile_summary(values), runs=len(values)) for metric, values in run_values.items()}
+    return {"run_count": len(profiles), "run": run, "stages": stages, "counts": counts}
@@ -0,0 +1,120 @@
+from __future__ import annotations
+
+import queue
+import threading
+import time
+from collections.abc import Callable, Iterable
+from dataclasses import dataclass
+
+from unit_art_lazy import load_deferred
+
+
+# Marks the end of a stage's input; it also follows an error downstream.
+_DONE = object()
+
+
+@dataclass(frozen=True)
+class PipelineStage:
+    """One thread of a staged pipeline: ``run`` maps an input item to zero or more output items."""
+
+    name: str
+    run: Callable[[object], Iterable[object]]
+
+
+@dataclass
+class StageUsage:
+    """Busy time and item counts of one stage, for utilisation reports."""
+
+    name: str
+    busy_seconds: float = 0.0
+    items_in: int = 0
+    items_out: int = 0
+    wait_seconds: float = 0.0
+
+    def utilisation(self, wall_seconds: float) -> float:
+        return self.busy_seconds / wall_seconds if wall_seconds > 0 else 0.0
+
+
+@dataclass
+class PipelineResult:
+    outputs: list[object]
+    usage: list[StageUsage]
+    wall_seconds: float
+
+    def lines(self) -> list[str]:
+        lines = [f"pipeline_wall_seconds={self.wall_seconds:.4f}"]
+        for usage in self.usage:
+            lines.append(
+                f"pipeline_{usage.name}: busy_seconds={usage.busy_seconds:.4f} "
+                f"waiting_seconds={usage.wait_seconds:.4f} utilisation={usage.utilisation(self.wall_seconds):.3f} items={usage.items_in}"
+            )
+        return lines
+
+
+def run_pipeline(items: Iterable[object], stages: list[PipelineStage], queue_size: int = 2) -> PipelineResult:
+    """Push ``items`` through ``stages``, one thread per stage, with bounded queues between them.
+
+    Each stage sees its inputs in order and hands results downstream as soon
+    as they exist, so decode, inference, post-processing and encoding of
+    different items overlap. Steady-state throughput is set by the slowest
+    stage, and at most ``queue_size`` items wait between two stages. The
+    first exception in any stage stops the feed and is re-raised once
+    every thread has drained.
+    """
+    if queue_size < 1:
+        raise ValueError(f"queue_size must be at least 1, got {queue_size}")
+    load_deferred()
+    queues = [queue.Queue(maxsize=queue_size) for _ in range(len(stages) + 1)]
+    usage = [StageUsage(stage.name) for stage in stages]
+    outputs: list[object] = []
+    errors: list[BaseException] = []
+    failed = threading.Event()
+
+    def work(index: int) -> None:
+        stage, inbox, outbox, stats = stages[index], queues[index], queues[index + 1], usage[index]
+        while True:
+            waited = time.perf_counter()
+            item = inbox.get()
+            stats.wait_seconds += time.perf_counter() - waited
+            if item is _DONE:
+                break
+            if failed.is_set():
+                # Drain so upstream puts never block; the results would be dropped anyway.
+                continue
+            stats.items_in += 1
+            started = time.perf_counter()
+            try:
+                results = list(stage.run(item))
+            except BaseException as exc:
+                errors.append(exc)
+                failed.set()
+                continue
+            finally:
+                stats.busy_seconds += time.perf_counter() - started
+            for result in results:
+                stats.items_out += 1
+                outbox.put(result)
+        outbox.put(_DONE)
+
+    def collect() -> None:
+        while True:
+            item = queues[-1].get()
+            if item is _DONE:
+                break
+            outputs.append(item)
+
+    threads = [threading.Thread(target=work, args=(index,), name=f"pipeline-{stage.name}", daemon=True) for index, stage in enumerate(stages)]
+    threads.append(threading.Thread(target=collect, name="pipeline-collect", daemon=True))
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for item in items:
+        if failed.is_set():
+            break
+        queues[0].put(item)
+    queues[0].put(_DONE)
+    for thread in threads:
+        thread.join()
+    if errors:
+        raise errors[0]
+    return PipelineResult(outputs, usage, time.perf_counter() - started)
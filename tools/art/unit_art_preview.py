@@ -0,0 +1,125 @@
+from __future__ import annotations
+
+import math
+from functools import lru_cache
+
+from unit_art_lazy import lazy_import
+
+np = lazy_import("numpy")
+Image = lazy_import("PIL.Image")
+
+
+Color = tuple[int, int, int, int]
+Palette = tuple[Color, ...]
+
+REVIEW_CHECKER: Palette = ((46, 50, 60, 255), (25, 28, 36, 255))
+BOARD_CHECKER: Palette = ((34, 36, 44, 255), (56, 60, 70, 255))
+SPRITE_CHECKER: Palette = ((31, 34, 38, 255), (43, 47, 52, 255))
+BLACK: Palette = ((0, 0, 0, 255),)
+WHITE: Palette = ((255, 255, 255, 255),)
+CLEAR: Palette = ((0, 0, 0, 0),)
+
+
+def fit_size(size: tuple[int, int], max_size: tuple[int, int]) -> tuple[int, int]:
+    """Return the size Image.thumbnail would produce for max_size."""
+    width, height = size
+    x, y = max_size
+    if x >= width and y >= height:
+        return size
+    aspect = width / height
+    if x / y >= aspect:
+        x = max(min(math.floor(y * aspect), math.ceil(y * aspect), key=lambda n: abs(aspect - n / y)), 1)
+    else:
+        y = max(min(math.floor(x / aspect), math.ceil(x / aspect), key=lambda n: 0 if n == 0 else abs(aspect - x / n)), 1)
+    return x, y
+
+
+def preview_halvings(size: tuple[int, int], tile: tuple[int, int]) -> int:
+    """How many reduce(2) steps PreviewPyramid takes from ``size`` before resampling to ``tile``."""
+    width, height = size
+    halvings = 0
+    while width // 2 >= tile[0] and height // 2 >= tile[1]:
+        width, height = (width + 1) // 2, (height + 1) // 2
+        halvings += 1
+    return halvings
+
+
+class PreviewPyramid:
+    """Half-size reduction chain of one image, built lazily for preview tiles.
+
+    Every requested size is resampled with LANCZOS from the smallest level
+    that is still at least as large, so a sheet with many tile sizes pays for
+    one reduction chain instead of one full-resolution resize per tile.
+    Levels are kept premultiplied so edges do not pick up transparent RGB, and
+    each output size is resampled once and handed out as copies.
+    """
+
+    def __init__(self, image: Image.Image) -> None:
+        rgba = image.convert("RGBA")
+        self.size = rgba.size
+        self.levels = [rgba.convert("RGBa")]
+        self.resized: dict[tuple[int, int], Image.Image] = {}
+
+    @classmethod
+    def from_level(cls, size: tuple[int, int], level: Image.Image) -> PreviewPyramid:
+        """A pyramid of an image of ``size`` that starts from an already reduced RGBa ``level``.
+
+        Tiles of a size whose preview_halvings gave ``level`` come out as they
+        would from the full image.
+        """
+        pyramid = cls.__new__(cls)
+        pyramid.size = size
+        pyramid.levels = [level]
+        pyramid.resized = {}
+        return pyramid
+
+    def level_for(self, size: tuple[int, int]) -> Image.Image:
+        while True:
+            level = self.levels[-1]
+            if level.width // 2 < size[0] or level.height // 2 < size[1]:
+                break
+            self.levels.append(level.reduce(2))
+        for level in reversed(self.levels):
+            if level.width >= size[0] and level.height >= size[1]:
+                return level
+        return self.levels[0]
+
+    def resize(self, size: tuple[int, int]) -> Image.Image:
+        cached = self.resized.get(size)
+        if cached is None:
+            level = self.level_for(size)
+            if level.size != size:
+                level = level.resize(size, Image.Resampling.LANCZOS)
+            cached = level.convert("RGBA")
+            self.resized[size] = cached
+        return cached.copy()
+
+    def thumbnail(self, max_size: tuple[int, int]) -> Image.Image:
+        return self.resize(fit_size(self.size, max_size))
+
+
+@lru_cache(maxsize=64)
+def cached_background(size: tuple[int, int], tile: int, palette: Palette) -> Image.Image:
+    """Draw a background once per (size, tile, palette).
+
+    The first palette colour fills the tile; with a second colour and a
+    positive tile size, squares whose grid coordinates sum to an even number
+    are painted with it, the same phase the old per-script checker() used.
+    """
+    width, height = size
+    pixels = np.empty((height, width, 4), dtype=np.uint8)
+    pixels[:] = palette[0]
+    if tile > 0 and len(palette) > 1:
+        checks = (np.arange(height)[:, None] // tile + np.arange(width)[None, :] // tile) % 2 == 0
+        pixels[checks] = palette[1]
+    return Image.fromarray(pixels, "RGBA")
+
+
+def background_tile(size: tuple[int, int], palette: Palette, tile: int = 0) -> Image.Image:
+    """Return a private copy of a cached checker or solid background."""
+    return cached_background((int(size[0]), int(size[1])), int(tile), tuple(palette)).copy()
+
+
+def scaled_tile(tile: int, source_width: int, width: int) -> int:
+    """Checker square size that keeps a source-sized checker's look at width."""
+    return max(1, round(tile * width / max(1, source_width)))
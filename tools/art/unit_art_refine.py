@@ -0,0 +1,116 @@
+from __future__ import annotations
+
+import math
+from dataclasses import dataclass
+
+from unit_art_lazy import lazy_import
+
+np = lazy_import("numpy")
+Image = lazy_import("PIL.Image")
+ImageFilter = lazy_import("PIL.ImageFilter")
+
+
+# Coarse probabilities strictly between these bounds are treated as unsure.
+BAND_LOW = 0.02
+BAND_HIGH = 0.98
+# Coarse pixels the unsure set is grown by before refinement, so thin parts
+# the coarse pass half-missed and the seam back to coarse values both fall
+# inside refined tiles.
+BAND_MARGIN = 2
+# Fine-resolution pixels of context each refinement window reads past its core.
+REFINE_CONTEXT = 16
+
+
+@dataclass(frozen=True)
+class RefineTile:
+    """Core box of a refinement tile at the fine resolution and the model window around it.
+
+    ``core`` indexes the tile in fine-resolution coordinates, ``window`` the
+    square crop the model sees, and ``inner`` the core inside a prediction
+    cut to ``window``.
+    """
+
+    top: int
+    left: int
+    bottom: int
+    right: int
+    window_top: int
+    window_left: int
+    window_size: int
+
+    @property
+    def core(self) -> tuple[slice, slice]:
+        return slice(self.top, self.bottom), slice(self.left, self.right)
+
+    @property
+    def window(self) -> tuple[int, int, int, int]:
+        return (self.window_left, self.window_top, self.window_left + self.window_size, self.window_top + self.window_size)
+
+    @property
+    def inner(self) -> tuple[slice, slice]:
+        return (
+            slice(self.top - self.window_top, self.bottom - self.window_top),
+            slice(self.left - self.window_left, self.right - self.window_left),
+        )
+
+
+def upsample_probability(arr: np.ndarray, size: int) -> np.ndarray:
+    return np.asarray(Image.fromarray(arr.astype(np.float32), "F").resize((size, size), Image.Resampling.BILINEAR))
+
+
+def uncertain_band(coarse: np.ndarray, size: int, margin: int = BAND_MARGIN) -> np.ndarray:
+    """Fine-resolution mask of where a coarse prediction is unsure, grown by ``margin`` coarse pixels.
+
+    Besides soft probabilities it takes the silhouette boundary itself: a
+    hard step between a sure-background and a sure-foreground coarse pixel
+    still leaves the true edge somewhere between them.
+    """
+    foreground = Image.fromarray(np.where(coarse >= 0.5, 255, 0).astype(np.uint8), "L")
+    boundary = np.asarray(foreground.filter(ImageFilter.MaxFilter(3))) != np.asarray(foreground.filter(ImageFilter.MinFilter(3)))
+    unsure = (((coarse > BAND_LOW) & (coarse < BAND_HIGH)) | boundary).astype(np.uint8) * 255
+    band = Image.fromarray(unsure, "L")
+    if margin > 0:
+        band = band.filter(ImageFilter.MaxFilter(margin * 2 + 1))
+    return np.asarray(band.resize((size, size), Image.Resampling.NEAREST)) > 0
+
+
+def refine_tiles(band: np.ndarray, window_size: int, context: int = REFINE_CONTEXT) -> list[RefineTile]:
+    """Grid tiles whose core touches ``band``; each model window adds ``context`` pixels per side.
+
+    Windows are shifted inward at the frame edge so every one is a full
+    ``window_size`` square inside the frame.
+    """
+    size = band.shape[0]
+    step = window_size - 2 * context
+    if step <= 0 or window_size > size:
+        raise ValueError(f"refinement window {window_size} with context {context} does not fit a {size} frame")
+    tiles = []
+    for top in range(0, size, step):
+        for left in range(0, size, step):
+            bottom, right = min(size, top + step), min(size, left + step)
+            if not band[top:bottom, left:right].any():
+                continue
+            window_top = min(max(0, top - context), size - window_size)
+            window_left = min(max(0, left - context), size - window_size)
+            tiles.append(RefineTile(top, left, bottom, right, window_top, window_left, window_size))
+    return tiles
+
+
+def tile_count(size: int, window_size: int, context: int = REFINE_CONTEXT) -> int:
+    return math.ceil(size / (window_size - 2 * context)) ** 2
+
+
+def composite_refinement(coarse: np.ndarray, band: np.ndarray, tiles: list[RefineTile], predictions: list[np.ndarray]) -> np.ndarray:
+    """Upsampled coarse probabilities with the band replaced by the refined tile predictions.
+
+    Only band pixels take fine values. Outside the band the coarse pass was
+    already sure, so tile seams cannot show there. ``coarse`` and
+    ``predictions`` must both be raw sigmoid: a pass stretched to its own
+    min-max range no longer shares a scale with the others. Stretch the
+    result instead.
+    """
+    out = upsample_probability(coarse, band.shape[0]).copy()
+    for tile, prediction in zip(tiles, predictions):
+        target = band[tile.core]
+        out[tile.core][target] = prediction[tile.inner][target]
+    return np.clip(out, 0.0, 1.0)
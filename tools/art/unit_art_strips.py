@@ -0,0 +1,324 @@
+from __future__ import annotations
+
+import math
+import struct
+import zlib
+from dataclasses import dataclass
+from pathlib import Path
+
+from unit_art_lazy import lazy_import
+
+np = lazy_import("numpy")
+Image = lazy_import("PIL.Image")
+
+
+# Pillow's resampler works in fixed point with this many fractional bits.
+RESAMPLE_PRECISION_BITS = 22
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+# Pillow's PNG encoder writes IDAT chunks of at least ImageFile.MAXBLOCK bytes.
+PNG_IDAT_BLOCK = 65536
+PNG_FILTER_ROWS = 32
+# PNG colour type and bytes per pixel of the 8-bit modes PngStripWriter takes.
+PNG_MODES = {"L": (0, 1), "RGB": (2, 3), "RGBA": (6, 4)}
+
+
+@dataclass(frozen=True)
+class RowStrip:
+    """Core rows ``[top, bottom)`` of a horizontal strip and the halo window read around them.
+
+    ``rows`` indexes the core in full-image coordinates, ``window`` the rows a
+    stage reads, and ``core`` the core rows inside an array cut to ``window``.
+    """
+
+    top: int
+    bottom: int
+    window_top: int
+    window_bottom: int
+
+    @property
+    def rows(self) -> slice:
+        return slice(self.top, self.bottom)
+
+    @property
+    def window(self) -> slice:
+        return slice(self.window_top, self.window_bottom)
+
+    @property
+    def core(self) -> slice:
+        return slice(self.top - self.window_top, self.bottom - self.window_top)
+
+
+def row_strips(height: int, strip_rows: int, halo: int) -> list[RowStrip]:
+    """Split ``height`` rows into strips of ``strip_rows`` with ``halo`` extra rows on each side."""
+    if strip_rows <= 0:
+        raise ValueError(f"strip_rows must be positive, got {strip_rows}")
+    halo = max(0, halo)
+    return [
+        RowStrip(top, min(height, top + strip_rows), max(0, top - halo), min(height, top + strip_rows + halo))
+        for top in range(0, height, strip_rows)
+    ]
+
+
+class RowBits:
+    """A full-size boolean mask kept at one bit per pixel, read and written by row slices."""
+
+    def __init__(self, height: int, width: int) -> None:
+        self.width = width
+        self.bits = np.zeros((height, (width + 7) // 8), dtype=np.uint8)
+
+    def __getitem__(self, rows: slice) -> np.ndarray:
+        return np.unpackbits(self.bits[rows], axis=1, count=self.width).view(bool)
+
+    def __setitem__(self, rows: slice, mask: np.ndarray) -> None:
+        self.bits[rows] = np.packbits(mask, axis=1)
+
+
+def lanczos_weight(x: float) -> float:
+    # Pillow's truncated sinc, in the same double arithmetic as Resample.c.
+    if not -3.0 <= x < 3.0:
+        return 0.0
+    weight = 1.0
+    for value in (x, x / 3):
+        if value != 0.0:
+            weight *= math.sin(value * math.pi) / (value * math.pi)
+    return weight
+
+
+class LanczosRows:
+    """The vertical pass of Pillow's LANCZOS resize, for any range of output rows.
+
+    Image.resize scales columns first and rows second, each in 22-bit fixed
+    point. These are the same coefficients, computed with math.sin like the C
+    code, so Pillow's horizontal pass followed by ``rows`` on each strip
+    reproduces the whole-image resize exactly without holding it.
+    """
+
+    def __init__(self, in_size: int, out_size: int) -> None:
+        scale = in_size / out_size
+        filterscale = max(scale, 1.0)
+        support = 3.0 * filterscale
+        step = 1.0 / filterscale
+        ksize = int(math.ceil(support)) * 2 + 1
+        self.starts = np.zeros(out_size, dtype=np.int64)
+        self.stops = np.zeros(out_size, dtype=np.int64)
+        self.weights = np.zeros((out_size, ksize), dtype=np.int32)
+        for row in range(out_size):
+            center = (row + 0.5) * scale
+            start = max(int(center - support + 0.5), 0)
+            count = min(int(center + support + 0.5), in_size) - start
+            weights = [lanczos_weight((x + start - center + 0.5) * step) for x in range(count)]
+            total = 0.0
+            for weight in weights:
+                total += weight
+            for x, weight in enumerate(weights):
+                weight = weight / total if total != 0.0 else weight
+                self.weights[row, x] = int(weight * (1 << RESAMPLE_PRECISION_BITS) + (0.5 if weight >= 0 else -0.5))
+            self.starts[row] = start
+            self.stops[row] = start + count
+
+    def rows(self, source: np.ndarray, start: int, stop: int, offset: int = 0) -> np.ndarray:
+        """Output rows ``[start, stop)`` from ``source``, whose first row is input row ``offset``."""
+        first = self.starts[start:stop] - offset
+        weights = self.weights[start:stop]
+        total = np.full((stop - start,) + source.shape[1:], 1 << (RESAMPLE_PRECISION_BITS - 1), dtype=np.int32)
+        for tap in range(weights.shape[1]):
+            index = np.minimum(first + tap, len(source) - 1)
+            total += source[index].astype(np.int32) * weights[:, tap].reshape((-1,) + (1,) * (source.ndim - 1))
+        return np.clip(total >> RESAMPLE_PRECISION_BITS, 0, 255).astype(np.uint8)
+
+
+class StripResize:
+    """LANCZOS-resize an image fed top to bottom as row strips, matching Image.resize.
+
+    Each strip gets Pillow's horizontal pass (premultiplied, as Image.resize
+    does for RGBA) as soon as it arrives; LanczosRows then emits every output
+    row whose source rows are all in, so only those rows stay buffered.
+    """
+
+    def __init__(self, size: tuple[int, int], out_size: tuple[int, int]) -> None:
+        self.size = size
+        self.out_size = out_size
+        self.identity = size == out_size
+        # Image.resize runs the vertical pass first on images over 100 times
+        # taller than wide; those are narrow enough to buffer whole.
+        self.whole = size[1] > size[0] * 100 and out_size[1] < size[1]
+        self.vertical = LanczosRows(size[1], out_size[1]) if out_size[1] != size[1] and not self.whole else None
+        self.strips: list[Image.Image] = []
+        self.buffer: np.ndarray | None = None
+        self.buffer_top = 0
+        self.received = 0
+        self.out: np.ndarray | None = None
+        self.done = 0
+        self.mode = ""
+
+    def add(self, strip: Image.Image) -> None:
+        self.mode = strip.mode
+        if self.identity or self.whole:
+            self.strips.append(strip)
+            return
+        premultiplied = {"LA": "La", "RGBA": "RGBa"}.get(strip.mode)
+        if premultiplied is not None:
+            strip = strip.convert(premultiplied)
+        width = self.size[0]
+        if self.out_size[0] != width:
+            strip = strip.resize((self.out_size[0], strip.height), Image.Resampling.LANCZOS, box=(0, 0, width, strip.height))
+        rows = np.asarray(strip)
+        if self.out is None:
+            self.out = np.empty((self.out_size[1],) + rows.shape[1:], dtype=np.uint8)
+        self.buffer = rows if self.buffer is None else np.concatenate((self.buffer, rows))
+        self.received += len(rows)
+        if self.vertical is None:
+            self.out[self.done:self.received] = self.buffer
+            self.done = self.received
+            self.buffer = None
+            self.buffer_top = self.received
+            return
+        ready = int(np.searchsorted(self.vertical.stops, self.received, side="right"))
+        if ready > self.done:
+            self.out[self.done:ready] = self.vertical.rows(self.buffer, self.done, ready, self.buffer_top)
+            self.done = ready
+            if ready < self.out_size[1]:
+                drop = int(self.vertical.starts[ready]) - self.buffer_top
+                self.buffer = self.buffer[drop:]
+                self.buffer_top += drop
+
+    def result(self) -> Image.Image:
+        if self.identity or self.whole:
+            image = Image.new(self.mode, self.size)
+            top = 0
+            for strip in self.strips:
+                image.paste(strip, (0, top))
+                top += strip.height
+            return image if self.identity else image.resize(self.out_size, Image.Resampling.LANCZOS)
+        premultiplied = {"LA": "La", "RGBA": "RGBa"}.get(self.mode)
+        image = Image.fromarray(self.out, premultiplied or self.mode)
+        return image.convert(self.mode) if premultiplied is not None else image
+
+
+class StripReduce:
+    """``Image.reduce(2)`` applied ``halvings`` times to an image fed as row strips.
+
+    Rows are passed on in groups of ``2 ** halvings`` so every 2x2 block of
+    every level falls inside one group, which keeps the result identical to
+    reducing the whole image.
+    """
+
+    def __init__(self, halvings: int) -> None:
+        self.group = 1 << halvings
+        self.halvings = halvings
+        self.pending: Image.Image | None = None
+        self.levels: list[Image.Image] = []
+
+    def reduce(self, image: Image.Image) -> None:
+        for _ in range(self.halvings):
+            image = image.reduce(2)
+        self.levels.append(image)
+
+    def add(self, strip: Image.Image) -> None:
+        if self.pending is not None:
+            joined = Image.new(strip.mode, (strip.width, self.pending.height + strip.height))
+            joined.paste(self.pending, (0, 0))
+            joined.paste(strip, (0, self.pending.height))
+            strip = joined
+        whole = strip.height - strip.height % self.group
+        if whole:
+            self.reduce(strip.crop((0, 0, strip.width, whole)))
+        self.pending = strip.crop((0, whole, strip.width, strip.height)) if whole < strip.height else None
+
+    def result(self) -> Image.Image:
+        if self.pending is not None:
+            self.reduce(self.pending)
+            self.pending = None
+        level = Image.new(self.levels[0].mode, (self.levels[0].width, sum(level.height for level in self.levels)))
+        top = 0
+        for part in self.levels:
+            level.paste(part, (0, top))
+            top += part.height
+        return level
+
+
+def png_chunk(kind: bytes, data: bytes) -> bytes:
+    return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+
+def png_filter_rows(rows: np.ndarray, previous: np.ndarray, pixel_bytes: int) -> np.ndarray:
+    """Filter scanlines the way Pillow's ZIP encoder does: least absolute sum of none, up, sub, then Paeth."""
+    current = rows.astype(np.int16)
+    up = np.concatenate((previous[None].astype(np.int16), current[:-1]))
+    left = np.zeros_like(current)
+    left[:, pixel_bytes:] = current[:, :-pixel_bytes]
+    up_left = np.zeros_like(current)
+    up_left[:, pixel_bytes:] = up[:, :-pixel_bytes]
+    base = left + up - up_left
+    near_left = np.abs(base - left)
+    near_up = np.abs(base - up)
+    near_up_left = np.abs(base - up_left)
+    paeth = np.where((near_left <= near_up) & (near_left <= near_up_left), left, np.where(near_up <= near_up_left, up, up_left))
+    filtered = np.empty((len(rows), rows.shape[1] + 1), dtype=np.uint8)
+    best = None
+    for kind, residual in ((0, current), (2, current - up), (1, current - left), (4, current - paeth)):
+        data = (residual & 0xFF).astype(np.uint8)
+        cost = np.where(data < 128, data, 256 - data.astype(np.int32)).sum(axis=1, dtype=np.int64)
+        if best is None:
+            chosen = np.ones(len(rows), dtype=bool)
+            best = cost
+        else:
+            chosen = (best > 0) & (cost < best)
+            best = np.where(chosen, cost, best)
+        filtered[chosen, 0] = kind
+        filtered[chosen, 1:] = data[chosen]
+    return filtered
+
+
+class PngStripWriter:
+    """Write an 8-bit L, RGB or RGBA PNG one strip of rows at a time.
+
+    Scanlines are filtered, deflated and split into IDAT chunks with the
+    settings Pillow's PNG plugin uses, so with the same zlib build the file
+    is byte-identical to Image.save; either way it decodes to the same
+    pixels. Only the current strip is held.
+    """
+
+    def __init__(self, path: Path, size: tuple[int, int], mode: str) -> None:
+        color_type, self.pixel_bytes = PNG_MODES[mode]
+        self.size = size
+        self.rows_written = 0
+        self.previous = np.zeros(size[0] * self.pixel_bytes, dtype=np.uint8)
+        self.compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, 15, 9, zlib.Z_FILTERED)
+        self.block = max(PNG_IDAT_BLOCK, size[0] * 4)
+        self.pending = b""
+        self.handle = path.open("wb")
+        self.handle.write(PNG_SIGNATURE)
+        self.handle.write(png_chunk(b"IHDR", struct.pack(">IIBBBBB", size[0], size[1], 8, color_type, 0, 0, 0)))
+
+    def __enter__(self) -> PngStripWriter:
+        return self
+
+    def __exit__(self, exc_type: object, *exc_info: object) -> None:
+        try:
+            if exc_type is None:
+                self.close()
+        finally:
+            self.handle.close()
+
+    def emit(self, data: bytes, final: bool = False) -> None:
+        self.pending += data
+        while len(self.pending) >= self.block or (final and self.pending):
+            self.handle.write(png_chunk(b"IDAT", self.pending[:self.block]))
+            self.pending = self.pending[self.block:]
+
+    def write(self, rows: np.ndarray) -> None:
+        scanlines = np.ascontiguousarray(rows, dtype=np.uint8).reshape(len(rows), -1)
+        # Filtering needs a dozen int16 copies of its rows, so a tall strip
+        # goes through in batches; each row depends only on the one above.
+        for start in range(0, len(scanlines), PNG_FILTER_ROWS):
+            batch = scanlines[start:start + PNG_FILTER_ROWS]
+            self.emit(self.compressor.compress(png_filter_rows(batch, self.previous, self.pixel_bytes).tobytes()))
+            self.previous = batch[-1].copy()
+        self.rows_written += len(scanlines)
+
+    def close(self) -> None:
+        if self.rows_written != self.size[1]:
+            raise ValueError(f"PNG expects {self.size[1]} rows, {self.rows_written} were written")
+        self.emit(self.compressor.flush(), final=True)
+        self.handle.write(png_chunk(b"IEND", b""))